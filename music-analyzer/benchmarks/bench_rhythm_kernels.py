@@ -0,0 +1,129 @@
+"""Micro-benchmark: vectorized rhythm post-processing vs. the old frame loops.
+
+Compares beat-strength lookup, time-signature estimation and novelty peak
+picking against the original per-frame Python loops on synthetic inputs of
+increasing length, checks that both give the same output, and prints the
+timings.
+
+Usage:
+    python benchmarks/bench_rhythm_kernels.py [--minutes 5 30 60]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+import librosa
+
+from music_analyzer.analyzers.rhythm import (
+    _beat_strengths,
+    _estimate_time_signature,
+    _pick_boundaries,
+)
+
+SR = 22050
+HOP = 512
+
+
+# ---------------------------------------------------------------------------
+# Reference implementations (pre-vectorization)
+# ---------------------------------------------------------------------------
+
+def _beat_strengths_loop(beat_times, onset_env, sr):
+    out = []
+    for t in beat_times:
+        frame_idx = librosa.time_to_frames([t], sr=sr)[0]
+        out.append(float(np.clip(onset_env[min(frame_idx, len(onset_env) - 1)] / (np.max(onset_env) + 1e-8), 0, 1)))
+    return out
+
+
+def _time_signature_loop(onset_env, sr, bpm):
+    frames_per_beat = (60.0 / bpm) * sr / HOP
+    if len(onset_env) < int(frames_per_beat * 8):
+        return "4/4"
+    energy_3 = energy_4 = 0.0
+    count_3 = count_4 = 0
+    for i in range(len(onset_env)):
+        if (i % int(frames_per_beat * 3)) < frames_per_beat * 0.3:
+            energy_3 += float(onset_env[i])
+            count_3 += 1
+        if (i % int(frames_per_beat * 4)) < frames_per_beat * 0.3:
+            energy_4 += float(onset_env[i])
+            count_4 += 1
+    avg_3 = energy_3 / max(count_3, 1)
+    avg_4 = energy_4 / max(count_4, 1)
+    return "3/4" if avg_3 > avg_4 * 1.2 else "4/4"
+
+
+def _pick_boundaries_loop(novelty, min_distance):
+    peaks = []
+    for i in range(1, len(novelty) - 1):
+        if novelty[i] > novelty[i - 1] and novelty[i] > novelty[i + 1]:
+            if novelty[i] > np.mean(novelty) + 1.0 * np.std(novelty):
+                if not peaks or (i - peaks[-1]) >= min_distance:
+                    peaks.append(i)
+    return peaks
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def _synthetic_inputs(minutes: float, bpm: float = 120.0, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    n_frames = int(minutes * 60 * SR / HOP)
+    frames_per_beat = 60.0 / bpm * SR / HOP
+    beat_frames = np.arange(0, n_frames, frames_per_beat).astype(int)
+
+    onset_env = rng.random(n_frames).astype(np.float32) * 0.3
+    onset_env[beat_frames] += 1.0
+    onset_env[beat_frames[::4]] += 0.5
+
+    beat_times = librosa.frames_to_time(beat_frames, sr=SR)
+    novelty = np.abs(np.convolve(rng.standard_normal(n_frames), np.ones(64) / 64, mode="same"))
+    return onset_env, beat_times, novelty, bpm
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[5, 30, 60])
+    args = parser.parse_args()
+
+    print(f"{'input':>8}  {'kernel':<16} {'loop':>9} {'vectorized':>11} {'speedup':>8}  same")
+    for minutes in args.minutes:
+        onset_env, beat_times, novelty, bpm = _synthetic_inputs(minutes)
+        min_distance = int(15.0 * SR / HOP)
+
+        cases = [
+            ("beat strengths",
+             (_beat_strengths_loop, (beat_times, onset_env, SR)),
+             (_beat_strengths, (beat_times, onset_env, SR)),
+             lambda a, b: np.allclose(a, b)),
+            ("time signature",
+             (_time_signature_loop, (onset_env, SR, bpm)),
+             (_estimate_time_signature, (onset_env, SR, bpm)),
+             lambda a, b: a == b),
+            ("boundary peaks",
+             (_pick_boundaries_loop, (novelty, min_distance)),
+             (_pick_boundaries, (novelty, min_distance)),
+             lambda a, b: list(a) == list(b)),
+        ]
+        for name, (old_fn, old_args), (new_fn, new_args), same in cases:
+            old_out, old_t = _timed(old_fn, *old_args)
+            new_out, new_t = _timed(new_fn, *new_args)
+            print(
+                f"{minutes:>6.0f}m  {name:<16} {old_t:>8.3f}s {new_t:>10.4f}s "
+                f"{old_t / max(new_t, 1e-9):>7.0f}x  {same(old_out, new_out)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
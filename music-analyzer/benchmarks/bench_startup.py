@@ -0,0 +1,94 @@
+"""Startup-time benchmark for the CLI.
+
+Times ``python -m music_analyzer --help`` (and a bare interpreter for
+reference) over several runs, checks that no heavy module (numpy, librosa,
+torch, the model packages) is imported just to print the help, and exits
+non-zero when the median exceeds the budget.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 10] [--budget-ms 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# Modules that must not be imported by ``--help``
+HEAVY_MODULES = (
+    "numpy", "scipy", "librosa", "pydantic", "torch",
+    "laion_clap", "faster_whisper", "demucs", "essentia",
+)
+
+_PROBE = f"""
+import runpy, sys
+sys.argv = ["music-analyzer", "--help"]
+try:
+    runpy.run_module("music_analyzer", run_name="__main__")
+except SystemExit:
+    pass
+heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print("HEAVY:" + ",".join(heavy), file=sys.stderr)
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC), env.get("PYTHONPATH")]))
+    return env
+
+
+def _time_command(cmd: list[str], runs: int) -> list[float]:
+    env = _env()
+    subprocess.run(cmd, env=env, capture_output=True, check=True)  # Warm the OS / bytecode caches
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, capture_output=True, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    baseline = _time_command([sys.executable, "-c", "pass"], args.runs)
+    cli = _time_command([sys.executable, "-m", "music_analyzer", "--help"], args.runs)
+
+    probe = subprocess.run(
+        [sys.executable, "-c", _PROBE], env=_env(), capture_output=True, text=True, check=True,
+    )
+    heavy = next(
+        (line.split(":", 1)[1] for line in probe.stderr.splitlines() if line.startswith("HEAVY:")),
+        "",
+    )
+
+    median = statistics.median(cli)
+    print(f"{'python -c pass':<34} median {statistics.median(baseline):7.1f} ms")
+    print(f"{'python -m music_analyzer --help':<34} median {median:7.1f} ms  (min {min(cli):.1f}, max {max(cli):.1f})")
+    print(f"heavy modules imported by --help: {heavy or 'none'}")
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"FAIL: median {median:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if heavy:
+        print(f"FAIL: --help imports {heavy}")
+        failed = True
+    if not failed:
+        print(f"OK: within the {args.budget_ms:.0f} ms budget")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Calibration check: the lyrics vocal gate on synthetic voices and instrumentals.
+
+Synthesizes sung, rapped and spoken voices (source-filter: harmonic source
+with vibrato, portamento and pitch jitter, vowel formants, syllable
+envelopes), alone and mixed under backing tracks, and instrumentals (chords,
+piano, fast arpeggios, chorus pads, drums, noise, a pure tone). Runs the
+mixture gate (``_detect_vocals_heuristic``) and the vocal-stem gate
+(``_vocal_regions``, with a stem of separation bleed for the instrumentals),
+prints the voiced share / seconds and the decision, and exits non-zero when a
+voice is gated or an instrumental is let through.
+
+Usage:
+    python benchmarks/bench_vocal_gate.py [--seconds 20] [--seeds 0 1 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import librosa
+
+from music_analyzer.analyzers.features import FeatureContext
+from music_analyzer.analyzers.lyrics import (
+    _MIN_VOCAL_SECONDS,
+    _MIN_VOICED_FRACTION,
+    _MOTION_SHARE,
+    _VOICED_RUN,
+    _detect_vocals_heuristic,
+    _vocal_regions,
+)
+from music_analyzer.utils.warm_models import WHISPER_SR
+
+SR = 22050
+
+# F1, F2, F3 (Hz)
+VOWELS = [(800, 1200, 2500), (500, 1900, 2600), (300, 2300, 3000), (500, 900, 2400), (350, 800, 2300)]
+
+# Demucs bleed level of an instrumental's "vocal" stem, relative to the mixture
+BLEED = 10 ** (-30 / 20)
+
+
+# ---------------------------------------------------------------------------
+# Synthesis
+# ---------------------------------------------------------------------------
+
+def _harmonics(f0, gain, fmax=5000.0):
+    """Sum of harmonics along the sample-wise contour ``f0``; ``gain(k, fk)`` per harmonic."""
+    phase = 2 * np.pi * np.cumsum(f0) / SR
+    out = np.zeros(len(f0))
+    for k in range(1, int(fmax / max(float(f0.min()), 50.0)) + 1):
+        out += gain(k, k * f0) * (k * f0 < fmax) * np.sin(k * phase)
+    return out
+
+
+def _envelope(n, attack=0.01, release=0.05):
+    env = np.ones(n)
+    a = min(n, int(attack * SR))
+    r = min(n - a, int(release * SR))
+    env[:a] = np.linspace(0, 1, a)
+    if r:
+        env[n - r:] = np.linspace(1, 0, r)
+    return env
+
+
+def _normalize(y):
+    return y / (np.max(np.abs(y)) + 1e-9)
+
+
+def voice(seconds, rng, low=48, high=67, vibrato_cents=60.0, speech=False):
+    """A sung melody (or, with ``speech``, spoken syllables) through vowel formants."""
+    n = int(seconds * SR)
+    t = np.arange(n) / SR
+    midi, formants, amp = np.zeros(n), np.zeros((n, 3)), np.zeros(n)
+    pos, note = 0, int(rng.integers(low, high))
+    while pos < n:
+        length = min(n - pos, int(rng.uniform(0.12, 0.3) * SR if speech else rng.uniform(0.3, 0.8) * SR))
+        if speech:
+            # Falling intonation around the speaking pitch
+            contour = note + rng.normal(0, 1.5) + np.linspace(rng.normal(1, 1), rng.normal(-1, 1), length)
+        else:
+            target = int(np.clip(note + rng.choice([-4, -2, -1, 0, 1, 2, 3, 5]), low, high))
+            contour = np.full(length, float(target))
+            glide = min(length, int(0.06 * SR))
+            contour[:glide] = np.linspace(note, target, glide)
+            note = target
+        midi[pos:pos + length] = contour
+        formants[pos:pos + length] = VOWELS[rng.integers(len(VOWELS))]
+        pause = rng.random() < (0.35 if speech else 0.15)
+        amp[pos:pos + length] = 0.0 if pause else _envelope(length, 0.03, 0.05)
+        pos += length
+    smooth = np.ones(int(0.04 * SR)) / int(0.04 * SR)
+    formants = np.stack([np.convolve(formants[:, j], smooth, mode="same") for j in range(3)], axis=1)
+
+    vibrato = vibrato_cents / 100 * np.sin(2 * np.pi * rng.uniform(5, 6.5) * t) * np.clip(t % 1.0 / 0.3, 0, 1)
+    jitter = np.cumsum(rng.normal(0, 0.02, n))
+    jitter -= np.convolve(jitter, np.ones(SR // 10) / (SR // 10), mode="same")
+    f0 = np.maximum(440 * 2 ** ((midi + vibrato + jitter - 69) / 12), 60)
+
+    def gain(k, fk):
+        g = sum(w / (1 + ((fk - formants[:, j]) / bw) ** 2)
+                for j, (bw, w) in enumerate(((90, 1.0), (110, 0.6), (170, 0.3))))
+        return (g + 0.02) / np.sqrt(k)
+
+    y = _harmonics(f0, gain) * amp + rng.normal(0, 0.02, n) * amp
+    return _normalize(y)
+
+
+def chords(seconds, rng, chord_seconds=2.0, piano=False):
+    n = int(seconds * SR)
+    y = np.zeros(n)
+    for pos in range(0, n, int(chord_seconds * SR)):
+        length = min(int(chord_seconds * SR), n - pos)
+        root = int(rng.choice([48, 50, 52, 53, 55, 57]))
+        for m in (root, root + int(rng.choice([3, 4])), root + 7, root + 12):
+            f = np.full(length, 440 * 2 ** ((m - 69) / 12))
+            if piano:
+                tone = _harmonics(f, lambda k, fk: k ** -1.5) * np.exp(-1.5 * np.arange(length) / SR)
+            else:
+                tone = _harmonics(f, lambda k, fk: 1.0 / k)
+            y[pos:pos + length] += tone * _envelope(length)
+    return _normalize(y)
+
+
+def melody(seconds, rng, note_seconds=0.25, pluck=False, vibrato_cents=0.0):
+    n = int(seconds * SR)
+    y = np.zeros(n)
+    t = np.arange(n) / SR
+    for pos in range(0, n, int(note_seconds * SR)):
+        length = min(int(note_seconds * SR), n - pos)
+        m = int(rng.choice([60, 62, 64, 65, 67, 69, 71, 72, 74, 76]))
+        vib = vibrato_cents / 100 * np.sin(2 * np.pi * 5.5 * t[pos:pos + length])
+        f = 440 * 2 ** ((m + vib - 69) / 12)
+        if pluck:
+            tone = _harmonics(f, lambda k, fk: k ** -2.0) * np.exp(-6 * np.arange(length) / SR)
+        else:
+            tone = _harmonics(f, lambda k, fk: 1.0 / k) * _envelope(length, 0.01, 0.02)
+        y[pos:pos + length] = tone
+    return _normalize(y)
+
+
+def chorus_pad(seconds, rng):
+    """Detuned saw voices with a slow pitch LFO (beating partials)."""
+    t = np.arange(int(seconds * SR)) / SR
+    y = np.zeros(len(t))
+    for m in (48, 55, 60, 64):
+        lfo = 3 * np.sin(2 * np.pi * 0.4 * t + rng.uniform(0, 2 * np.pi))
+        for detune in (-8, 0, 8):
+            y += _harmonics(440 * 2 ** ((m + (detune + lfo) / 100 - 69) / 12), lambda k, fk: 1.0 / k)
+    return _normalize(y)
+
+
+def drums(seconds, rng, bpm=110.0):
+    n = int(seconds * SR)
+    y = np.zeros(n)
+    for i, start in enumerate(np.arange(0, seconds, 30 / bpm)):
+        pos = int(start * SR)
+        length = min(int(0.3 * SR), n - pos)
+        tt = np.arange(length) / SR
+        if i % 4 == 0:
+            y[pos:pos + length] += np.sin(2 * np.pi * (50 + 100 * np.exp(-30 * tt)) * tt) * np.exp(-12 * tt)
+        elif i % 4 == 2:
+            y[pos:pos + length] += rng.normal(0, 0.5, length) * np.exp(-25 * tt)
+        hat = min(int(0.05 * SR), n - pos)
+        y[pos:pos + hat] += rng.normal(0, 0.2, hat) * np.exp(-80 * np.arange(hat) / SR)
+    return _normalize(y)
+
+
+def click(seconds, bpm=120.0):
+    y = np.zeros(int(seconds * SR))
+    tick = np.hanning(400)[200:]
+    for pos in range(0, len(y), int(60 / bpm * SR)):
+        end = min(len(y), pos + len(tick))
+        y[pos:end] += tick[:end - pos]
+    return y
+
+
+def _mix(*parts):
+    y = sum(gain * part for gain, part in parts)
+    return (_normalize(y) * 0.8).astype(np.float32)
+
+
+def cases(seconds, seed):
+    """``(name, has_vocals, mixture, vocal stem)`` test tracks."""
+    rng = np.random.default_rng(seed)
+    s = seconds
+    out = []
+
+    # (name, voice, its gain in the mix, backing parts)
+    voices = [
+        ("sung, a cappella", voice(s, rng), 1.0, []),
+        ("sung over chords + click", voice(s, rng), 1.0, [(0.5, chords(s, rng)), (0.3, click(s))]),
+        ("sung 6 dB under a band", voice(s, rng), 0.5,
+         [(0.5, chords(s, rng)), (0.4, drums(s, rng)), (0.3, melody(s, rng, pluck=True))]),
+        ("straight-tone pop vocal", voice(s, rng, vibrato_cents=8), 0.7,
+         [(0.5, chords(s, rng, piano=True)), (0.4, drums(s, rng))]),
+        ("rap over drums", voice(s, rng, 45, 55, speech=True), 1.0,
+         [(0.5, drums(s, rng)), (0.2, chords(s, rng, chord_seconds=4))]),
+        ("speech", voice(s, rng, 45, 58, speech=True), 1.0, []),
+    ]
+    for name, part, gain, backing in voices:
+        mixture = _mix((gain, part), *backing)
+        # The vocal stem at its level in the mixture
+        scale = 0.8 / (np.max(np.abs(gain * part + sum(g * p for g, p in backing))) + 1e-9)
+        out.append((name, True, mixture, (gain * scale * part).astype(np.float32)))
+
+    instrumentals = [
+        ("chords + click", [(1.0, chords(s, rng)), (0.5, click(s))]),
+        ("piano chords + melody", [(1.0, chords(s, rng, piano=True)), (0.6, melody(s, rng, pluck=True))]),
+        ("fast saw arpeggio + pad + drums",
+         [(0.7, melody(s, rng, note_seconds=0.117)), (0.5, chorus_pad(s, rng)), (0.5, drums(s, rng))]),
+        ("band: chords + bass + drums",
+         [(1.0, chords(s, rng)), (0.6, melody(s, rng, note_seconds=0.5)), (0.6, drums(s, rng))]),
+        ("chorus pad", [(1.0, chorus_pad(s, rng))]),
+        ("drums", [(1.0, drums(s, rng))]),
+        ("white noise", [(1.0, rng.normal(0, 1, int(s * SR)))]),
+        ("440 Hz tone", [(1.0, np.sin(2 * np.pi * 440 * np.arange(int(s * SR)) / SR))]),
+    ]
+    for name, parts in instrumentals:
+        mixture = _mix(*parts)
+        out.append((name, False, mixture, (BLEED * mixture).astype(np.float32)))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Check
+# ---------------------------------------------------------------------------
+
+def _voiced_share(features: FeatureContext) -> float:
+    """Share of frames the mixture gate counts as voiced."""
+    run = np.ones(_VOICED_RUN)
+    starts = np.convolve(features.pitch_motion >= _MOTION_SHARE, run, mode="valid") >= _VOICED_RUN
+    return float(np.mean(np.convolve(starts, run) > 0))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"mixture gate: voiced share >= {_MIN_VOICED_FRACTION}; "
+          f"stem gate: voiced seconds >= {_MIN_VOCAL_SECONDS}")
+    print(f"{'seed':>4}  {'track':<32} {'share':>6} {'mix':>5} {'stem s':>7} {'stem':>5} {'time':>7}")
+    for seed in args.seeds:
+        for name, expected, mixture, stem in cases(args.seconds, seed):
+            features = FeatureContext(mixture, SR)
+            start = time.perf_counter()
+            mix_gate = _detect_vocals_heuristic(features)
+            elapsed = time.perf_counter() - start
+            stem_16k = librosa.resample(stem, orig_sr=SR, target_sr=WHISPER_SR)
+            _, stem_seconds = _vocal_regions(stem_16k, features)
+            stem_gate = stem_seconds >= _MIN_VOCAL_SECONDS
+            wrong = (mix_gate != expected) + (stem_gate != expected)
+            failures += wrong
+            print(
+                f"{seed:>4}  {name:<32} {_voiced_share(features):>6.3f} {str(mix_gate):>5} "
+                f"{stem_seconds:>7.1f} {str(stem_gate):>5} {elapsed:>6.2f}s"
+                + ("  WRONG" if wrong else "")
+            )
+    if failures:
+        print(f"{failures} wrong gate decision(s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,53 @@
 """Music Analyzer — audio feature extraction and creative format mapping."""
 
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Optional
+
+if TYPE_CHECKING:
+    from music_analyzer.models import MusicAnalysisResult
+
 __version__ = "1.0.0"
+
+
+def analyze(
+    path: str | Path,
+    fields: Optional[Iterable[str]] = None,
+    formatters: Iterable[str] = (),
+    use_cache: bool = True,
+    run_separation: bool = True,
+    jobs: Optional[int] = 1,
+) -> MusicAnalysisResult:
+    """Analyze an audio file, computing only the requested result fields.
+
+    ``fields`` names fields of ``MusicAnalysisResult`` (``"rhythm"``,
+    ``"emotion"``, ``"color_palette"``, ... or a sub-field such as
+    ``"rhythm.bpm"``); ``formatters`` adds the fields a formatter command
+    reads (``"dreamina"``, ``"storyboard"``, ``"color-palette"``). Only the
+    analyzers behind them run, and cached results are reused per analyzer
+    (see ``scheduler.analyze_fields``). With neither, everything is computed.
+
+    Parameters
+    ----------
+    path : audio file
+    fields : result fields to compute
+    formatters : formatter commands whose input fields to compute
+    use_cache : reuse / store cached results and features
+    run_separation : run demucs source separation when ``timbre`` is requested
+    jobs : worker processes; 1 runs sequentially, ``None`` picks from the CPU count
+    """
+    # Imported here so ``import music_analyzer`` stays light (CLI startup)
+    from music_analyzer.scheduler import analyze_fields
+
+    audio_path = Path(path).expanduser().resolve()
+    if not audio_path.is_file():
+        raise FileNotFoundError(f"file not found: {audio_path}")
+    return analyze_fields(
+        audio_path,
+        fields=fields,
+        formatters=formatters,
+        run_separation=run_separation,
+        jobs=jobs,
+        use_cache=use_cache,
+    )
@@ -6,13 +6,15 @@ spectral heuristics.
 
 from __future__ import annotations
 
+import sys
+from functools import lru_cache
 from typing import Optional
 
 import numpy as np
-import librosa
 
+from music_analyzer.analyzers.features import FeatureContext, ensure_features
 from music_analyzer.config import HAS_CLAP
-from music_analyzer.models import EmotionAnalysis
+from music_analyzer.models import EmotionAnalysis, SectionEmotion, SongSection
 
 
 # Emotion labels for CLAP classification
@@ -28,6 +30,17 @@ _CLAP_GENRE_LABELS = [
     "blues", "reggae", "funk", "soul",
 ]
 
+# Prompts whose CLAP text embeddings the labels are matched against
+_CLAP_EMOTION_TEXTS = [f"This music sounds {e}" for e in _CLAP_EMOTION_LABELS]
+_CLAP_GENRE_TEXTS = [f"This is {g} music" for g in _CLAP_GENRE_LABELS]
+
+# CLAP input length (s); longer clips would be cropped at random by the model
+_CLAP_WINDOW = 10.0
+
+# Windows per forward pass, and windows used when no sections are known
+_CLAP_BATCH = 16
+_CLAP_MAX_WINDOWS = 12
+
 # Heuristic mood mapping based on spectral/rhythm features
 _MOOD_MAP = {
     "high_energy_major": {"emotion": "happy", "tags": ["upbeat", "bright", "joyful"]},
@@ -44,6 +57,8 @@ def analyze_emotion(
     sr: int,
     key_mode: Optional[str] = None,
     bpm: Optional[float] = None,
+    features: Optional[FeatureContext] = None,
+    sections: Optional[list[SongSection]] = None,
 ) -> EmotionAnalysis:
     """Analyze emotional content of audio.
 
@@ -53,27 +68,32 @@ def analyze_emotion(
     sr : sample rate
     key_mode : detected key mode ('major' or 'minor') for heuristic fallback
     bpm : detected BPM for heuristic fallback
+    features : shared feature context (computed on demand if omitted)
+    sections : song sections (from rhythm) to classify individually with CLAP
     """
-    if HAS_CLAP:
+    features = ensure_features(y, sr, features)
+
+    # CLAP embeds the audio itself (a streamed context has no waveform)
+    if HAS_CLAP and features.y is not None:
         try:
-            return _analyze_clap(y, sr)
-        except Exception:
-            pass
+            return _analyze_clap(features, sections)
+        except Exception as e:
+            print(f"CLAP emotion error: {e}; using heuristics", file=sys.stderr)
 
-    return _analyze_heuristic(y, sr, key_mode, bpm)
+    return _analyze_heuristic(features, key_mode, bpm)
 
 
 def _analyze_heuristic(
-    y: np.ndarray,
-    sr: int,
+    features: FeatureContext,
     key_mode: Optional[str] = None,
     bpm: Optional[float] = None,
 ) -> EmotionAnalysis:
     """Heuristic emotion analysis using spectral and rhythm features."""
-    duration = float(librosa.get_duration(y=y, sr=sr))
+    sr = features.sr
+    duration = features.duration
 
     # --- Energy ---
-    rms = librosa.feature.rms(y=y)[0]
+    rms = features.rms
     # Use percentile-based normalization to avoid saturation
     rms_ref = float(np.percentile(rms, 95)) if len(rms) > 0 else 0.15
     rms_ref = max(rms_ref, 0.01)
@@ -89,9 +109,9 @@ def _analyze_heuristic(
             energy_curve.append(round(float(np.clip(np.mean(seg) / rms_ref, 0, 1)), 3))
 
     # --- Spectral features for mood ---
-    spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
-    spectral_rolloff = np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr))
-    zcr = np.mean(librosa.feature.zero_crossing_rate(y))
+    spectral_centroid = np.mean(features.spectral_centroid)
+    spectral_rolloff = np.mean(features.spectral_rolloff)
+    zcr = np.mean(features.zcr)
 
     # Brightness indicator (high spectral centroid = brighter)
     brightness = float(np.clip(spectral_centroid / (sr / 2), 0, 1))
@@ -122,7 +142,7 @@ def _analyze_heuristic(
     mood_info = _MOOD_MAP.get(mood_key, _MOOD_MAP["mid_energy_major"])
 
     primary_emotion = mood_info["emotion"]
-    mood_tags = mood_info["tags"]
+    mood_tags = list(mood_info["tags"])
 
     # Additional tags based on features
     if tempo and tempo > 140:
@@ -170,37 +190,44 @@ def _guess_genre_heuristic(energy: float, brightness: float, bpm: float, zcr: fl
     return "unknown"
 
 
-def _analyze_clap(y: np.ndarray, sr: int) -> EmotionAnalysis:
-    """CLAP-based emotion and genre classification."""
+def _analyze_clap(
+    features: FeatureContext, sections: Optional[list[SongSection]] = None
+) -> EmotionAnalysis:
+    """CLAP-based emotion and genre classification.
+
+    The track is cut into windows (the detected sections, else evenly
+    spaced ``_CLAP_WINDOW`` clips), all embedded in batched forward passes.
+    Each window is classified on its own; the track-level scores are the
+    duration-weighted mean of the window scores.
+    """
     import torch
-    import laion_clap
 
-    # Load CLAP model
-    model = laion_clap.CLAP_Module(enable_fusion=False)
-    model.load_ckpt()
+    from music_analyzer.utils.warm_models import CLAP_SR, get_clap_model, model_lock
 
-    # Resample to 48kHz for CLAP
-    if sr != 48000:
-        y_48k = librosa.resample(y, orig_sr=sr, target_sr=48000)
-    else:
-        y_48k = y
+    # Load CLAP model (cached for the lifetime of the process)
+    model = get_clap_model()
 
-    # Get audio embedding
-    audio_embed = model.get_audio_embedding_from_data(
-        [y_48k], use_tensor=True
-    )
+    # 48 kHz input, decoded from the source when the loader provided it
+    y_48k = features.waveform(CLAP_SR)
 
-    # Classify emotions
-    emotion_texts = [f"This music sounds {e}" for e in _CLAP_EMOTION_LABELS]
-    text_embed = model.get_text_embedding(emotion_texts, use_tensor=True)
+    windows = _clap_windows(features.duration, sections)
+    clips = [_clap_clip(y_48k, start, end) for _, start, end in windows]
+    # Numpy in and out: use_tensor=True expects torch clips and keeps the
+    # embeddings on the model device
+    with model_lock(model), torch.no_grad():
+        audio_embed = np.concatenate([
+            model.get_audio_embedding_from_data(clips[i:i + _CLAP_BATCH], use_tensor=False)
+            for i in range(0, len(clips), _CLAP_BATCH)
+        ])
+    text_embed = _label_embeddings(tuple(_CLAP_EMOTION_TEXTS))
+    genre_embed = _label_embeddings(tuple(_CLAP_GENRE_TEXTS))
 
-    similarity = torch.nn.functional.cosine_similarity(
-        audio_embed.unsqueeze(1),
-        text_embed.unsqueeze(0),
-        dim=2,
-    )[0]
+    weights = np.array([end - start for _, start, end in windows])
+    weights = weights / max(float(weights.sum()), 1e-8)
 
-    emotion_scores = torch.softmax(similarity * 10, dim=0).cpu().numpy()
+    # Classify emotions (per window, then weighted over the track)
+    window_scores = _clap_scores(audio_embed, text_embed)
+    emotion_scores = weights @ window_scores
     top_idx = int(np.argmax(emotion_scores))
     primary_emotion = _CLAP_EMOTION_LABELS[top_idx]
 
@@ -208,22 +235,26 @@ def _analyze_clap(y: np.ndarray, sr: int) -> EmotionAnalysis:
     sorted_indices = np.argsort(emotion_scores)[::-1]
     secondary = [_CLAP_EMOTION_LABELS[i] for i in sorted_indices[1:4]]
 
+    section_emotions = [
+        SectionEmotion(
+            label=label,
+            start=round(start, 2),
+            end=round(end, 2),
+            primary_emotion=_CLAP_EMOTION_LABELS[int(np.argmax(scores))],
+            confidence=round(float(np.max(scores)), 3),
+        )
+        for (label, start, end), scores in zip(windows, window_scores)
+    ]
+
     # Classify genre
-    genre_texts = [f"This is {g} music" for g in _CLAP_GENRE_LABELS]
-    genre_embed = model.get_text_embedding(genre_texts, use_tensor=True)
-    genre_sim = torch.nn.functional.cosine_similarity(
-        audio_embed.unsqueeze(1),
-        genre_embed.unsqueeze(0),
-        dim=2,
-    )[0]
-    genre_scores = torch.softmax(genre_sim * 10, dim=0).cpu().numpy()
+    genre_scores = weights @ _clap_scores(audio_embed, genre_embed)
     genre = _CLAP_GENRE_LABELS[int(np.argmax(genre_scores))]
 
     # Compute energy/valence/arousal from features + CLAP hints
-    rms = librosa.feature.rms(y=y, sr=sr)[0]
+    rms = features.rms
     overall_energy = float(np.clip(np.mean(rms) / 0.15, 0, 1))
 
-    duration = float(librosa.get_duration(y=y, sr=sr))
+    duration = features.duration
     n_segments = min(10, max(1, int(duration / 5)))
     seg_len = len(rms) // max(n_segments, 1)
     energy_curve = []
@@ -249,5 +280,74 @@ def _analyze_clap(y: np.ndarray, sr: int) -> EmotionAnalysis:
         arousal=round(arousal, 3),
         genre=genre,
         mood_tags=mood_tags,
+        section_emotions=section_emotions,
         method="clap",
     )
+
+
+def _clap_windows(
+    duration: float, sections: Optional[list[SongSection]] = None
+) -> list[tuple[str, float, float]]:
+    """``(label, start, end)`` windows to embed: the sections, else even clips."""
+    if sections:
+        return [(s.label, s.start, s.end) for s in sections if s.end > s.start]
+    n = min(_CLAP_MAX_WINDOWS, max(1, int(np.ceil(duration / _CLAP_WINDOW))))
+    edges = np.linspace(0.0, duration, n + 1)
+    return [("window", float(a), float(b)) for a, b in zip(edges[:-1], edges[1:])]
+
+
+def _clap_clip(y_48k: np.ndarray, start: float, end: float) -> np.ndarray:
+    """At most ``_CLAP_WINDOW`` seconds from the middle of ``[start, end)``."""
+    from music_analyzer.utils.warm_models import CLAP_SR
+
+    center = (start + end) / 2
+    half = min(_CLAP_WINDOW, end - start) / 2
+    a = max(0, int((center - half) * CLAP_SR))
+    b = min(len(y_48k), max(a + 1, int((center + half) * CLAP_SR)))
+    return y_48k[a:b]
+
+
+def _clap_scores(audio_embed: np.ndarray, label_embed: np.ndarray) -> np.ndarray:
+    """Softmax label scores per window, shape (n_windows, n_labels)."""
+    audio = audio_embed / np.maximum(np.linalg.norm(audio_embed, axis=1, keepdims=True), 1e-8)
+    label = label_embed / np.maximum(np.linalg.norm(label_embed, axis=1, keepdims=True), 1e-8)
+    logits = (audio @ label.T) * 10
+    logits -= logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+@lru_cache(maxsize=None)
+def _label_embeddings(texts: tuple[str, ...]) -> np.ndarray:
+    """CLAP text embeddings of the label prompts, computed once and kept on disk.
+
+    Stored under ``CACHE_DIR/clap/`` keyed by the prompts and the CLAP
+    package version, so each install embeds the fixed prompts only once.
+    """
+    import hashlib
+    import json
+    from importlib.metadata import PackageNotFoundError, version
+
+    from music_analyzer.config import CACHE_DIR
+    from music_analyzer.utils.cache import atomic_write
+    from music_analyzer.utils.warm_models import get_clap_model, model_lock
+
+    try:
+        clap_version = version("laion_clap")
+    except PackageNotFoundError:
+        clap_version = "unknown"
+    digest = hashlib.sha1(json.dumps([clap_version, texts]).encode()).hexdigest()[:16]
+    path = CACHE_DIR / "clap" / f"text-{digest}.npy"
+
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        pass
+    model = get_clap_model()
+    with model_lock(model):
+        embed = np.asarray(model.get_text_embedding(list(texts)), dtype=np.float32)
+    try:
+        atomic_write(path, lambda f: np.save(f, embed))
+    except OSError:
+        pass  # Recomputed next time
+    return embed
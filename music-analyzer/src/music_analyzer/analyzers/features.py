@@ -0,0 +1,217 @@
+"""Shared per-track feature store.
+
+Every analyzer works on the same waveform and needs overlapping spectral
+representations (onset envelope, chroma, MFCC, STFT magnitudes, RMS).
+``FeatureContext`` computes each of them once, on first access, so the full
+``analyze`` pipeline does not repeat the same DSP in every analyzer.
+
+With a ``FeatureStore`` attached, the compact features (everything except
+the full STFT) are also persisted per track, so later runs of any command
+on the same file reuse them instead of recomputing.
+"""
+
+from __future__ import annotations
+
+from functools import cached_property, wraps
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+import librosa
+
+from music_analyzer.utils.profiling import span
+
+# Frame parameters shared by all librosa features used in the analyzers
+HOP_LENGTH = 512
+N_FFT = 2048
+
+# Bump when a stored feature's computation changes, to invalidate the cache
+FEATURE_VERSION = 1
+
+if TYPE_CHECKING:
+    from music_analyzer.utils.cache import FeatureStore
+
+
+def _stored(method):
+    """``cached_property`` that is also loaded from / saved to the feature store."""
+
+    @wraps(method)
+    def wrapper(self):
+        with span(f"feature:{method.__name__}", "feature"):
+            if self.store is None:
+                return method(self)
+            name = f"{method.__name__}-sr{self.sr}-v{FEATURE_VERSION}"
+            value = self.store.load(name)
+            if value is None:
+                value = method(self)
+                self.store.save(name, value)
+            return value
+
+    return cached_property(wrapper)
+
+
+class FeatureContext:
+    """Lazily computed spectral features for a single waveform.
+
+    All properties are computed with librosa's default frame parameters
+    (``n_fft=2048``, ``hop_length=512``), so results are identical to
+    calling the corresponding ``librosa.feature`` function on ``y`` directly.
+
+    Parameters
+    ----------
+    y : audio waveform (mono)
+    sr : sample rate
+    store : optional per-track cache for the compact features (read-only memmaps)
+    waveforms : the same track decoded at other rates, keyed by ``(sample_rate, mono)``
+    """
+
+    def __init__(
+        self,
+        y: np.ndarray,
+        sr: int,
+        store: Optional[FeatureStore] = None,
+        waveforms: Optional[dict[tuple[int, bool], np.ndarray]] = None,
+    ):
+        self.y = y
+        self.sr = sr
+        self.store = store
+        self.waveforms = dict(waveforms or {})
+
+    def waveform(self, sr: int, mono: bool = True) -> Optional[np.ndarray]:
+        """The track at sample rate ``sr``.
+
+        Returns a version decoded directly from the source when the loader
+        provided one; otherwise mono versions are resampled from ``y`` (and
+        kept), and multichannel versions are unavailable (``None``).
+        """
+        if mono and sr == self.sr:
+            return self.y
+        key = (sr, mono)
+        if key not in self.waveforms:
+            if not mono:
+                return None
+            self.waveforms[key] = librosa.resample(self.y, orig_sr=self.sr, target_sr=sr)
+        return self.waveforms[key]
+
+    @cached_property
+    def duration(self) -> float:
+        return float(librosa.get_duration(y=self.y, sr=self.sr))
+
+    # --- Spectrogram representations ---
+
+    @cached_property
+    def stft_mag(self) -> np.ndarray:
+        """STFT magnitude |S|, shape (1 + n_fft/2, n_frames)."""
+        with span("feature:stft_mag", "feature"):
+            return np.abs(librosa.stft(self.y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+
+    @property
+    def n_frames(self) -> int:
+        """Number of STFT frames (centered framing)."""
+        return 1 + len(self.y) // HOP_LENGTH
+
+    def stft_mag_frames(self, frames: np.ndarray) -> np.ndarray:
+        """STFT magnitude for a subset of frames, shape (1 + n_fft/2, len(frames)).
+
+        Slices ``stft_mag`` when it has already been computed; otherwise
+        transforms only the requested frames, so sparse consumers (e.g. a
+        200-point melody contour) do not pay for the full spectrogram.
+        """
+        frames = np.asarray(frames, dtype=int)
+        if "stft_mag" in self.__dict__:
+            return self.stft_mag[:, frames]
+
+        # Same framing as librosa.stft(center=True, pad_mode="constant")
+        padded = np.pad(self.y, N_FFT // 2)
+        segments = padded[frames[:, None] * HOP_LENGTH + np.arange(N_FFT)[None, :]]
+        window = librosa.filters.get_window("hann", N_FFT, fftbins=True)
+        spectrum = np.fft.rfft(segments * window, axis=1).astype(
+            librosa.util.dtype_r2c(self.y.dtype)
+        )
+        return np.abs(spectrum).T
+
+    @cached_property
+    def fft_freqs(self) -> np.ndarray:
+        return librosa.fft_frequencies(sr=self.sr, n_fft=N_FFT)
+
+    @_stored
+    def band_energy(self) -> np.ndarray:
+        """Total power per STFT bin over the whole track, shape (1 + n_fft/2,)."""
+        return np.sum(self.stft_mag ** 2, axis=1)
+
+    @_stored
+    def mel_db(self) -> np.ndarray:
+        """Log-power mel spectrogram (128 bands), as used by MFCC and onset strength."""
+        mel = librosa.feature.melspectrogram(S=self.stft_mag ** 2, sr=self.sr)
+        return librosa.power_to_db(mel)
+
+    @_stored
+    def loudness_steps(self) -> np.ndarray:
+        """K-weighted energy per 100 ms step, for EBU R128 loudness (see ``loudness``)."""
+        from music_analyzer.analyzers.loudness import loudness_steps
+
+        return loudness_steps(self.y, self.sr)
+
+    # --- Onset envelopes ---
+
+    @_stored
+    def onset_env(self) -> np.ndarray:
+        """Mean-aggregated onset strength envelope."""
+        return librosa.onset.onset_strength(S=self.mel_db, sr=self.sr)
+
+    @_stored
+    def onset_env_median(self) -> np.ndarray:
+        """Median-aggregated onset strength, as used internally by ``beat_track``."""
+        return librosa.onset.onset_strength(S=self.mel_db, sr=self.sr, aggregate=np.median)
+
+    # --- Timbre / harmony features ---
+
+    @_stored
+    def mfcc(self) -> np.ndarray:
+        return librosa.feature.mfcc(S=self.mel_db, sr=self.sr, n_mfcc=13)
+
+    @_stored
+    def chroma_cqt(self) -> np.ndarray:
+        return librosa.feature.chroma_cqt(y=self.y, sr=self.sr, hop_length=HOP_LENGTH)
+
+    @_stored
+    def hpcp(self) -> np.ndarray:
+        """Essentia HPCP frames for chord detection, shape (n_frames, 36) (see ``tonality``)."""
+        from music_analyzer.analyzers.tonality import hpcp_frames
+
+        return hpcp_frames(self.y, self.sr)
+
+    @_stored
+    def pitch_motion(self) -> np.ndarray:
+        """Per-frame coherent pitch glide of the tonal peaks, for vocal detection (see ``lyrics``)."""
+        from music_analyzer.analyzers.lyrics import pitch_motion
+
+        return pitch_motion(self.stft_mag, self.sr)
+
+    @_stored
+    def spectral_centroid(self) -> np.ndarray:
+        return librosa.feature.spectral_centroid(S=self.stft_mag, sr=self.sr)[0]
+
+    @_stored
+    def spectral_bandwidth(self) -> np.ndarray:
+        return librosa.feature.spectral_bandwidth(S=self.stft_mag, sr=self.sr)[0]
+
+    @_stored
+    def spectral_rolloff(self) -> np.ndarray:
+        return librosa.feature.spectral_rolloff(S=self.stft_mag, sr=self.sr)[0]
+
+    # --- Time-domain features ---
+
+    @_stored
+    def rms(self) -> np.ndarray:
+        return librosa.feature.rms(y=self.y, hop_length=HOP_LENGTH)[0]
+
+    @_stored
+    def zcr(self) -> np.ndarray:
+        return librosa.feature.zero_crossing_rate(self.y, hop_length=HOP_LENGTH)[0]
+
+
+def ensure_features(y: np.ndarray, sr: int, features: Optional[FeatureContext]) -> FeatureContext:
+    """Return ``features`` if given, otherwise a fresh context for ``(y, sr)``."""
+    if features is not None:
+        return features
+    return FeatureContext(y, sr)
@@ -0,0 +1,251 @@
+"""EBU R128 loudness (ITU-R BS.1770-4 / EBU Tech 3341, 3342).
+
+``LoudnessMeter`` measures a signal block by block. Each block is K-weighted
+(high shelf + high pass, filter state carried over between blocks) and its
+energy is summed into 100 ms steps. Only those step energies are kept, so a
+track of any length needs neither a float64 copy nor the whole signal.
+Every loudness value is then a window over the steps:
+
+- momentary: 400 ms windows (4 steps)
+- short-term: 3 s windows (30 steps)
+- integrated: 400 ms blocks with 75 % overlap, gated at -70 LUFS absolute
+  and -10 LU relative; the block layout follows pyloudnorm, so the value
+  matches ``pyloudnorm.Meter(sr).integrated_loudness`` on the same signal
+- loudness range (LRA): spread between the 10th and 95th percentile of the
+  short-term values (10 per second), gated at -70 LUFS absolute and -20 LU
+  relative
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from music_analyzer.models import LoudnessCurves
+
+# Gating block length (s) and step (fraction of a block) of BS.1770-4
+_BLOCK = 0.4
+_STEP = 0.25
+# Steps per momentary (400 ms) and short-term (3 s) window
+_MOMENTARY_STEPS = 4
+_SHORT_TERM_STEPS = 30
+
+_ABSOLUTE_GATE = -70.0
+_RELATIVE_GATE = -10.0
+_LRA_RELATIVE_GATE = -20.0
+_LRA_PERCENTILES = (10, 95)
+
+# Seconds between points of the loudness curves
+CURVE_HOP = 1.0
+
+# Samples filtered at once when metering a waveform held in memory
+_CHUNK = 1 << 18
+
+
+class Loudness(NamedTuple):
+    """Loudness measurements of one signal; ``None`` where the signal is too
+    short or entirely below the absolute gate."""
+
+    integrated: Optional[float]
+    range: Optional[float]
+    momentary_max: Optional[float]
+    short_term_max: Optional[float]
+    curves: Optional[LoudnessCurves]
+
+
+@lru_cache(maxsize=None)
+def _k_weighting(sr: int) -> np.ndarray:
+    """K-weighting filter at ``sr`` as second-order sections, shape (2, 6).
+
+    The pre-filter (high shelf, +4 dB above ~1.5 kHz) and the RLB high pass
+    (38 Hz) are designed with the RBJ cookbook formulas, like pyloudnorm's
+    "K-weighting" filter class.
+    """
+    sections = []
+
+    A = 10 ** (4.0 / 40.0)
+    w0 = 2.0 * np.pi * 1500.0 / sr
+    alpha = np.sin(w0) / (2.0 * (1 / np.sqrt(2)))
+    cos, root = np.cos(w0), 2 * np.sqrt(A) * alpha
+    sections.append([
+        A * ((A + 1) + (A - 1) * cos + root),
+        -2 * A * ((A - 1) + (A + 1) * cos),
+        A * ((A + 1) + (A - 1) * cos - root),
+        (A + 1) - (A - 1) * cos + root,
+        2 * ((A - 1) - (A + 1) * cos),
+        (A + 1) - (A - 1) * cos - root,
+    ])
+
+    w0 = 2.0 * np.pi * 38.0 / sr
+    alpha = np.sin(w0) / (2.0 * 0.5)
+    cos = np.cos(w0)
+    sections.append([(1 + cos) / 2, -(1 + cos), (1 + cos) / 2, 1 + alpha, -2 * cos, 1 - alpha])
+
+    sos = np.array(sections)
+    return sos / sos[:, 3:4]
+
+
+def _step_bound(k: np.ndarray | int, sr: int) -> np.ndarray | int:
+    """First sample of 100 ms step ``k`` (same rounding as pyloudnorm's blocks)."""
+    return (_BLOCK * (np.asarray(k) * _STEP) * sr).astype(np.int64)
+
+
+class LoudnessMeter:
+    """Accumulates the K-weighted energy of a signal in 100 ms steps.
+
+    Feed consecutive blocks with ``feed`` (shape ``(n,)``, or ``(n, channels)``
+    with the channels weighted equally, as for mono / stereo in BS.1770);
+    ``steps`` returns the energy (sum of squares) per step, the last step
+    possibly partial.
+
+    Parameters
+    ----------
+    sr : sample rate of the blocks
+    """
+
+    def __init__(self, sr: int):
+        self.sr = sr
+        self.n_samples = 0
+        self._sos = _k_weighting(sr)
+        self._zi: Optional[np.ndarray] = None
+        self._steps: list[np.ndarray] = []
+        self._step = 0  # Index of the step being filled
+        self._partial = 0.0
+
+    def feed(self, block: np.ndarray) -> None:
+        """Add the next ``block`` of samples."""
+        from scipy.signal import sosfilt
+
+        block = np.asarray(block, dtype=np.float64)
+        if not len(block):
+            return
+        if self._zi is None:
+            self._zi = np.zeros((len(self._sos), 2) + block.shape[1:])
+        weighted, self._zi = sosfilt(self._sos, block, axis=0, zi=self._zi)
+        power = weighted ** 2
+        if power.ndim > 1:
+            power = power.sum(axis=1)
+
+        # Steps that start inside this block close the one being filled
+        start, end = self.n_samples, self.n_samples + len(power)
+        last = int(end / (_BLOCK * _STEP * self.sr)) + 2
+        bounds = _step_bound(np.arange(self._step + 1, last + 1), self.sr)
+        cuts = bounds[(bounds > start) & (bounds <= end)] - start
+        cumulative = np.concatenate(([0.0], np.cumsum(power)))
+        sums = np.diff(cumulative[np.concatenate(([0], cuts, [len(power)]))])
+        if len(cuts):
+            self._steps.append(np.concatenate(([self._partial + sums[0]], sums[1:-1])))
+            self._partial = float(sums[-1])
+        else:
+            self._partial += float(sums[0])
+        self._step += len(cuts)
+        self.n_samples = end
+
+    def steps(self) -> np.ndarray:
+        """Energy per 100 ms step so far, shape (n_steps,)."""
+        steps = list(self._steps)
+        if self.n_samples > _step_bound(self._step, self.sr):
+            steps.append(np.array([self._partial]))
+        return np.concatenate(steps) if steps else np.zeros(0)
+
+
+def loudness_steps(y: np.ndarray, sr: int) -> np.ndarray:
+    """Step energies of a waveform held in memory, filtered in chunks."""
+    meter = LoudnessMeter(sr)
+    for start in range(0, len(y), _CHUNK):
+        meter.feed(y[start:start + _CHUNK])
+    return meter.steps()
+
+
+def measure_loudness(steps: np.ndarray, sr: int, duration: float) -> Loudness:
+    """Loudness measurements from the step energies of ``LoudnessMeter``.
+
+    Parameters
+    ----------
+    steps : energy per 100 ms step (``LoudnessMeter.steps``)
+    sr : sample rate the steps were measured at
+    duration : signal length in seconds
+    """
+    # windows(n)[k]: mean square of the n steps ending at step k
+    cumulative = np.concatenate(([0.0], np.cumsum(steps)))
+
+    def windows(n: int) -> np.ndarray:
+        ends = np.arange(1, len(steps) + 1)
+        return (cumulative[ends] - cumulative[np.maximum(ends - n, 0)]) / (n * _BLOCK * _STEP * sr)
+
+    # Integrated: the gating blocks of pyloudnorm (the last ones may reach
+    # past the end of the signal, which counts as silence)
+    n_blocks = int(np.round((duration - _BLOCK) / (_BLOCK * _STEP))) + 1
+    if n_blocks < 1 or not len(steps):
+        return Loudness(None, None, None, None, None)
+    padded = np.concatenate((cumulative, np.full(_MOMENTARY_STEPS, cumulative[-1])))
+    j = np.arange(n_blocks)
+    blocks = (padded[j + _MOMENTARY_STEPS] - padded[j]) / (_BLOCK * sr)
+    integrated = _gated_loudness(blocks)
+
+    momentary = windows(_MOMENTARY_STEPS)
+    short_term = windows(_SHORT_TERM_STEPS)
+    complete_m = momentary[_MOMENTARY_STEPS - 1:]
+    complete_s = short_term[_SHORT_TERM_STEPS - 1:]
+
+    return Loudness(
+        integrated=_round(integrated),
+        range=_round(_loudness_range(_lufs(complete_s))),
+        momentary_max=_round(float(_lufs(complete_m.max()))) if len(complete_m) else None,
+        short_term_max=_round(float(_lufs(complete_s.max()))) if len(complete_s) else None,
+        curves=_curves(_lufs(momentary), _lufs(short_term)),
+    )
+
+
+def _lufs(mean_square: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return -0.691 + 10.0 * np.log10(mean_square)
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None or not np.isfinite(value) else round(float(value), 1)
+
+
+def _gated_loudness(blocks: np.ndarray) -> Optional[float]:
+    """Integrated loudness of gating-block mean squares (BS.1770-4 eq. 4–7)."""
+    levels = _lufs(blocks)
+    above = levels >= _ABSOLUTE_GATE
+    if not above.any():
+        return None
+    relative = float(_lufs(blocks[above].mean())) + _RELATIVE_GATE
+    gated = (levels > relative) & (levels > _ABSOLUTE_GATE)
+    if not gated.any():
+        return None
+    return float(_lufs(blocks[gated].mean()))
+
+
+def _loudness_range(short_term: np.ndarray) -> Optional[float]:
+    """LRA of short-term loudness values (EBU Tech 3342)."""
+    levels = short_term[short_term >= _ABSOLUTE_GATE]
+    if not len(levels):
+        return None
+    relative = 10 * np.log10(np.mean(10 ** (levels / 10))) + _LRA_RELATIVE_GATE
+    levels = levels[levels >= relative]
+    if not len(levels):
+        return None
+    low, high = np.percentile(levels, _LRA_PERCENTILES)
+    return float(high - low)
+
+
+def _curves(momentary: np.ndarray, short_term: np.ndarray) -> LoudnessCurves:
+    """Short-term loudness and the momentary maximum every ``CURVE_HOP`` seconds.
+
+    Windows that start before the signal count the missing part as silence;
+    values below the absolute gate are reported as the gate (-70 LUFS).
+    """
+    per_point = int(round(CURVE_HOP / (_BLOCK * _STEP)))
+    n_points = -(-len(short_term) // per_point)
+    ends = np.minimum((np.arange(n_points) + 1) * per_point, len(short_term)) - 1
+    peaks = np.maximum.reduceat(momentary, np.arange(0, len(momentary), per_point))
+
+    def floor(values: np.ndarray) -> list[float]:
+        return [round(float(v), 1) for v in np.maximum(values, _ABSOLUTE_GATE)]
+
+    return LoudnessCurves(hop=CURVE_HOP, short_term=floor(short_term[ends]), momentary_max=floor(peaks))
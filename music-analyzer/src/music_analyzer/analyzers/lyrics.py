@@ -1,4 +1,12 @@
-"""Lyrics transcription using faster-whisper (optional dependency)."""
+"""Lyrics transcription using faster-whisper (optional dependency).
+
+Whisper is the most expensive analyzer, so it is gated on vocal presence:
+tracks judged instrumental are not transcribed at all. When Demucs stems
+of the track are cached, the vocal stem decides (its frame energy against
+the mixture's), and Whisper hears only the vocal-active regions of the
+stem; otherwise the pitch motion of the mixture's tonal peaks decides
+(voices glide in pitch, instruments hold their notes).
+"""
 
 from __future__ import annotations
 
@@ -8,15 +16,60 @@ from typing import Optional
 
 import numpy as np
 
+from music_analyzer.analyzers.features import HOP_LENGTH, FeatureContext, ensure_features
 from music_analyzer.config import HAS_FASTER_WHISPER
 from music_analyzer.models import LyricSegment, LyricsAnalysis
 
+# Vocal-stem gate: RMS frame length (s), absolute floor (dBFS) and level
+# relative to the mixture over the same frame (dB) for a frame to count as
+# voiced; separation bleed on an instrumental stays well below the mixture
+_GATE_FRAME = 0.1
+_GATE_FLOOR_DB = -50.0
+_GATE_MIX_DB = -15.0
+
+# Seconds kept around voiced frames so word onsets / tails are not clipped
+_GATE_PAD = 0.5
+
+# Less voiced time than this (s) in the vocal stem means instrumental
+_MIN_VOCAL_SECONDS = 2.0
+
+# Mixture gate: a frame is voiced when at least this share of its tonal peak
+# magnitude glides together (``pitch_motion``), in runs of at least
+# ``_VOICED_RUN`` frames; the track has vocals when at least
+# ``_MIN_VOICED_FRACTION`` of its frames are voiced. Fitted on the synthetic
+# voices and instrumentals of ``benchmarks/bench_vocal_gate.py``
+_MOTION_SHARE = 0.2
+_VOICED_RUN = 3
+_MIN_VOICED_FRACTION = 0.05
+
+# ``pitch_motion`` peaks: band (Hz), prominence over the surrounding bins and
+# range below the frame's strongest peak (dB), floor (dB relative to a full-scale
+# sine); followed across at most ``_MOTION_MAX_BINS``, moving when shifted by
+# more than ``_MOTION_MIN_BINS``, a glide when ``_MOTION_MIN_PEAKS`` moving
+# peaks have a median shift of at least ``_MOTION_MIN_CENTS``
+_MOTION_BAND = (200.0, 4000.0)
+_PEAK_PROMINENCE_DB = 10.0
+_PEAK_NEIGHBOURS = 8
+_PEAK_RANGE_DB = 50.0
+_PEAK_FLOOR_DB = -70.0
+_MOTION_MAX_BINS = 4
+_MOTION_MIN_BINS = 0.1
+_MOTION_MIN_PEAKS = 3
+_MOTION_MIN_CENTS = 6.0
+
+# STFT frames per ``pitch_motion`` pass (bounds its temporary arrays)
+_MOTION_CHUNK = 2048
+
 
 def analyze_lyrics(
     y: np.ndarray,
     sr: int,
     audio_path: Optional[Path] = None,
     model_size: str = "base",
+    features: Optional[FeatureContext] = None,
+    vocal_stem: Optional[Path] = None,
+    vocal_gate: bool = True,
+    whisper_workers: Optional[int] = None,
 ) -> LyricsAnalysis:
     """Transcribe lyrics from audio.
 
@@ -26,10 +79,29 @@ def analyze_lyrics(
     sr : sample rate
     audio_path : original file path (faster-whisper can read directly)
     model_size : whisper model size: tiny, base, small, medium, large-v2
+    features : shared feature context (computed on demand if omitted)
+    vocal_stem : separated vocals of this track (e.g. cached Demucs output)
+    vocal_gate : skip transcription when no vocals are detected, and
+        transcribe only the voiced regions of ``vocal_stem``; when off, the
+        full mixture is always transcribed
+    whisper_workers : concurrent decoders for long recordings (default: half
+        the CPU cores); see ``_transcribe_chunked``
     """
-    if not HAS_FASTER_WHISPER:
-        # Check if vocals are present using energy heuristic
-        has_vocals = _detect_vocals_heuristic(y, sr)
+    features = ensure_features(y, sr, features)
+
+    stem = _load_vocal_stem(vocal_stem) if vocal_gate and vocal_stem is not None else None
+    if stem is not None:
+        regions, vocal_seconds = _vocal_regions(stem, features)
+        has_vocals = vocal_seconds >= _MIN_VOCAL_SECONDS
+    elif vocal_gate or not HAS_FASTER_WHISPER:
+        # Check the mixture for a gliding voice
+        has_vocals = _detect_vocals_heuristic(features)
+    else:
+        has_vocals = True
+
+    # A streamed feature context has no waveform to transcribe
+    streamed = stem is None and features.y is None
+    if not HAS_FASTER_WHISPER or not has_vocals or streamed:
         return LyricsAnalysis(
             segments=[],
             full_text="",
@@ -38,75 +110,240 @@ def analyze_lyrics(
             method="none",
         )
 
-    return _transcribe_whisper(y, sr, audio_path, model_size)
+    if stem is not None:
+        audio = np.zeros_like(stem)
+        for start, end in regions:
+            audio[start:end] = stem[start:end]
+    else:
+        from music_analyzer.utils.warm_models import WHISPER_SR
+
+        # 16 kHz input, decoded from the source when the loader provided it
+        audio = features.waveform(WHISPER_SR)
+    return _transcribe_whisper(audio, model_size, whisper_workers)
+
+
+def _load_vocal_stem(path: Path) -> Optional[np.ndarray]:
+    """The vocal stem as 16 kHz mono, or ``None`` if it cannot be read."""
+    from music_analyzer.utils.audio_io import load_audio
+    from music_analyzer.utils.warm_models import WHISPER_SR
+
+    try:
+        stem, _ = load_audio(path, sr=WHISPER_SR, use_cache=False)
+    except Exception:
+        return None  # Evicted or unreadable; fall back to the mixture
+    return stem
+
+
+def _vocal_regions(
+    stem: np.ndarray, features: FeatureContext
+) -> tuple[list[tuple[int, int]], float]:
+    """Voiced sample ranges of a 16 kHz vocal stem, and the voiced seconds.
+
+    A frame is voiced when its RMS is above the absolute floor and no more
+    than ``-_GATE_MIX_DB`` below the mixture's RMS over the same frame
+    (from ``features.rms``); regions are padded by ``_GATE_PAD`` on each
+    side and merged.
+    """
+    from music_analyzer.utils.warm_models import WHISPER_SR
+
+    frame = int(_GATE_FRAME * WHISPER_SR)
+    n = len(stem) // frame
+    if n == 0:
+        return [], 0.0
+    frames = np.asarray(stem[: n * frame], dtype=np.float64).reshape(n, frame)
+    rms_db = 10 * np.log10(np.maximum(np.mean(frames ** 2, axis=1), 1e-20))
+    voiced = (rms_db > _GATE_FLOOR_DB) & (rms_db > _mixture_db(features, n) + _GATE_MIX_DB)
+
+    pad = int(round(_GATE_PAD / _GATE_FRAME))
+    padded = np.convolve(voiced, np.ones(2 * pad + 1), mode="same") > 0
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], padded.astype(np.int8), [0]))))
+    regions = [
+        (int(s) * frame, min(int(e) * frame, len(stem))) for s, e in zip(edges[::2], edges[1::2])
+    ]
+    return regions, float(np.count_nonzero(voiced)) * _GATE_FRAME
+
+
+def _mixture_db(features: FeatureContext, n: int) -> np.ndarray:
+    """Mixture power (dB) over each of the first ``n`` ``_GATE_FRAME`` frames."""
+    rms = np.asarray(features.rms, dtype=np.float64)
+    frame = (np.arange(len(rms)) * HOP_LENGTH / features.sr / _GATE_FRAME).astype(int)
+    frame = np.minimum(frame, n - 1)
+    power = np.bincount(frame, rms ** 2, minlength=n) / np.maximum(
+        np.bincount(frame, minlength=n), 1
+    )
+    return 10 * np.log10(np.maximum(power, 1e-20))
+
+
+def _detect_vocals_heuristic(features: FeatureContext) -> bool:
+    """Whether the mixture contains a voice, from the pitch motion of its tonal peaks.
+
+    Sung, rapped and spoken voices glide in pitch all the time (vibrato,
+    portamento, intonation), with all their harmonics moving together;
+    instruments hold their pitch between notes. A frame is voiced when at
+    least ``_MOTION_SHARE`` of its tonal peak magnitude glides together
+    (``pitch_motion``); voiced frames count only in runs of at least
+    ``_VOICED_RUN`` (a note change moves peaks for a single frame). The
+    track has vocals when at least ``_MIN_VOICED_FRACTION`` of its frames
+    are voiced. A lead instrument played with vibrato reads as a voice (it
+    only costs a transcription); pitch-corrected vocals held flat on every
+    note can read as instrumental, and ``vocal_gate=False`` transcribes
+    regardless.
+    """
+    motion = np.asarray(features.pitch_motion)
+    if len(motion) < _VOICED_RUN:
+        return False
+    run = np.ones(_VOICED_RUN)
+    starts = np.convolve(motion >= _MOTION_SHARE, run, mode="valid") >= _VOICED_RUN
+    voiced = np.convolve(starts, run) > 0
+    return float(np.mean(voiced)) >= _MIN_VOICED_FRACTION
+
+
+def pitch_motion(mag: np.ndarray, sr: int, prev: Optional[np.ndarray] = None) -> np.ndarray:
+    """Per-frame share of the tonal peak magnitude that glides together in pitch.
+
+    Spectral peaks in ``_MOTION_BAND`` (local maxima ``_PEAK_PROMINENCE_DB``
+    above the mean of the surrounding bins, within ``_PEAK_RANGE_DB`` of the
+    frame's strongest peak) are located to a fraction of a bin and followed
+    to the nearest peak of the previous frame. When at least
+    ``_MOTION_MIN_PEAKS`` of them moved in the same direction by a median of
+    ``_MOTION_MIN_CENTS`` or more, the frame scores their share of the
+    followed peaks' magnitude; otherwise 0. Beating and chorus wobble
+    partials by a few cents in no common direction.
+
+    Each frame depends only on itself and the one before, so a stream can
+    compute the series block by block.
+
+    Parameters
+    ----------
+    mag : STFT magnitude, shape (1 + n_fft/2, n_frames)
+    sr : sample rate
+    prev : magnitude of the frame before ``mag[:, 0]`` (none for a track's
+        first frame, which scores 0)
+    """
+    n_fft = 2 * (mag.shape[0] - 1)
+    freqs = np.arange(mag.shape[0]) * sr / n_fft
+    band = np.flatnonzero((freqs >= _MOTION_BAND[0]) & (freqs <= _MOTION_BAND[1]))
+    rows = slice(max(band[0] - 1, 0), band[-1] + 2)
+    floor_db = 20 * np.log10(n_fft / 4) + _PEAK_FLOOR_DB
+
+    out = np.zeros(mag.shape[1], dtype=np.float32)
+    last = None if prev is None else _motion_peaks(prev[rows, None], rows.start, floor_db)
+    for start in range(0, mag.shape[1], _MOTION_CHUNK):
+        peaks = _motion_peaks(mag[rows, start:start + _MOTION_CHUNK], rows.start, floor_db)
+        out[start:start + peaks[0].shape[1]] = _glide_share(peaks, last)
+        last = tuple(a[:, -1:] for a in peaks)
+    return out
 
 
-def _detect_vocals_heuristic(y: np.ndarray, sr: int) -> bool:
-    """Simple heuristic to detect presence of vocals based on spectral features.
+def _motion_peaks(
+    mag: np.ndarray, offset: int, floor_db: float
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Tonal peaks of magnitude rows ``offset, offset + 1, ...``.
 
-    Vocals tend to have energy in 300-3400 Hz range with specific spectral patterns.
+    Returns ``(mask, position, magnitude)`` for the inner rows (the outer
+    two only bound the peaks): where a peak is, its interpolated bin and
+    its magnitude.
     """
-    import librosa
+    from scipy.ndimage import uniform_filter1d
 
-    S = np.abs(librosa.stft(y))
-    freqs = librosa.fft_frequencies(sr=sr)
+    level = 20 * np.log10(np.maximum(np.asarray(mag, dtype=np.float64), 1e-10))
+    surround = uniform_filter1d(level, 2 * _PEAK_NEIGHBOURS + 1, axis=0, mode="nearest")
+    below, center, above = level[:-2], level[1:-1], level[2:]
+    mask = (center > below) & (center >= above)
+    mask &= center - surround[1:-1] > _PEAK_PROMINENCE_DB
+    mask &= center > floor_db
+    strongest = np.max(np.where(mask, center, -np.inf), axis=0)
+    mask &= center > strongest - _PEAK_RANGE_DB
 
-    # Vocal frequency range (300-3400 Hz)
-    vocal_mask = (freqs >= 300) & (freqs <= 3400)
-    full_mask = freqs > 0
+    # Parabolic interpolation of the log magnitude
+    curve = below - 2 * center + above
+    shift = np.where(mask & (curve < 0), 0.5 * (below - above) / np.where(curve < 0, curve, -1.0), 0.0)
+    position = offset + 1 + np.arange(len(center))[:, None] + np.clip(shift, -0.5, 0.5)
+    return mask, position, np.where(mask, mag[1:-1], 0.0)
 
-    vocal_energy = float(np.mean(S[vocal_mask, :] ** 2))
-    total_energy = float(np.mean(S[full_mask, :] ** 2))
 
-    vocal_ratio = vocal_energy / max(total_energy, 1e-8)
+def _glide_share(
+    peaks: tuple[np.ndarray, np.ndarray, np.ndarray],
+    last: Optional[tuple[np.ndarray, np.ndarray, np.ndarray]],
+) -> np.ndarray:
+    """``pitch_motion`` of the frames in ``peaks``; ``last`` is the frame before."""
+    mask, position, weight = peaks
+    if last is None:
+        prev_mask = np.zeros_like(mask[:, :1])
+        prev_position = np.zeros_like(position[:, :1])
+    else:
+        prev_mask, prev_position = last[0], last[1]
+    prev_mask = np.concatenate([prev_mask, mask[:, :-1]], axis=1)
+    prev_position = np.concatenate([prev_position, position[:, :-1]], axis=1)
 
-    # If vocal-range energy is dominant, likely has vocals
-    return vocal_ratio > 0.3
+    # Shift to the nearest peak of the previous frame within _MOTION_MAX_BINS
+    reach = _MOTION_MAX_BINS
+    padded_mask = np.pad(prev_mask, ((reach, reach), (0, 0)))
+    padded_position = np.pad(prev_position, ((reach, reach), (0, 0)))
+    n = len(mask)
+    delta = np.full(mask.shape, np.inf)
+    for k in range(2 * reach + 1):
+        d = np.where(padded_mask[k:k + n], position - padded_position[k:k + n], np.inf)
+        delta = np.where(np.abs(d) < np.abs(delta), d, delta)
+    followed = mask & (np.abs(delta) <= reach)
+
+    up = followed & (delta > _MOTION_MIN_BINS)
+    down = followed & (delta < -_MOTION_MIN_BINS)
+    up_weight = np.sum(weight * up, axis=0)
+    down_weight = np.sum(weight * down, axis=0)
+    rising = up_weight >= down_weight
+    moving = np.where(rising, up, down)
+    share = np.where(rising, up_weight, down_weight) / np.maximum(
+        np.sum(weight * followed, axis=0), 1e-12
+    )
+
+    gliding = np.sum(moving, axis=0) >= _MOTION_MIN_PEAKS
+    if gliding.any():
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cents = np.abs(1200 * np.log2(position / (position - delta)))
+        cents = np.where(moving, cents, np.nan)[:, gliding]
+        gliding[gliding] = np.nanmedian(cents, axis=0) >= _MOTION_MIN_CENTS
+    return np.where(gliding, share, 0.0)
+
+
+# faster-whisper decoding settings shared by the single-pass and chunked modes
+_TRANSCRIBE_OPTIONS = dict(
+    beam_size=5,
+    vad_filter=True,
+    vad_parameters=dict(min_silence_duration_ms=500),
+)
+
+# Recordings at least this long (s) are split at VAD silences into chunks of
+# about ``_CHUNK_SECONDS`` that are transcribed concurrently. The chunk plan
+# depends only on the audio, so the worker count changes speed, not output.
+_CHUNKED_MIN_SECONDS = 600.0
+_CHUNK_SECONDS = 120.0
 
 
 def _transcribe_whisper(
-    y: np.ndarray,
-    sr: int,
-    audio_path: Optional[Path],
-    model_size: str,
+    y_16k: np.ndarray, model_size: str, workers: Optional[int] = None
 ) -> LyricsAnalysis:
-    """Transcribe using faster-whisper."""
+    """Transcribe a 16 kHz mono waveform using faster-whisper.
+
+    Long recordings go through ``_transcribe_chunked`` with ``workers``
+    concurrent decoders (default: half the CPU cores).
+    """
     try:
-        from faster_whisper import WhisperModel
-
-        model = WhisperModel(model_size, compute_type="int8")
-
-        # Resample to 16kHz for whisper
-        import librosa
-        if sr != 16000:
-            y_16k = librosa.resample(y, orig_sr=sr, target_sr=16000)
-        else:
-            y_16k = y
-
-        segments_iter, info = model.transcribe(
-            y_16k,
-            beam_size=5,
-            vad_filter=True,
-            vad_parameters=dict(min_silence_duration_ms=500),
-        )
+        from music_analyzer.utils.warm_models import WHISPER_SR, get_whisper_model, model_lock
 
-        segments = []
-        full_texts = []
-        for seg in segments_iter:
-            segments.append(LyricSegment(
-                start=round(seg.start, 2),
-                end=round(seg.end, 2),
-                text=seg.text.strip(),
-                confidence=round(seg.avg_logprob if hasattr(seg, "avg_logprob") else 0.5, 2),
-            ))
-            full_texts.append(seg.text.strip())
+        if len(y_16k) >= _CHUNKED_MIN_SECONDS * WHISPER_SR:
+            return _transcribe_chunked(y_16k, model_size, workers)
 
-        return LyricsAnalysis(
-            segments=segments,
-            full_text=" ".join(full_texts),
-            language=info.language if hasattr(info, "language") else "unknown",
-            has_vocals=len(segments) > 0,
-            method="whisper",
+        model = get_whisper_model(model_size)
+
+        with model_lock(model):
+            segments_iter, info = model.transcribe(y_16k, **_TRANSCRIBE_OPTIONS)
+            # The segment iterator decodes lazily, so consume it under the lock
+            raw_segments = list(segments_iter)
+
+        return _lyrics_result(
+            [(seg, 0.0) for seg in raw_segments],
+            info.language if hasattr(info, "language") else "unknown",
         )
 
     except Exception as e:
@@ -118,3 +355,107 @@ def _transcribe_whisper(
             has_vocals=False,
             method="none",
         )
+
+
+def _chunk_bounds(y_16k: np.ndarray) -> list[tuple[int, int]]:
+    """Split a 16 kHz waveform into ~``_CHUNK_SECONDS`` chunks at VAD silences.
+
+    Cuts fall in the middle of the silence between two speech regions, so
+    the first and last chunk also hold the silence before / after the
+    speech, and a speech region longer than twice the target length is cut
+    evenly. A recording without any speech gives no chunks.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    from music_analyzer.utils.warm_models import WHISPER_SR
+
+    speech = get_speech_timestamps(
+        y_16k, VadOptions(**_TRANSCRIBE_OPTIONS["vad_parameters"]), sampling_rate=WHISPER_SR,
+    )
+    target = int(_CHUNK_SECONDS * WHISPER_SR)
+
+    chunks = []
+    chunk_start, chunk_end = None, None
+    for region in speech:
+        if chunk_start is None:
+            chunk_start = 0
+        elif region["end"] - chunk_start > target:
+            cut = (chunk_end + region["start"]) // 2
+            chunks.append((chunk_start, cut))
+            chunk_start = cut
+        chunk_end = region["end"]
+    if chunk_start is not None:
+        chunks.append((chunk_start, len(y_16k)))
+
+    bounds = []
+    for start, end in chunks:
+        pieces = max(1, (end - start) // target) if end - start > 2 * target else 1
+        edges = np.linspace(start, end, pieces + 1).astype(int)
+        bounds.extend(zip(edges[:-1].tolist(), edges[1:].tolist()))
+    return bounds
+
+
+def _transcribe_chunked(
+    y_16k: np.ndarray, model_size: str, workers: Optional[int] = None
+) -> LyricsAnalysis:
+    """Transcribe VAD-split chunks on a thread pool and stitch the segments.
+
+    One model with ``num_workers`` decoders serves all threads (CTranslate2
+    releases the GIL), and each decoder gets ``cores / workers`` threads.
+    The model settings depend only on ``workers`` and the core count, never
+    on the number of chunks, so every recording reuses the same cached
+    model; the pool size caps how many chunks are decoded at once.
+    """
+    import os
+    from collections import Counter
+    from concurrent.futures import ThreadPoolExecutor
+
+    from music_analyzer.utils.warm_models import WHISPER_SR, get_whisper_model
+
+    bounds = _chunk_bounds(y_16k)
+    if not bounds:
+        return _lyrics_result([], "unknown")
+
+    cores = os.cpu_count() or 1
+    workers = workers or max(1, cores // 2)
+    model = get_whisper_model(model_size, cpu_threads=max(1, cores // workers), num_workers=workers)
+
+    def transcribe(bound: tuple[int, int]):
+        start, end = bound
+        segments_iter, info = model.transcribe(y_16k[start:end], **_TRANSCRIBE_OPTIONS)
+        return list(segments_iter), getattr(info, "language", "unknown"), start / WHISPER_SR
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(bounds))) as pool:
+        chunks = list(pool.map(transcribe, bounds))
+
+    # Language that covers the most transcribed time across chunks
+    spoken: Counter = Counter()
+    for raw_segments, language, _ in chunks:
+        spoken[language] += sum(seg.end - seg.start for seg in raw_segments)
+    language = spoken.most_common(1)[0][0] if spoken else "unknown"
+
+    return _lyrics_result(
+        [(seg, offset) for raw_segments, _, offset in chunks for seg in raw_segments], language,
+    )
+
+
+def _lyrics_result(raw_segments: list[tuple[object, float]], language: str) -> LyricsAnalysis:
+    """Build the result from ``(whisper segment, time offset in s)`` pairs."""
+    segments = []
+    full_texts = []
+    for seg, offset in raw_segments:
+        segments.append(LyricSegment(
+            start=round(seg.start + offset, 2),
+            end=round(seg.end + offset, 2),
+            text=seg.text.strip(),
+            confidence=round(seg.avg_logprob if hasattr(seg, "avg_logprob") else 0.5, 2),
+        ))
+        full_texts.append(seg.text.strip())
+
+    return LyricsAnalysis(
+        segments=segments,
+        full_text=" ".join(full_texts),
+        language=language,
+        has_vocals=len(segments) > 0,
+        method="whisper",
+    )
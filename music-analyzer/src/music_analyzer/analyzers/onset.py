@@ -2,24 +2,33 @@
 
 from __future__ import annotations
 
+from typing import Optional
+
 import numpy as np
 import librosa
 
+from music_analyzer.analyzers.features import FeatureContext, ensure_features
 from music_analyzer.models import OnsetInfo
 
 
-def analyze_onsets(y: np.ndarray, sr: int) -> OnsetInfo:
+def analyze_onsets(
+    y: np.ndarray,
+    sr: int,
+    features: Optional[FeatureContext] = None,
+) -> OnsetInfo:
     """Detect note/event onsets for visual synchronization.
 
     Parameters
     ----------
     y : audio waveform (mono)
     sr : sample rate
+    features : shared feature context (computed on demand if omitted)
     """
-    duration = float(librosa.get_duration(y=y, sr=sr))
+    features = ensure_features(y, sr, features)
+    duration = features.duration
 
     # Onset detection
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+    onset_env = features.onset_env
     onset_frames = librosa.onset.onset_detect(
         y=y, sr=sr, onset_envelope=onset_env, backtrack=True
     )
@@ -2,24 +2,38 @@
 
 from __future__ import annotations
 
+from typing import Optional
+
 import numpy as np
 import librosa
 
+from music_analyzer.analyzers.features import FeatureContext, ensure_features
 from music_analyzer.models import BeatInfo, RhythmAnalysis, SongSection
 
 
-def analyze_rhythm(y: np.ndarray, sr: int) -> RhythmAnalysis:
+def analyze_rhythm(
+    y: np.ndarray,
+    sr: int,
+    features: Optional[FeatureContext] = None,
+) -> RhythmAnalysis:
     """Run full rhythm analysis on audio waveform.
 
     Parameters
     ----------
     y : audio waveform (mono)
     sr : sample rate
+    features : shared feature context (computed on demand if omitted)
     """
-    duration = float(librosa.get_duration(y=y, sr=sr))
+    features = ensure_features(y, sr, features)
+    duration = features.duration
 
     # --- Tempo / BPM ---
-    tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
+    # Same estimate beat_track makes internally (8 s autocorrelation window),
+    # but from a tempogram averaged in blocks (see _mean_tempogram)
+    beat_env = features.onset_env_median
+    ac_frames = int(librosa.time_to_frames(8.0, sr=sr))
+    tempo = librosa.feature.tempo(tg=_mean_tempogram(beat_env, ac_frames), sr=sr)
+    tempo, beat_frames = librosa.beat.beat_track(onset_envelope=beat_env, sr=sr, bpm=tempo)
     if isinstance(tempo, np.ndarray):
         bpm = float(tempo[0])
     else:
@@ -27,25 +41,24 @@ def analyze_rhythm(y: np.ndarray, sr: int) -> RhythmAnalysis:
     beat_times = librosa.frames_to_time(beat_frames, sr=sr)
 
     # BPM confidence via tempogram autocorrelation
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-    tempogram = librosa.feature.tempogram(onset_envelope=onset_env, sr=sr)
-    bpm_confidence = float(np.clip(np.max(np.mean(tempogram, axis=1)) / 10.0, 0.0, 1.0))
+    onset_env = features.onset_env
+    tempogram = _mean_tempogram(onset_env)
+    bpm_confidence = float(np.clip(np.max(tempogram) / 10.0, 0.0, 1.0))
 
     # --- Beat info ---
-    beats = []
-    for i, t in enumerate(beat_times):
-        # Approximate strength from onset envelope
-        frame_idx = librosa.time_to_frames([t], sr=sr)[0]
-        strength = float(np.clip(onset_env[min(frame_idx, len(onset_env) - 1)] / (np.max(onset_env) + 1e-8), 0, 1))
-        beats.append(BeatInfo(time=float(t), strength=strength))
+    strengths = _beat_strengths(beat_times, onset_env, sr)
+    beats = [
+        BeatInfo(time=float(t), strength=float(s))
+        for t, s in zip(beat_times, strengths)
+    ]
 
     # --- Downbeats (estimate every Nth beat for time signature) ---
     time_sig = _estimate_time_signature(onset_env, sr, bpm)
     beats_per_measure = int(time_sig.split("/")[0])
-    downbeats = [float(beat_times[i]) for i in range(0, len(beat_times), beats_per_measure)]
+    downbeats = [float(t) for t in beat_times[::beats_per_measure]]
 
     # --- Structural segmentation ---
-    sections = _segment_structure(y, sr, duration)
+    sections = _segment_structure(features, duration)
 
     return RhythmAnalysis(
         bpm=round(bpm, 1),
@@ -58,91 +71,94 @@ def analyze_rhythm(y: np.ndarray, sr: int) -> RhythmAnalysis:
     )
 
 
+def _mean_tempogram(onset_env: np.ndarray, win_length: int = 384, block: int = 4096) -> np.ndarray:
+    """Time average of ``librosa.feature.tempogram``, shape (win_length, 1).
+
+    Each tempogram frame only depends on its own window of the onset
+    envelope, so frames are built and summed ``block`` at a time instead of
+    materializing the (win_length, n_frames) matrix and its FFT buffers,
+    which for an hour of audio run to gigabytes.
+    """
+    n = len(onset_env)
+    if n == 0:
+        return np.zeros((win_length, 1))
+    # Same centering and window as tempogram(center=True, window="hann")
+    half = win_length // 2
+    padded = np.pad(onset_env, half, mode="linear_ramp", end_values=[0, 0])
+    frames = np.lib.stride_tricks.sliding_window_view(padded, win_length)[:n]
+    window = librosa.filters.get_window("hann", win_length, fftbins=True)
+    total = np.zeros(win_length)
+    for start in range(0, n, block):
+        ac = librosa.autocorrelate(frames[start:start + block] * window, axis=-1)
+        total += np.sum(librosa.util.normalize(ac, norm=np.inf, axis=-1), axis=0)
+    return (total / n)[:, None]
+
+
+def _beat_strengths(beat_times: np.ndarray, onset_env: np.ndarray, sr: int) -> np.ndarray:
+    """Approximate per-beat strength (0-1) from the onset envelope."""
+    if len(beat_times) == 0 or len(onset_env) == 0:
+        return np.zeros(len(beat_times))
+    frame_idx = np.minimum(librosa.time_to_frames(beat_times, sr=sr), len(onset_env) - 1)
+    return np.clip(onset_env[frame_idx] / (np.max(onset_env) + 1e-8), 0, 1)
+
+
 def _estimate_time_signature(onset_env: np.ndarray, sr: int, bpm: float) -> str:
     """Estimate time signature from onset envelope periodicity."""
     # Simple heuristic: check accent patterns in onset envelope
+    if bpm <= 0:
+        return "4/4"
     hop_length = 512
     frames_per_beat = (60.0 / bpm) * sr / hop_length
 
-    if len(onset_env) < int(frames_per_beat * 8):
+    if len(onset_env) < int(frames_per_beat * 8) or int(frames_per_beat * 3) < 1:
         return "4/4"
 
-    # Check energy ratio at 3-beat vs 4-beat groupings
-    energy_3 = 0.0
-    energy_4 = 0.0
-    count_3 = 0
-    count_4 = 0
+    # Check energy ratio at 3-beat vs 4-beat groupings: average onset strength
+    # over the first 30% of a beat at the start of each 3- / 4-beat bar
+    frames = np.arange(len(onset_env))
+    env = onset_env.astype(np.float64)
+    in_3 = (frames % int(frames_per_beat * 3)) < frames_per_beat * 0.3
+    in_4 = (frames % int(frames_per_beat * 4)) < frames_per_beat * 0.3
 
-    for i in range(len(onset_env)):
-        pos_in_3 = (i % int(frames_per_beat * 3))
-        pos_in_4 = (i % int(frames_per_beat * 4))
-
-        if pos_in_3 < frames_per_beat * 0.3:
-            energy_3 += onset_env[i]
-            count_3 += 1
-        if pos_in_4 < frames_per_beat * 0.3:
-            energy_4 += onset_env[i]
-            count_4 += 1
-
-    avg_3 = energy_3 / max(count_3, 1)
-    avg_4 = energy_4 / max(count_4, 1)
+    avg_3 = float(np.sum(env[in_3])) / max(int(np.count_nonzero(in_3)), 1)
+    avg_4 = float(np.sum(env[in_4])) / max(int(np.count_nonzero(in_4)), 1)
 
     if avg_3 > avg_4 * 1.2:
         return "3/4"
     return "4/4"
 
 
-def _segment_structure(y: np.ndarray, sr: int, duration: float) -> list[SongSection]:
-    """Segment song into structural sections using spectral clustering.
+def _segment_structure(features: FeatureContext, duration: float) -> list[SongSection]:
+    """Segment song into structural sections using self-similarity novelty.
 
-    Uses librosa's recurrence matrix and spectral decomposition to find
-    structural boundaries, then labels sections heuristically.
+    Finds structural boundaries from a checkerboard-kernel novelty curve over
+    the feature recurrence matrix, then labels sections heuristically.
     """
-    # Compute features for segmentation
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-    features = np.vstack([
-        librosa.util.normalize(mfcc, axis=1),
-        librosa.util.normalize(chroma, axis=1),
-    ])
+    sr = features.sr
 
-    # Compute novelty curve from feature self-similarity using a checkerboard kernel
-    from scipy.ndimage import convolve
-
-    # Self-similarity via recurrence matrix
-    rec = librosa.segment.recurrence_matrix(
-        features,
-        width=3,
-        mode="affinity",
-        sym=True,
-    )
+    # Stack normalized MFCC + chroma for segmentation
+    seg_features = np.vstack([
+        librosa.util.normalize(features.mfcc, axis=1),
+        librosa.util.normalize(features.chroma_cqt, axis=1),
+    ])
 
-    # Checkerboard kernel novelty detection (replaces removed librosa.segment.novelty)
-    kernel_size = 16
-    k = np.ones((kernel_size, kernel_size))
-    k[:kernel_size // 2, kernel_size // 2:] = -1
-    k[kernel_size // 2:, :kernel_size // 2] = -1
-    novelty = np.abs(convolve(rec.astype(float), k, mode="reflect").diagonal())
+    # Novelty curve from feature self-similarity using a checkerboard kernel
+    novelty = _banded_novelty(seg_features, width=3, kernel_size=16)
 
     # Pick peaks as boundaries
     hop_length = 512
-    # features has shape (n_features, n_frames); use frame count to compute seconds-per-frame
-    n_frames = features.shape[1]
+    # seg_features has shape (n_features, n_frames); use frame count to compute seconds-per-frame
+    n_frames = seg_features.shape[1]
     frames_per_sec = n_frames / max(duration, 1.0)
     min_segment_frames = int(15.0 * frames_per_sec)  # min 15 seconds per section
 
-    peaks = []
-    for i in range(1, len(novelty) - 1):
-        if novelty[i] > novelty[i - 1] and novelty[i] > novelty[i + 1]:
-            if novelty[i] > np.mean(novelty) + 1.0 * np.std(novelty):
-                if not peaks or (i - peaks[-1]) >= min_segment_frames:
-                    peaks.append(i)
+    peaks = _pick_boundaries(novelty, min_segment_frames)
 
     # peaks are indices into the feature/novelty array; convert to time
     boundary_times = [0.0] + [float(p / frames_per_sec) for p in peaks] + [duration]
 
     # Label sections heuristically based on position and energy
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+    onset_env = features.onset_env
     sections = []
     n_sections = len(boundary_times) - 1
 
@@ -170,6 +186,152 @@ def _segment_structure(y: np.ndarray, sr: int, duration: float) -> list[SongSect
     return sections
 
 
+def _pick_boundaries(novelty: np.ndarray, min_distance: int) -> list[int]:
+    """Pick novelty peaks above mean + 1 std, at least ``min_distance`` frames apart.
+
+    Peaks are accepted greedily from left to right.
+    """
+    if len(novelty) < 3:
+        return []
+    threshold = np.mean(novelty) + 1.0 * np.std(novelty)
+    mid = novelty[1:-1]
+    is_peak = (mid > novelty[:-2]) & (mid > novelty[2:]) & (mid > threshold)
+    candidates = np.flatnonzero(is_peak) + 1
+
+    peaks: list[int] = []
+    for i in candidates:
+        if not peaks or (i - peaks[-1]) >= min_distance:
+            peaks.append(int(i))
+    return peaks
+
+
+def _banded_novelty(
+    features: np.ndarray,
+    width: int = 3,
+    kernel_size: int = 16,
+) -> np.ndarray:
+    """Checkerboard-kernel novelty along the diagonal of the recurrence matrix.
+
+    Gives the same curve as building the dense
+    ``librosa.segment.recurrence_matrix(features, width=width, mode="affinity",
+    sym=True)``, convolving it with a checkerboard kernel
+    (``scipy.ndimage.convolve``, ``mode="reflect"``) and keeping the diagonal,
+    but only evaluates the matrix entries inside the kernel's band around
+    the main diagonal. The k-nearest-neighbor radii and the affinity
+    bandwidth that the matrix depends on are computed in row blocks, so
+    memory grows linearly with the number of frames.
+
+    Parameters
+    ----------
+    features : feature matrix, shape (n_features, n_frames)
+    width : minimum frame distance for a recurrence link
+    kernel_size : checkerboard kernel size (frames)
+    """
+    data = np.ascontiguousarray(features.T, dtype=np.float64)
+    t = data.shape[0]
+    if width >= (t - 1) // 2:
+        # Too short for a recurrence matrix (librosa would raise here)
+        return np.zeros(t)
+
+    sq_norms = np.einsum("ij,ij->i", data, data)
+    radii = _knn_radii(data, sq_norms, width)
+
+    # Affinity bandwidth: median distance to the farthest mutual neighbor
+    # ("med_k_scalar" in librosa)
+    farthest = np.full(t, np.nan)
+    for start, stop, dist in _distance_blocks(data, sq_norms):
+        rows = np.arange(start, stop)[:, None]
+        cols = np.arange(t)[None, :]
+        linked = _linked(dist, rows, cols, radii, width)
+        row_max = np.max(np.where(linked, dist, -np.inf), axis=1)
+        farthest[start:stop] = np.where(np.isfinite(row_max), row_max, np.nan)
+    if not np.any(np.isfinite(farthest)):
+        return np.zeros(t)
+    bandwidth = float(np.nanmedian(farthest))
+
+    # Checkerboard kernel (replaces removed librosa.segment.novelty)
+    half = kernel_size // 2
+    kernel = np.ones((kernel_size, kernel_size))
+    kernel[:half, half:] = -1
+    kernel[half:, :half] = -1
+
+    # out[i, i] = sum_ab kernel[a, b] * rec[reflect(i + half - a), reflect(i + half - b)]
+    idx = np.arange(t)
+    shifted = [_reflect_index(idx + half - a, t) for a in range(kernel_size)]
+    novelty = np.zeros(t)
+    for a in range(kernel_size):
+        u = shifted[a]
+        for b in range(kernel_size):
+            v = shifted[b]
+            dist = np.sqrt(np.maximum(
+                sq_norms[u] + sq_norms[v] - 2.0 * np.einsum("ij,ij->i", data[u], data[v]), 0.0
+            ))
+            linked = _linked(dist, u, v, radii, width)
+            novelty += kernel[a, b] * np.where(linked, np.exp(-dist / bandwidth), 0.0)
+
+    return np.abs(novelty)
+
+
+def _distance_blocks(data: np.ndarray, sq_norms: np.ndarray, max_elements: int = 1 << 22):
+    """Yield ``(start, stop, distances)`` for row blocks of the distance matrix."""
+    t = data.shape[0]
+    block = max(1, max_elements // t)
+    for start in range(0, t, block):
+        stop = min(start + block, t)
+        d2 = sq_norms[start:stop, None] + sq_norms[None, :] - 2.0 * (data[start:stop] @ data.T)
+        yield start, stop, np.sqrt(np.maximum(d2, 0.0))
+
+
+def _knn_radii(data: np.ndarray, sq_norms: np.ndarray, width: int) -> np.ndarray:
+    """Distance from each frame to its k-th recurrence neighbor.
+
+    Mirrors ``librosa.segment.recurrence_matrix``: take the ``k + 2 * width``
+    nearest frames, drop those closer than ``width`` frames in time or at
+    zero distance, and keep the nearest ``k`` of the rest. Frames without
+    any neighbor get ``-inf``.
+    """
+    t = data.shape[0]
+    k = int(2 * np.ceil(np.sqrt(t - 2 * width + 1)))
+    n_candidates = min(t - 1, k + 2 * width)
+
+    radii = np.full(t, -np.inf)
+    for start, stop, dist in _distance_blocks(data, sq_norms):
+        rows = np.arange(start, stop)
+        dist[np.arange(stop - start), rows] = np.inf  # exclude self
+        cand = np.argpartition(dist, n_candidates - 1, axis=1)[:, :n_candidates]
+        cand_dist = np.take_along_axis(dist, cand, axis=1)
+        valid = (np.abs(cand - rows[:, None]) >= width) & (cand_dist > 0)
+        cand_dist = np.sort(np.where(valid, cand_dist, np.inf), axis=1)
+        n_keep = np.minimum(k, valid.sum(axis=1))
+        has = n_keep > 0
+        radii[start:stop][has] = cand_dist[has, n_keep[has] - 1]
+    return radii
+
+
+def _linked(
+    dist: np.ndarray,
+    rows: np.ndarray,
+    cols: np.ndarray,
+    radii: np.ndarray,
+    width: int,
+) -> np.ndarray:
+    """Mutual k-NN link test for frame pairs ``(rows, cols)`` at distance ``dist``."""
+    # Relative slack absorbs rounding differences between distance evaluations
+    tol = 1e-9
+    return (
+        (np.abs(rows - cols) >= width)
+        & (dist > 0)
+        & (dist <= radii[rows] * (1 + tol) + tol)
+        & (dist <= radii[cols] * (1 + tol) + tol)
+    )
+
+
+def _reflect_index(idx: np.ndarray, n: int) -> np.ndarray:
+    """Map indices outside [0, n) back inside, like scipy's ``mode="reflect"``."""
+    idx = np.where(idx < 0, -idx - 1, idx)
+    return np.where(idx >= n, 2 * n - idx - 1, idx)
+
+
 def _label_section(
     idx: int,
     total: int,
@@ -0,0 +1,116 @@
+"""Source separation: Demucs two-stem (vocals / accompaniment) split.
+
+Stems are stored under ``CACHE_DIR/stems/<content hash>-<model>/``, so a
+track is separated once no matter what it is named or where it lives, and
+later runs reuse the existing WAVs. The model is loaded once per process
+(``warm_models``), so the ``serve`` daemon and batch workers keep it warm.
+
+The scheduler runs separation as its own task next to the analyzers and
+attaches the result to ``TimbreAnalysis.stems``.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from music_analyzer.analyzers.features import FeatureContext
+from music_analyzer.config import CACHE_DIR
+from music_analyzer.models import StemPaths
+
+# Stem file name → StemPaths field
+_STEMS = {"vocals": "vocals", "no_vocals": "other"}
+
+
+def stems_dir(audio_path: Path, model_name: Optional[str] = None) -> Path:
+    """Directory holding the stems of ``audio_path`` (keyed by content hash and model)."""
+    from music_analyzer.utils.cache import file_hash
+    from music_analyzer.utils.warm_models import DEMUCS_MODEL
+
+    return CACHE_DIR / "stems" / f"{file_hash(audio_path)}-{model_name or DEMUCS_MODEL}"
+
+
+def cached_stems(audio_path: Path) -> Optional[StemPaths]:
+    """Return the stems of ``audio_path`` if they were already separated."""
+    from music_analyzer.utils.cache_manager import touch
+
+    output_dir = stems_dir(audio_path)
+    files = {name: output_dir / f"{name}.wav" for name in _STEMS}
+    if not all(f.exists() for f in files.values()):
+        return None
+    touch(output_dir)
+    for f in files.values():
+        touch(f)
+    return StemPaths(**{_STEMS[name]: str(f) for name, f in files.items()})
+
+
+def separate_stems(
+    audio_path: Path,
+    features: Optional[FeatureContext] = None,
+    reuse: bool = True,
+) -> Optional[StemPaths]:
+    """Split a track into vocals and accompaniment, reusing cached stems.
+
+    Parameters
+    ----------
+    audio_path : original file path (stems are keyed by its content)
+    features : shared feature context; its 44.1 kHz stereo waveform is used
+        when the loader provided one, otherwise the file is decoded here
+    reuse : return previously separated stems of the same content if present
+
+    Returns ``None`` when separation fails.
+    """
+    try:
+        stems = cached_stems(audio_path) if reuse else None
+        if stems is not None:
+            return stems
+        return _run_demucs(audio_path, features)
+    except Exception as e:
+        print(f"Demucs error: {e}", file=sys.stderr)
+        return None
+
+
+def _run_demucs(audio_path: Path, features: Optional[FeatureContext]) -> StemPaths:
+    import soundfile as sf
+    import torch
+    from demucs.apply import apply_model
+
+    from music_analyzer.utils.cache import atomic_write
+    from music_analyzer.utils.cache_manager import maybe_prune
+    from music_analyzer.utils.warm_models import get_demucs_model, model_lock
+
+    model = get_demucs_model()
+    y = features.waveform(model.samplerate, mono=False) if features is not None else None
+    if y is None:
+        import librosa
+
+        y, _ = librosa.load(str(audio_path), sr=model.samplerate, mono=False)
+    if y.ndim == 1:
+        y = np.stack([y] * model.audio_channels)
+
+    # Same input normalization as the demucs CLI (torch needs a writable buffer)
+    wav = torch.from_numpy(y if y.flags.writeable else y.copy())
+    ref = wav.mean(0)
+    wav = (wav - ref.mean()) / (ref.std() + 1e-8)
+
+    with model_lock(model), torch.no_grad():
+        sources = apply_model(model, wav[None], device="cpu", progress=False)[0]
+    sources = sources * (ref.std() + 1e-8) + ref.mean()
+
+    vocals = sources[model.sources.index("vocals")]
+    separated = {"vocals": vocals, "no_vocals": sources.sum(0) - vocals}
+
+    # Each stem appears atomically, so a concurrent run never reads a partial WAV
+    output_dir = stems_dir(audio_path)
+    stems = StemPaths()
+    for name, audio in separated.items():
+        stem_file = output_dir / f"{name}.wav"
+        data = audio.numpy().T
+        atomic_write(stem_file, lambda f: sf.write(f, data, model.samplerate, format="WAV"))
+        setattr(stems, _STEMS[name], str(stem_file))
+
+    maybe_prune()
+    return stems
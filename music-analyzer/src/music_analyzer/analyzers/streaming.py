@@ -0,0 +1,407 @@
+"""Block-wise feature extraction for arbitrarily long recordings.
+
+``FeatureContext`` holds the whole waveform, and its first spectral feature
+materializes the full STFT magnitude (about 0.6 GB per hour at 22.05 kHz,
+next to 0.3 GB of audio). ``stream_features`` instead reads the file in
+blocks (``soundfile.blocks``), resamples them with a streaming soxr
+resampler and reduces every block right away:
+
+- wide per-bin data (STFT, mel spectrogram) never outlives its block; the
+  track-wide band energy is a running sum
+- K-weighted loudness energy is summed into 100 ms steps (``LoudnessMeter``)
+- with essentia installed, HPCP frames for chord detection are written into
+  an array preallocated from the file length (``tonality.HpcpStream``)
+- the per-frame series the analyzers work on (onset envelopes, MFCC,
+  chroma, spectral centroid / bandwidth / rolloff, RMS, ZCR, pitch motion:
+  33 values per 23 ms frame, about 20 MB per hour) are appended block by
+  block
+- blocks overlap by the frame length (STFT) and by a few seconds (CQT), so
+  frames at block edges see the same samples as in a whole-track pass
+- the tuning of the chroma CQT is estimated once, from the spectral peaks
+  of the first ``TUNING_SECONDS`` (CQT blocks wait until then), and used
+  for every block
+
+The result is a ``StreamedFeatures`` context, so the analyzers run on it
+unchanged. It has no waveform (``y is None``); paths that need the audio
+itself (pYIN, the essentia key, CLAP, Whisper, Demucs) are skipped or
+fall back to their feature-based variants.
+
+Features match ``FeatureContext`` except for two track-wide estimates that
+a stream can only take from what it has seen so far:
+
+- the 80 dB floor of the log-mel spectrogram (MFCC, onset strength): a
+  whole-track pass sets it from the loudest bin of the track, the stream
+  from the loudest bin seen so far
+- the chroma tuning: a whole-track pass estimates it over the whole track,
+  the stream over the first ``TUNING_SECONDS``. Tracks up to that length
+  get the same chroma; longer ones differ only if their tuning drifts
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import librosa
+
+from music_analyzer.analyzers.features import HOP_LENGTH, N_FFT, FeatureContext
+from music_analyzer.analyzers.loudness import LoudnessMeter
+from music_analyzer.analyzers.lyrics import pitch_motion
+from music_analyzer.config import DEFAULT_SR, HAS_ESSENTIA
+from music_analyzer.utils.profiling import span
+
+# Seconds of source audio read per block
+BLOCK_SECONDS = 30.0
+
+# Samples of context decoded on each side of a CQT block; covers the longest
+# constant-Q filter (C1 at 22.05 kHz) and the early-downsampling filters
+_CQT_CONTEXT = 64 * HOP_LENGTH
+
+# Dynamic range of the log-mel spectrogram (``librosa.power_to_db`` default)
+_TOP_DB = 80.0
+
+# Seconds at the start of the track the chroma tuning is estimated from
+TUNING_SECONDS = 120.0
+
+# CQT bins per octave of ``librosa.feature.chroma_cqt`` (tuning is in these bins)
+_CQT_BINS_PER_OCTAVE = 36
+
+
+def iter_blocks(
+    path: str | Path, sr: int = DEFAULT_SR, block_seconds: float = BLOCK_SECONDS
+) -> Iterator[np.ndarray]:
+    """Yield a file as consecutive mono float32 blocks at ``sr``.
+
+    Channels are averaged and the source rate is converted with soxr (HQ),
+    as ``load_audio`` does, but only one block is held at a time. Raises
+    ``ValueError`` for formats libsndfile cannot read (e.g. m4a / aac).
+    """
+    import soundfile as sf
+    import soxr
+
+    try:
+        f = sf.SoundFile(str(path))
+    except RuntimeError as e:
+        raise ValueError(f"Cannot stream {Path(path).name}: {e}") from e
+    with f:
+        resampler = None
+        if f.samplerate != sr:
+            resampler = soxr.ResampleStream(f.samplerate, sr, 1, dtype="float32", quality="HQ")
+        blocksize = max(int(block_seconds * f.samplerate), N_FFT)
+        for block in f.blocks(blocksize=blocksize, dtype="float32", always_2d=True):
+            mono = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+            if resampler is not None:
+                mono = resampler.resample_chunk(mono)
+            if len(mono):
+                yield mono
+        if resampler is not None:
+            tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+            if len(tail):
+                yield tail
+
+
+def stream_features(
+    path: str | Path,
+    sr: int = DEFAULT_SR,
+    block_seconds: float = BLOCK_SECONDS,
+    melody_points: Optional[int] = 200,
+) -> StreamedFeatures:
+    """Extract the analyzers' features from a file in one block-wise pass.
+
+    Parameters
+    ----------
+    path : audio file (any format libsndfile reads)
+    sr : analysis sample rate
+    block_seconds : seconds of source audio decoded per block
+    melody_points : keep the STFT frames of a melody contour with this many
+        points (see ``tonality._contour_frames``); ``None`` keeps none
+    """
+    from music_analyzer.analyzers.tonality import _contour_frames
+
+    n_samples = estimated_samples(path, sr)
+    keep = _contour_frames(1 + n_samples // HOP_LENGTH, melody_points) if melody_points else None
+    builder = StreamingFeatureBuilder(sr, keep_frames=keep, expected_samples=n_samples)
+    with span("feature:stream", "feature"):
+        for block in iter_blocks(path, sr, block_seconds):
+            builder.feed(block)
+        return builder.finish()
+
+
+def estimated_samples(path: str | Path, sr: int = DEFAULT_SR) -> int:
+    """Length of ``path`` in samples at ``sr``, from the header (no decoding)."""
+    import soundfile as sf
+
+    info = sf.info(str(path))
+    return int(np.ceil(info.frames * sr / info.samplerate))
+
+
+class StreamedFeatures(FeatureContext):
+    """Feature context assembled by ``StreamingFeatureBuilder``.
+
+    Exposes the same features as ``FeatureContext`` (precomputed), except
+    the STFT magnitude and the waveform. ``stft_mag_frames`` serves the
+    frames collected while streaming (the melody contour), falling back to
+    the nearest collected frame.
+
+    Parameters
+    ----------
+    sr : sample rate
+    n_samples : length of the streamed signal in samples
+    arrays : precomputed features, keyed by ``FeatureContext`` property name
+    frames : STFT magnitude columns collected while streaming, keyed by frame index
+    """
+
+    def __init__(
+        self,
+        sr: int,
+        n_samples: int,
+        arrays: dict[str, np.ndarray],
+        frames: Optional[dict[int, np.ndarray]] = None,
+    ):
+        super().__init__(None, sr)
+        self.n_samples = n_samples
+        self.frames = dict(frames or {})
+        # cached_property values are looked up in the instance dict first
+        self.__dict__.update(arrays)
+        self.__dict__["duration"] = n_samples / sr
+
+    def waveform(self, sr: int, mono: bool = True) -> Optional[np.ndarray]:
+        return None
+
+    @property
+    def stft_mag(self) -> np.ndarray:
+        raise ValueError("The full STFT is not kept when streaming")
+
+    @property
+    def n_frames(self) -> int:
+        return 1 + self.n_samples // HOP_LENGTH
+
+    def stft_mag_frames(self, frames: np.ndarray) -> np.ndarray:
+        if not self.frames:
+            raise ValueError("No STFT frames were collected while streaming")
+        kept = np.array(sorted(self.frames))
+        frames = np.asarray(frames, dtype=int)
+        after = np.clip(np.searchsorted(kept, frames), 0, len(kept) - 1)
+        before = np.maximum(after - 1, 0)
+        nearest = np.where(
+            np.abs(kept[before] - frames) <= np.abs(kept[after] - frames), before, after
+        )
+        return np.stack([self.frames[int(kept[i])] for i in nearest], axis=1)
+
+
+class StreamingFeatureBuilder:
+    """Turns consecutive waveform blocks into a ``StreamedFeatures`` context.
+
+    Feed blocks of any length with ``feed`` and call ``finish`` once at the
+    end. Frames are the centered, zero-padded frames of ``librosa.stft``
+    (``n_fft=2048``, ``hop_length=512``).
+
+    Parameters
+    ----------
+    sr : sample rate of the blocks
+    keep_frames : STFT frame indices whose magnitudes should be kept (e.g.
+        the melody contour frames, see ``StreamedFeatures.stft_mag_frames``)
+    expected_samples : signal length if known, used to preallocate the HPCP frames
+    """
+
+    def __init__(
+        self,
+        sr: int = DEFAULT_SR,
+        keep_frames: Optional[np.ndarray] = None,
+        expected_samples: int = 0,
+    ):
+        self.sr = sr
+        self.keep_frames = set(int(f) for f in (keep_frames if keep_frames is not None else ()))
+        self.n_samples = 0
+        self.first_sample: Optional[float] = None
+        self.last_sample = 0.0
+
+        self._window = librosa.filters.get_window("hann", N_FFT, fftbins=True)
+        self._mel_basis = librosa.filters.mel(sr=sr, n_fft=N_FFT)
+        self._freqs = librosa.fft_frequencies(sr=sr, n_fft=N_FFT)
+
+        # STFT framing: samples from frame ``_frame`` on, behind the leading pad
+        self._buf = np.zeros(N_FFT // 2, dtype=np.float32)
+        self._frame = 0
+        self._prev_mel: Optional[np.ndarray] = None
+        self._prev_mag: Optional[np.ndarray] = None
+        self._mel_max = -np.inf
+
+        # CQT: samples from ``_cqt_start`` (a multiple of the hop) on
+        self._cqt_buf = np.zeros(0, dtype=np.float32)
+        self._cqt_start = 0
+        self._cqt_frame = 0
+        # Spectral peaks (frequency, magnitude) collected until the tuning is set
+        self._tuning: Optional[float] = None
+        self._peaks: list[tuple[np.ndarray, np.ndarray]] = []
+
+        self.band_energy = np.zeros(len(self._freqs), dtype=np.float64)
+        self._loudness = LoudnessMeter(sr)
+        self._hpcp = None
+        if HAS_ESSENTIA:
+            # HAS_ESSENTIA only means the package is installed; a broken
+            # install leaves tonality on its chroma path, as in a whole-track pass
+            try:
+                from music_analyzer.analyzers.tonality import HpcpStream
+
+                self._hpcp = HpcpStream(sr, expected_samples)
+            except Exception:
+                self._hpcp = None
+        self._series: dict[str, list[np.ndarray]] = {
+            name: [] for name in (
+                "onset_env", "onset_env_median", "mfcc", "chroma_cqt",
+                "spectral_centroid", "spectral_bandwidth", "spectral_rolloff", "rms", "zcr",
+                "pitch_motion",
+            )
+        }
+        self._frames: dict[int, np.ndarray] = {}
+
+    def feed(self, block: np.ndarray) -> None:
+        """Add the next ``block`` of mono samples."""
+        block = np.asarray(block, dtype=np.float32)
+        if not len(block):
+            return
+        if self.first_sample is None:
+            self.first_sample = float(block[0])
+        self.last_sample = float(block[-1])
+        self.n_samples += len(block)
+        self._loudness.feed(block)
+        if self._hpcp is not None:
+            try:
+                self._hpcp.feed(block)
+            except Exception:
+                self._hpcp = None  # Essentia failed mid-stream; chords fall back to chroma
+
+        self._buf = np.concatenate([self._buf, block])
+        self._stft_frames(final=False)
+        self._cqt_buf = np.concatenate([self._cqt_buf, block])
+        self._cqt_frames(final=False)
+
+    def finish(self) -> StreamedFeatures:
+        """Process the trailing frames and return the assembled context."""
+        self._buf = np.concatenate([self._buf, np.zeros(N_FFT // 2, dtype=np.float32)])
+        self._stft_frames(final=True)
+        self._cqt_frames(final=True)
+
+        series = {
+            name: np.concatenate(parts, axis=-1) if parts else np.zeros(0, dtype=np.float32)
+            for name, parts in self._series.items()
+        }
+        n_frames = 1 + self.n_samples // HOP_LENGTH
+        # Same lag / centering compensation as librosa.onset.onset_strength
+        pad = 1 + N_FFT // (2 * HOP_LENGTH)
+        for name in ("onset_env", "onset_env_median"):
+            series[name] = np.pad(series[name], (pad, 0))[:n_frames]
+        series["band_energy"] = self.band_energy.astype(np.float32)
+        series["loudness_steps"] = self._loudness.steps()
+        if self._hpcp is not None:
+            series["hpcp"] = self._hpcp.finish()
+        return StreamedFeatures(self.sr, self.n_samples, series, self._frames)
+
+    def _stft_frames(self, final: bool) -> None:
+        """Reduce every complete STFT frame in the buffer."""
+        if final:
+            # A whole-track pass has exactly 1 + n_samples // hop frames
+            count = 1 + self.n_samples // HOP_LENGTH - self._frame
+        else:
+            count = (len(self._buf) - N_FFT) // HOP_LENGTH + 1
+        if count <= 0:
+            return
+        first = self._frame
+        windows = np.lib.stride_tricks.sliding_window_view(self._buf, N_FFT)
+        segments = windows[::HOP_LENGTH][:count]
+
+        # Same framing and precision as librosa.stft(center=True, pad_mode="constant")
+        mag = np.abs(np.fft.rfft(segments * self._window, axis=1).astype(np.complex64)).T
+        power = mag ** 2
+        self.band_energy += np.sum(power, axis=1, dtype=np.float64)
+        for f in range(first, first + count):
+            if f in self.keep_frames:
+                self._frames[f] = mag[:, f - first].copy()
+
+        if self._tuning is None:
+            pitch, peak_mag = librosa.piptrack(S=mag, sr=self.sr, hop_length=HOP_LENGTH)
+            found = pitch > 0
+            self._peaks.append((pitch[found], peak_mag[found]))
+
+        add = self._series
+        add["spectral_centroid"].append(librosa.feature.spectral_centroid(S=mag, sr=self.sr)[0])
+        add["spectral_bandwidth"].append(librosa.feature.spectral_bandwidth(S=mag, sr=self.sr)[0])
+        add["spectral_rolloff"].append(librosa.feature.spectral_rolloff(S=mag, sr=self.sr)[0])
+        add["rms"].append(np.sqrt(np.mean(segments ** 2, axis=1)))
+        add["zcr"].append(self._zcr(segments, first))
+        add["pitch_motion"].append(pitch_motion(mag, self.sr, self._prev_mag))
+        self._prev_mag = mag[:, -1].copy()
+
+        mel_db = librosa.power_to_db(self._mel_basis @ power, top_db=None)
+        self._mel_max = max(self._mel_max, float(mel_db.max()))
+        mel_db = np.maximum(mel_db, self._mel_max - _TOP_DB)
+        add["mfcc"].append(librosa.feature.mfcc(S=mel_db, sr=self.sr, n_mfcc=13))
+
+        # Onset strength: positive log-mel differences to the previous frame
+        if self._prev_mel is not None:
+            mel_db = np.concatenate([self._prev_mel, mel_db], axis=1)
+        diff = np.maximum(0.0, np.diff(mel_db, axis=1))
+        add["onset_env"].append(np.mean(diff, axis=0))
+        add["onset_env_median"].append(np.median(diff, axis=0))
+        self._prev_mel = mel_db[:, -1:]
+
+        self._frame += count
+        self._buf = self._buf[count * HOP_LENGTH:]
+
+    def _zcr(self, segments: np.ndarray, first: int) -> np.ndarray:
+        """Zero-crossing rate per frame.
+
+        ``librosa.feature.zero_crossing_rate`` pads the track with its edge
+        samples rather than zeros, so frames reaching past either end are
+        refilled before counting.
+        """
+        starts = (first + np.arange(len(segments))) * HOP_LENGTH - N_FFT // 2
+        lead = np.clip(-starts, 0, N_FFT)
+        trail = np.clip(starts + N_FFT - self.n_samples, 0, N_FFT)
+        if lead.any() or trail.any():
+            segments = segments.copy()
+            for row in np.flatnonzero(lead):
+                segments[row, :lead[row]] = self.first_sample
+            for row in np.flatnonzero(trail):
+                segments[row, N_FFT - trail[row]:] = self.last_sample
+        return np.mean(librosa.zero_crossings(segments, pad=False, axis=-1), axis=-1)
+
+    def _cqt_frames(self, final: bool) -> None:
+        """Chroma for the CQT frames whose context is complete."""
+        end = self._cqt_start + len(self._cqt_buf)
+        if final:
+            stop = 1 + end // HOP_LENGTH
+        else:
+            stop = (end - _CQT_CONTEXT) // HOP_LENGTH
+            if stop - self._cqt_frame < 4 * _CQT_CONTEXT // HOP_LENGTH:
+                return  # Wait for a longer stretch before running the transform
+        if stop <= self._cqt_frame:
+            return
+        if self._tuning is None:
+            if not final and self._frame * HOP_LENGTH < TUNING_SECONDS * self.sr:
+                return  # Still collecting peaks for the tuning estimate
+            self._tuning = self._estimate_tuning()
+        chroma = librosa.feature.chroma_cqt(
+            y=self._cqt_buf, sr=self.sr, hop_length=HOP_LENGTH, tuning=self._tuning,
+        )
+        offset = self._cqt_start // HOP_LENGTH
+        self._series["chroma_cqt"].append(chroma[:, self._cqt_frame - offset:stop - offset])
+        self._cqt_frame = stop
+
+        # Keep the context preceding the next frame
+        keep_from = max(0, stop * HOP_LENGTH - _CQT_CONTEXT)
+        self._cqt_buf = self._cqt_buf[keep_from - self._cqt_start:]
+        self._cqt_start = keep_from
+
+    def _estimate_tuning(self) -> float:
+        """Tuning from the collected peaks, as ``librosa.estimate_tuning`` does.
+
+        Only peaks at least as strong as their median count.
+        """
+        pitch = np.concatenate([p for p, _ in self._peaks]) if self._peaks else np.zeros(0)
+        mag = np.concatenate([m for _, m in self._peaks]) if self._peaks else np.zeros(0)
+        self._peaks = []
+        threshold = np.median(mag) if len(mag) else 0.0
+        return float(librosa.pitch_tuning(pitch[mag >= threshold], bins_per_octave=_CQT_BINS_PER_OCTAVE))
@@ -2,15 +2,16 @@
 
 from __future__ import annotations
 
-import sys
 from pathlib import Path
 from typing import Optional
 
 import numpy as np
 import librosa
 
-from music_analyzer.config import CACHE_DIR, HAS_DEMUCS, HAS_PYLOUDNORM
-from music_analyzer.models import MFCCSummary, SpectralFeatures, StemPaths, TimbreAnalysis
+from music_analyzer.analyzers.features import FeatureContext, ensure_features
+from music_analyzer.analyzers.loudness import measure_loudness
+from music_analyzer.config import HAS_DEMUCS
+from music_analyzer.models import MFCCSummary, SpectralFeatures, TimbreAnalysis
 
 
 def analyze_timbre(
@@ -18,6 +19,7 @@ def analyze_timbre(
     sr: int,
     audio_path: Optional[Path] = None,
     run_separation: bool = True,
+    features: Optional[FeatureContext] = None,
 ) -> TimbreAnalysis:
     """Run timbre and spectral analysis.
 
@@ -27,9 +29,12 @@ def analyze_timbre(
     sr : sample rate
     audio_path : original file path (needed for source separation)
     run_separation : whether to run demucs source separation
+    features : shared feature context (computed on demand if omitted)
     """
+    features = ensure_features(y, sr, features)
+
     # --- MFCC ---
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+    mfcc = features.mfcc
     mfcc_summary = MFCCSummary(
         means=[round(float(m), 4) for m in np.mean(mfcc, axis=1)],
         stds=[round(float(s), 4) for s in np.std(mfcc, axis=1)],
@@ -37,10 +42,10 @@ def analyze_timbre(
     )
 
     # --- Spectral features ---
-    spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-    spectral_bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)[0]
-    spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
-    zcr = librosa.feature.zero_crossing_rate(y)[0]
+    spectral_centroid = features.spectral_centroid
+    spectral_bandwidth = features.spectral_bandwidth
+    spectral_rolloff = features.spectral_rolloff
+    zcr = features.zcr
 
     spectral = SpectralFeatures(
         spectral_centroid_mean=round(float(np.mean(spectral_centroid)), 1),
@@ -50,21 +55,11 @@ def analyze_timbre(
         zero_crossing_rate_mean=round(float(np.mean(zcr)), 6),
     )
 
-    # --- Loudness ---
-    loudness_lufs = None
-    loudness_range = None
-    if HAS_PYLOUDNORM:
-        try:
-            import pyloudnorm as pyln
-            meter = pyln.Meter(sr)
-            # pyloudnorm expects float64 and at least 0.4s
-            if len(y) > int(0.4 * sr):
-                loudness_lufs = round(float(meter.integrated_loudness(y.astype(np.float64))), 1)
-        except Exception:
-            pass
+    # --- Loudness (EBU R128, from K-weighted 100 ms step energies) ---
+    loudness = measure_loudness(features.loudness_steps, sr, features.duration)
 
     # --- Dynamic range ---
-    rms = librosa.feature.rms(y=y)[0]
+    rms = features.rms
     rms_nonzero = rms[rms > 0]
     if len(rms_nonzero) > 10:
         rms_db = librosa.amplitude_to_db(rms_nonzero)
@@ -78,77 +73,31 @@ def analyze_timbre(
     brightness = float(np.clip(np.mean(spectral_centroid) / nyquist, 0, 1))
 
     # --- Warmth (ratio of low-frequency energy) ---
-    S = np.abs(librosa.stft(y))
-    freqs = librosa.fft_frequencies(sr=sr)
+    band_energy = features.band_energy
+    freqs = features.fft_freqs
     low_mask = freqs < 500
-    total_energy = float(np.sum(S ** 2))
-    low_energy = float(np.sum(S[low_mask, :] ** 2)) if np.any(low_mask) else 0.0
+    total_energy = float(np.sum(band_energy))
+    low_energy = float(np.sum(band_energy[low_mask])) if np.any(low_mask) else 0.0
     warmth = float(np.clip(low_energy / max(total_energy, 1e-8), 0, 1))
 
-    # --- Source separation (Demucs) ---
+    # --- Source separation (Demucs; the scheduler runs it as a separate task) ---
     stems = None
     if run_separation and HAS_DEMUCS and audio_path is not None:
-        stems = _run_demucs(audio_path)
+        from music_analyzer.analyzers.separation import separate_stems
+
+        stems = separate_stems(audio_path, features)
 
     return TimbreAnalysis(
         mfcc=mfcc_summary,
         spectral=spectral,
-        loudness_lufs=loudness_lufs,
-        loudness_range=loudness_range,
+        loudness_lufs=loudness.integrated,
+        loudness_range=loudness.range,
+        momentary_max_lufs=loudness.momentary_max,
+        short_term_max_lufs=loudness.short_term_max,
+        loudness_curves=loudness.curves,
         dynamic_range_db=round(dynamic_range, 1),
         brightness=round(brightness, 3),
         warmth=round(warmth, 3),
         stems=stems,
     )
 
-
-def _run_demucs(audio_path: Path) -> Optional[StemPaths]:
-    """Run Demucs source separation and return stem paths."""
-    try:
-        import subprocess
-
-        output_dir = CACHE_DIR / "stems" / audio_path.stem
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        result = subprocess.run(
-            [
-                sys.executable, "-m", "demucs",
-                "--out", str(output_dir),
-                "--two-stems", "vocals",
-                str(audio_path),
-            ],
-            capture_output=True,
-            text=True,
-            timeout=600,
-        )
-
-        if result.returncode != 0:
-            print(f"Demucs warning: {result.stderr[:200]}", file=sys.stderr)
-            return None
-
-        # Find output stems
-        stem_dir = None
-        for d in output_dir.iterdir():
-            if d.is_dir():
-                stem_dir = d
-                break
-
-        if stem_dir is None:
-            return None
-
-        stems = StemPaths()
-        for stem_file in stem_dir.iterdir():
-            name = stem_file.stem.lower()
-            if "vocal" in name:
-                stems.vocals = str(stem_file)
-            elif "drum" in name:
-                stems.drums = str(stem_file)
-            elif "bass" in name:
-                stems.bass = str(stem_file)
-            elif "other" in name or "no_vocal" in name:
-                stems.other = str(stem_file)
-
-        return stems
-    except Exception as e:
-        print(f"Demucs error: {e}", file=sys.stderr)
-        return None
@@ -2,9 +2,14 @@
 
 from __future__ import annotations
 
+import threading
+from functools import lru_cache
+from typing import Optional
+
 import numpy as np
 import librosa
 
+from music_analyzer.analyzers.features import HOP_LENGTH, N_FFT, FeatureContext, ensure_features
 from music_analyzer.config import HAS_ESSENTIA
 from music_analyzer.models import ChordEvent, TonalityAnalysis
 
@@ -16,74 +21,130 @@ _PITCH_CLASSES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B
 _MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
 _MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
 
-# Simple chord templates (major and minor triads)
-_CHORD_TEMPLATES = {}
-for i, name in enumerate(_PITCH_CLASSES):
-    # Major triad: root, major third, perfect fifth
-    major = np.zeros(12)
-    major[i] = 1.0
-    major[(i + 4) % 12] = 0.8
-    major[(i + 7) % 12] = 0.8
-    _CHORD_TEMPLATES[name] = major
-
-    # Minor triad: root, minor third, perfect fifth
-    minor = np.zeros(12)
-    minor[i] = 1.0
-    minor[(i + 3) % 12] = 0.8
-    minor[(i + 7) % 12] = 0.8
-    _CHORD_TEMPLATES[f"{name}m"] = minor
-
-
-def analyze_tonality(y: np.ndarray, sr: int) -> TonalityAnalysis:
+# Chord qualities: label suffix → {semitones above root: template weight}
+_CHORD_QUALITIES = {
+    "": {0: 1.0, 4: 0.8, 7: 0.8},               # major triad
+    "m": {0: 1.0, 3: 0.8, 7: 0.8},              # minor triad
+    "7": {0: 1.0, 4: 0.8, 7: 0.8, 10: 0.6},     # dominant 7th
+    "maj7": {0: 1.0, 4: 0.8, 7: 0.8, 11: 0.6},  # major 7th
+    "m7": {0: 1.0, 3: 0.8, 7: 0.8, 10: 0.6},    # minor 7th
+}
+
+# Named chord vocabularies (sets of qualities) for template matching
+_CHORD_VOCABULARIES = {
+    "triads": ("", "m"),
+    "sevenths": ("", "m", "7", "maj7", "m7"),
+}
+
+# Minimum cosine similarity for a chord label; below it the window is "N"
+_CHORD_THRESHOLD = 0.3
+
+# Self-transition probability for Viterbi chord smoothing
+_CHORD_STAY_PROB = 0.9
+
+# Melody contour extractors
+_MELODY_METHODS = ("piptrack", "pyin")
+
+# Frames whose strongest piptrack magnitude is below this are silent (0 Hz)
+_MELODY_MIN_MAGNITUDE = 0.01
+
+# pYIN search range (C2 – C7 covers sung and most instrumental lead lines)
+_PYIN_FMIN = 65.41
+_PYIN_FMAX = 2093.0
+
+# Essentia HPCP framing (samples at the analysis rate) and resolution
+_HPCP_FRAME = 8192
+_HPCP_HOP = 4096
+_HPCP_SIZE = 36
+
+
+@lru_cache(maxsize=None)
+def _chord_templates(vocabulary: str = "triads") -> tuple[tuple[str, ...], np.ndarray]:
+    """Return chord labels and their unit-norm templates, shape (n_chords, 12).
+
+    Labels are ordered root first, then quality (C, Cm, C#, C#m, ...).
+    """
+    if vocabulary not in _CHORD_VOCABULARIES:
+        raise ValueError(
+            f"Unknown chord vocabulary '{vocabulary}'. "
+            f"Choose from: {', '.join(_CHORD_VOCABULARIES)}"
+        )
+    labels = []
+    rows = []
+    for i, name in enumerate(_PITCH_CLASSES):
+        for quality in _CHORD_VOCABULARIES[vocabulary]:
+            template = np.zeros(12)
+            for interval, weight in _CHORD_QUALITIES[quality].items():
+                template[(i + interval) % 12] = weight
+            labels.append(f"{name}{quality}")
+            rows.append(template / np.linalg.norm(template))
+    matrix = np.array(rows)
+    matrix.setflags(write=False)
+    return tuple(labels), matrix
+
+
+def analyze_tonality(
+    y: np.ndarray,
+    sr: int,
+    features: Optional[FeatureContext] = None,
+    chord_vocabulary: str = "triads",
+    chord_smoothing: str = "none",
+    melody_points: int = 200,
+    melody_method: str = "piptrack",
+) -> TonalityAnalysis:
     """Run tonality analysis on audio waveform.
 
     Uses essentia if available, otherwise falls back to librosa-based
     Krumhansl-Schmuckler key detection and template-based chord matching.
+
+    Parameters
+    ----------
+    y : audio waveform (mono)
+    sr : sample rate
+    features : shared feature context (computed on demand if omitted)
+    chord_vocabulary : librosa chord templates: "triads" or "sevenths"
+    chord_smoothing : "none" (per-window best match) or "viterbi" (HMM smoothing)
+    melody_points : number of points in the melody contour
+    melody_method : "piptrack" (strongest spectral peak) or "pyin" (voiced f0 only)
     """
+    features = ensure_features(y, sr, features)
+    melody_options = {"max_points": melody_points, "method": melody_method}
+
     if HAS_ESSENTIA:
         try:
-            return _analyze_essentia(y, sr)
+            return _analyze_essentia(features, melody_options)
         except Exception:
             pass  # Fall through to librosa
 
-    return _analyze_librosa(y, sr)
+    return _analyze_librosa(features, chord_vocabulary, chord_smoothing, melody_options)
 
 
-def _analyze_librosa(y: np.ndarray, sr: int) -> TonalityAnalysis:
+def _analyze_librosa(
+    features: FeatureContext,
+    chord_vocabulary: str = "triads",
+    chord_smoothing: str = "none",
+    melody_options: Optional[dict] = None,
+) -> TonalityAnalysis:
     """Librosa-based tonality analysis."""
-    # --- Key detection via Krumhansl-Schmuckler ---
-    chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-    chroma_mean = np.mean(chroma, axis=1)
-
-    best_key = ""
-    best_mode = "major"
-    best_corr = -1.0
-
-    for shift in range(12):
-        rotated = np.roll(chroma_mean, -shift)
-
-        corr_major = float(np.corrcoef(rotated, _MAJOR_PROFILE)[0, 1])
-        corr_minor = float(np.corrcoef(rotated, _MINOR_PROFILE)[0, 1])
-
-        if corr_major > best_corr:
-            best_corr = corr_major
-            best_key = _PITCH_CLASSES[shift]
-            best_mode = "major"
-        if corr_minor > best_corr:
-            best_corr = corr_minor
-            best_key = _PITCH_CLASSES[shift]
-            best_mode = "minor"
+    sr = features.sr
 
+    # --- Key detection via Krumhansl-Schmuckler ---
+    chroma = features.chroma_cqt
+    best_key, best_mode, best_corr = _estimate_key(np.mean(chroma, axis=1))
     key_confidence = float(np.clip(best_corr, 0.0, 1.0))
 
     # --- Chord detection via template matching ---
     hop_length = 512
     # Use ~0.5 second windows for chord detection
     frames_per_chord = max(1, int(0.5 * sr / hop_length))
-    chords = _detect_chords_template(chroma, sr, frames_per_chord)
+    chords = _detect_chords_template(
+        chroma, sr, frames_per_chord,
+        vocabulary=chord_vocabulary,
+        smoothing=chord_smoothing,
+    )
 
     # --- Melody contour (simplified: use pitch from predominant frequency) ---
-    melody_contour = _extract_melody_contour(y, sr)
+    melody_contour = _extract_melody_contour(features, **(melody_options or {}))
 
     key_label = f"{best_key} {best_mode}"
     return TonalityAnalysis(
@@ -96,50 +157,90 @@ def _analyze_librosa(y: np.ndarray, sr: int) -> TonalityAnalysis:
     )
 
 
+def _estimate_key(chroma_mean: np.ndarray) -> tuple[str, str, float]:
+    """Krumhansl-Schmuckler key estimate: (tonic, mode, correlation).
+
+    Correlates all 12 rotations of the mean chroma with both profiles at once.
+    Ties resolve like a scan over shifts checking major before minor.
+    """
+    # rotations[s] == np.roll(chroma_mean, -s)
+    rotations = chroma_mean[(np.arange(12)[:, None] + np.arange(12)[None, :]) % 12]
+    centered = rotations - rotations.mean(axis=1, keepdims=True)
+    profiles = np.stack([_MAJOR_PROFILE, _MINOR_PROFILE])
+    profiles = profiles - profiles.mean(axis=1, keepdims=True)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = (centered @ profiles.T) / (
+            np.linalg.norm(centered, axis=1)[:, None] * np.linalg.norm(profiles, axis=1)[None, :]
+        )
+
+    # Flatten as [C major, C minor, C# major, ...]; NaN (flat chroma) never wins
+    scores = np.where(np.isnan(corr), -np.inf, corr).ravel()
+    best = int(np.argmax(scores))
+    if not scores[best] > -1.0:
+        return "", "major", -1.0
+    shift, is_minor = divmod(best, 2)
+    return _PITCH_CLASSES[shift], "minor" if is_minor else "major", float(scores[best])
+
+
 def _detect_chords_template(
-    chroma: np.ndarray, sr: int, frames_per_chord: int
+    chroma: np.ndarray,
+    sr: int,
+    frames_per_chord: int,
+    vocabulary: str = "triads",
+    smoothing: str = "none",
 ) -> list[ChordEvent]:
-    """Detect chords by template matching on chroma windows."""
+    """Detect chords by template matching on chroma windows.
+
+    All windows are scored against the template matrix in a single matrix
+    multiply. With ``smoothing="viterbi"`` the per-window labels are decoded
+    with an HMM instead of taken independently.
+    """
     hop_length = 512
-    chords = []
     n_frames = chroma.shape[1]
-
+    if n_frames == 0:
+        return []
+    labels, templates = _chord_templates(vocabulary)
+
+    # Mean chroma per window of frames_per_chord frames
+    starts = np.arange(0, n_frames, frames_per_chord)
+    counts = np.diff(np.append(starts, n_frames))
+    windows = np.add.reduceat(chroma.astype(np.float64), starts, axis=1) / counts
+
+    # Unit-normalize; near-silent windows are skipped entirely
+    norms = np.linalg.norm(windows, axis=0)
+    keep = norms >= 1e-6
+    starts = starts[keep]
+    scores = (templates @ (windows[:, keep] / norms[keep])).T  # (n_windows, n_chords)
+
+    if smoothing == "viterbi":
+        path = _viterbi_chords(scores)
+    elif smoothing == "none":
+        path = np.argmax(scores, axis=1) if len(scores) else np.zeros(0, dtype=int)
+    else:
+        raise ValueError(f"Unknown chord smoothing '{smoothing}'. Choose from: none, viterbi")
+
+    chord_scores = scores[np.arange(len(path)), path] if len(path) else np.zeros(0)
+    no_chord = chord_scores <= _CHORD_THRESHOLD
+    window_labels = ["N" if n else labels[j] for j, n in zip(path, no_chord)]
+    window_scores = np.where(no_chord, _CHORD_THRESHOLD, chord_scores)
+    window_times = librosa.frames_to_time(starts, sr=sr, hop_length=hop_length)
+
+    # Merge consecutive windows with the same label into chord events
+    chords = []
     prev_chord = ""
     chord_start = 0.0
-
-    for i in range(0, n_frames, frames_per_chord):
-        end_frame = min(i + frames_per_chord, n_frames)
-        window = np.mean(chroma[:, i:end_frame], axis=1)
-
-        # Normalize
-        norm = np.linalg.norm(window)
-        if norm < 1e-6:
-            continue
-        window = window / norm
-
-        # Match against templates
-        best_label = "N"
-        best_score = 0.3  # minimum threshold
-
-        for label, template in _CHORD_TEMPLATES.items():
-            t_norm = template / np.linalg.norm(template)
-            score = float(np.dot(window, t_norm))
-            if score > best_score:
-                best_score = score
-                best_label = label
-
-        current_time = float(librosa.frames_to_time(i, sr=sr, hop_length=hop_length))
-
-        if best_label != prev_chord:
+    for label, score, current_time in zip(window_labels, window_scores, window_times):
+        if label != prev_chord:
             if prev_chord and prev_chord != "N":
                 chords.append(ChordEvent(
                     time=round(chord_start, 2),
-                    duration=round(current_time - chord_start, 2),
+                    duration=round(float(current_time) - chord_start, 2),
                     chord=prev_chord,
-                    confidence=round(best_score, 2),
+                    confidence=round(float(score), 2),
                 ))
-            chord_start = current_time
-            prev_chord = best_label
+            chord_start = float(current_time)
+            prev_chord = label
 
     # Append last chord
     if prev_chord and prev_chord != "N":
@@ -154,47 +255,138 @@ def _detect_chords_template(
     return chords
 
 
-def _extract_melody_contour(y: np.ndarray, sr: int, max_points: int = 200) -> list[float]:
-    """Extract a simplified melody pitch contour using piptrack."""
-    pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
-
-    # Pick strongest pitch per frame
-    contour = []
-    for t in range(pitches.shape[1]):
-        mag_col = magnitudes[:, t]
-        if np.max(mag_col) < 0.01:
-            contour.append(0.0)
-        else:
-            idx = np.argmax(mag_col)
-            contour.append(float(pitches[idx, t]))
-
-    # Downsample to max_points
-    if len(contour) > max_points:
-        step = len(contour) / max_points
-        contour = [contour[int(i * step)] for i in range(max_points)]
+def _viterbi_chords(
+    scores: np.ndarray,
+    stay_prob: float = _CHORD_STAY_PROB,
+    temperature: float = 0.05,
+) -> np.ndarray:
+    """Most likely chord sequence under a sticky-transition HMM.
 
-    return [round(v, 1) for v in contour]
+    Emissions are a softmax over template similarities. Every chord switches
+    to each other chord with equal probability, so each step only needs the
+    best previous state overall rather than a full K x K transition matrix:
+    cost is O(n_windows * n_chords).
 
+    Parameters
+    ----------
+    scores : template similarities, shape (n_windows, n_chords)
+    stay_prob : probability of keeping the same chord between windows
+    temperature : softmax temperature for emissions
+    """
+    n_windows, n_states = scores.shape
+    if n_windows == 0:
+        return np.zeros(0, dtype=int)
+
+    logits = scores / temperature
+    log_emit = logits - np.logaddexp.reduce(logits, axis=1, keepdims=True)
+    log_stay = np.log(stay_prob)
+    log_switch = np.log((1.0 - stay_prob) / max(n_states - 1, 1))
+
+    backptr = np.empty((n_windows, n_states), dtype=np.intp)
+    states = np.arange(n_states)
+    delta = log_emit[0] - np.log(n_states)
+    for t in range(1, n_windows):
+        best_prev = int(np.argmax(delta))
+        stay = delta + log_stay
+        switch = delta[best_prev] + log_switch
+        from_stay = stay >= switch
+        backptr[t] = np.where(from_stay, states, best_prev)
+        delta = np.where(from_stay, stay, switch) + log_emit[t]
+
+    path = np.empty(n_windows, dtype=np.intp)
+    path[-1] = int(np.argmax(delta))
+    for t in range(n_windows - 1, 0, -1):
+        path[t - 1] = backptr[t, path[t]]
+    return path
+
+
+def _contour_frames(n_frames: int, max_points: int) -> np.ndarray:
+    """Indices of the frames kept when a contour is downsampled to ``max_points``."""
+    if n_frames <= max_points:
+        return np.arange(n_frames)
+    step = n_frames / max_points
+    return (np.arange(max_points) * step).astype(int)
+
+
+def _extract_melody_contour(
+    features: FeatureContext,
+    max_points: int = 200,
+    method: str = "piptrack",
+) -> list[float]:
+    """Extract a simplified melody pitch contour (Hz, 0 for silent/unvoiced).
+
+    Only the frames that survive downsampling to ``max_points`` are analyzed.
+    ``piptrack`` takes the strongest spectral peak of each kept frame;
+    ``pyin`` tracks the fundamental on a hop decimated to the target
+    resolution and reports 0 outside voiced regions.
+    """
+    if method not in _MELODY_METHODS:
+        raise ValueError(
+            f"Unknown melody method '{method}'. Choose from: {', '.join(_MELODY_METHODS)}"
+        )
+    if max_points < 1:
+        raise ValueError("max_points must be at least 1")
+
+    if method == "pyin":
+        contour = _melody_pyin(features, max_points)
+    else:
+        frames = _contour_frames(features.n_frames, max_points)
+        # piptrack is frame-local, so running it on the kept columns only
+        # gives the same values as the full-resolution pass
+        pitches, magnitudes = librosa.piptrack(S=features.stft_mag_frames(frames), sr=features.sr)
+        best = np.argmax(magnitudes, axis=0)
+        cols = np.arange(magnitudes.shape[1])
+        contour = np.where(
+            magnitudes[best, cols] < _MELODY_MIN_MAGNITUDE, 0.0, pitches[best, cols]
+        )
 
-def _analyze_essentia(y: np.ndarray, sr: int) -> TonalityAnalysis:
-    """Essentia-based tonality analysis (more accurate key/chord detection)."""
-    import essentia.standard as es
+    return [round(float(v), 1) for v in contour]
+
+
+def _melody_pyin(features: FeatureContext, max_points: int) -> np.ndarray:
+    """pYIN f0 at roughly ``max_points`` frames; unvoiced frames are 0."""
+    y = features.y
+    sr = features.sr
+    hop = max(HOP_LENGTH, len(y) // max_points)
+    # pYIN limits pitch jumps per frame; on a coarse hop the default rate
+    # (35.92 octaves/s) would allow jumps wider than the search range itself
+    span_semitones = int(12 * np.log2(_PYIN_FMAX / _PYIN_FMIN)) - 1
+    max_rate = min(35.92, span_semitones * sr / (12 * hop))
+    f0, voiced, _ = librosa.pyin(
+        y,
+        fmin=_PYIN_FMIN,
+        fmax=_PYIN_FMAX,
+        sr=sr,
+        frame_length=N_FFT,
+        hop_length=hop,
+        max_transition_rate=max_rate,
+    )
+    f0 = np.where(voiced & np.isfinite(f0), f0, 0.0)
+    return f0[_contour_frames(len(f0), max_points)]
 
-    # Convert to essentia format (float32, mono)
-    audio = y.astype(np.float32)
 
-    # Key detection
-    key_extractor = es.KeyExtractor()
-    key, scale, key_strength = key_extractor(audio)
+def _analyze_essentia(features: FeatureContext, melody_options: Optional[dict] = None) -> TonalityAnalysis:
+    """Essentia-based tonality analysis (more accurate key/chord detection).
 
-    mode = "major" if scale == "major" else "minor"
+    Chords come from the shared HPCP frames (``features.hpcp``). The key
+    needs the waveform; a streamed context has none, so there the key is the
+    Krumhansl-Schmuckler estimate on the streamed chroma.
+    """
+    sr = features.sr
+    pipeline = _hpcp_pipeline(sr)
+
+    if features.y is not None:
+        key, scale, key_strength = pipeline.key(features.y.astype(np.float32, copy=False))
+        mode = "major" if scale == "major" else "minor"
+    else:
+        key, mode, key_strength = _estimate_key(np.mean(features.chroma_cqt, axis=1))
+        key_strength = float(np.clip(key_strength, 0.0, 1.0))
     key_label = f"{key} {mode}"
 
-    # Chord detection using essentia's HPCP + chord templates
-    chords = _detect_chords_essentia(audio, sr)
+    chords = _detect_chords_essentia(features.hpcp, sr)
 
     # Melody contour (reuse librosa for simplicity)
-    melody_contour = _extract_melody_contour(y, sr)
+    melody_contour = _extract_melody_contour(features, **(melody_options or {}))
 
     return TonalityAnalysis(
         key=key_label,
@@ -206,50 +398,144 @@ def _analyze_essentia(y: np.ndarray, sr: int) -> TonalityAnalysis:
     )
 
 
-def _detect_chords_essentia(audio: np.ndarray, sr: int) -> list[ChordEvent]:
-    """Detect chords using essentia's ChordsDetection."""
-    try:
+class _HpcpPipeline:
+    """Essentia algorithms for HPCP chords and keys, configured for one sample rate.
+
+    Building essentia algorithms costs far more than running one on a frame,
+    so every instance is configured once and reused for all frames and calls.
+    """
+
+    def __init__(self, sr: int):
         import essentia.standard as es
 
-        hpcp_extractor = es.HPCP(
-            size=36,
+        self.sr = sr
+        self.window = es.Windowing(type="blackmanharris62", size=_HPCP_FRAME)
+        self.spectrum = es.Spectrum(size=_HPCP_FRAME)
+        self.peaks = es.SpectralPeaks(
+            orderBy="magnitude",
+            magnitudeThreshold=0.001,
+            maxPeaks=100,
+            minFrequency=40.0,
+            maxFrequency=5000.0,
+            sampleRate=float(sr),
+        )
+        self.hpcp = es.HPCP(
+            size=_HPCP_SIZE,
             referenceFrequency=440.0,
             harmonics=8,
             bandPreset=True,
             minFrequency=40.0,
             maxFrequency=5000.0,
+            sampleRate=float(sr),
         )
+        self.chords = es.ChordsDetection(hopSize=_HPCP_HOP, sampleRate=float(sr))
+        self.key = es.KeyExtractor(sampleRate=float(sr))
 
-        # Frame-based analysis
-        frame_size = 8192
-        hop_size = 4096
-        frames = es.FrameGenerator(audio, frameSize=frame_size, hopSize=hop_size)
-
-        hpcps = []
-        for frame in frames:
-            spectrum = es.Spectrum(size=frame_size)(es.Windowing(type="blackmanharris62")(frame))
-            peaks_freq, peaks_mag = es.SpectralPeaks(
-                orderBy="magnitude",
-                magnitudeThreshold=0.001,
-                maxPeaks=100,
-                minFrequency=40.0,
-                maxFrequency=5000.0,
-                sampleRate=float(sr),
-            )(spectrum)
-            hpcp = hpcp_extractor(peaks_freq, peaks_mag)
-            hpcps.append(hpcp)
-
-        if not hpcps:
+    def compute(self, frames: np.ndarray, out: np.ndarray) -> None:
+        """Write the HPCP of each row of ``frames`` into the same row of ``out``."""
+        window, spectrum, peaks, hpcp = self.window, self.spectrum, self.peaks, self.hpcp
+        for i, frame in enumerate(frames):
+            out[i] = hpcp(*peaks(spectrum(window(frame))))
+
+
+_hpcp_pipelines = threading.local()
+
+
+def _hpcp_pipeline(sr: int) -> _HpcpPipeline:
+    """The HPCP pipeline for ``sr``, built once per thread.
+
+    Essentia algorithms keep state between calls, so threads (e.g. the
+    ``serve`` daemon's request handlers) each get their own instances.
+    """
+    pipelines = _hpcp_pipelines.__dict__.setdefault("by_sr", {})
+    if sr not in pipelines:
+        pipelines[sr] = _HpcpPipeline(sr)
+    return pipelines[sr]
+
+
+def hpcp_frame_count(n_samples: int) -> int:
+    """Number of HPCP frames of a signal, as cut by essentia's ``FrameGenerator``.
+
+    Frame ``k`` is centered on sample ``k * hop`` (zero-padded at both
+    ends); frames continue as long as they start before the end of the signal.
+    """
+    return (n_samples + _HPCP_FRAME // 2 - 1) // _HPCP_HOP + 1 if n_samples else 0
+
+
+class HpcpStream:
+    """HPCP frames (36 bins per 4096 samples) of a signal fed block by block.
+
+    Frames are written into a preallocated array, sized from ``n_samples``
+    when the length is known up front (it grows if the signal runs longer).
+    ``hpcp_frames`` runs the whole waveform through the same path, so a
+    streamed track gets the same frames as an in-memory one.
+
+    Parameters
+    ----------
+    sr : sample rate of the blocks
+    n_samples : expected signal length in samples (0 if unknown)
+    """
+
+    def __init__(self, sr: int, n_samples: int = 0):
+        self._pipeline = _hpcp_pipeline(sr)
+        self._out = np.empty((hpcp_frame_count(n_samples), _HPCP_SIZE), dtype=np.float32)
+        # Samples from frame ``_frame``'s start on, behind the leading pad
+        self._buf = np.zeros(_HPCP_FRAME // 2, dtype=np.float32)
+        self._frame = 0
+        self.n_samples = 0
+
+    def feed(self, block: np.ndarray) -> None:
+        """Add the next ``block`` of mono samples."""
+        block = np.asarray(block, dtype=np.float32)
+        if not len(block):
+            return
+        self.n_samples += len(block)
+        self._buf = np.concatenate([self._buf, block])
+        self._frames(final=False)
+
+    def finish(self) -> np.ndarray:
+        """Process the trailing frames and return all HPCPs, shape (n_frames, 36)."""
+        self._buf = np.concatenate([self._buf, np.zeros(_HPCP_FRAME, dtype=np.float32)])
+        self._frames(final=True)
+        return self._out[:self._frame]
+
+    def _frames(self, final: bool) -> None:
+        if final:
+            count = hpcp_frame_count(self.n_samples) - self._frame
+        else:
+            count = (len(self._buf) - _HPCP_FRAME) // _HPCP_HOP + 1
+        if count <= 0:
+            return
+        end = self._frame + count
+        if end > len(self._out):
+            grown = np.empty((max(end, 2 * len(self._out)), _HPCP_SIZE), dtype=np.float32)
+            grown[:self._frame] = self._out[:self._frame]
+            self._out = grown
+        frames = np.lib.stride_tricks.sliding_window_view(self._buf, _HPCP_FRAME)[::_HPCP_HOP][:count]
+        self._pipeline.compute(frames, self._out[self._frame:end])
+        self._frame = end
+        self._buf = self._buf[count * _HPCP_HOP:]
+
+
+def hpcp_frames(y: np.ndarray, sr: int) -> np.ndarray:
+    """HPCP frames of a whole waveform, shape (n_frames, 36)."""
+    stream = HpcpStream(sr, len(y))
+    stream.feed(y)
+    return stream.finish()
+
+
+def _detect_chords_essentia(hpcp: np.ndarray, sr: int) -> list[ChordEvent]:
+    """Detect chords from HPCP frames using essentia's ChordsDetection."""
+    try:
+        if not len(hpcp):
             return []
 
-        hpcps_array = np.array(hpcps)
-        chords_detection = es.ChordsDetection(hopSize=hop_size, sampleRate=float(sr))
-        chord_labels, chord_strengths = chords_detection(hpcps_array)
+        chord_labels, chord_strengths = _hpcp_pipeline(sr).chords(hpcp)
 
         chords = []
         prev_label = ""
         chord_start = 0.0
-        time_per_frame = hop_size / sr
+        time_per_frame = _HPCP_HOP / sr
 
         for i, label in enumerate(chord_labels):
             current_time = i * time_per_frame
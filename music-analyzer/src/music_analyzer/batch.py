@@ -0,0 +1,241 @@
+"""Whole-catalog batch analysis.
+
+Tracks are fanned out across a long-lived process pool, so librosa and any
+optional models are imported once per worker rather than once per track.
+Progress is appended to a JSONL manifest as each track finishes; re-running
+the same batch skips tracks the manifest already records as done, and tracks
+whose analysis is already in the cache are reported as ``cached``.
+
+A worker process that dies (out-of-memory kill, segfault in native code)
+breaks the pool. The tracks it had in flight are then retried one at a
+time in fresh processes, so the track that takes its worker down is
+recorded as an error and the rest of the batch carries on.
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from music_analyzer.config import SUPPORTED_FORMATS
+
+# Manifest statuses that mean a track does not need to be analyzed again
+DONE_STATUSES = {"ok", "cached"}
+
+
+def collect_audio_files(inputs: Iterable[str]) -> list[Path]:
+    """Expand directories, glob patterns and file paths into audio files.
+
+    Directories are searched recursively. Results are de-duplicated and
+    returned in sorted order; unsupported extensions are ignored.
+    """
+    found: set[Path] = set()
+    for item in inputs:
+        p = Path(item).expanduser()
+        if p.is_dir():
+            candidates: Iterable[Path] = p.rglob("*")
+        elif any(ch in item for ch in "*?["):
+            candidates = (Path(m) for m in glob.glob(str(p), recursive=True))
+        else:
+            candidates = [p]
+        for c in candidates:
+            if c.is_file() and c.suffix.lower() in SUPPORTED_FORMATS:
+                found.add(c.resolve())
+    return sorted(found)
+
+
+def load_manifest(manifest_path: Path) -> dict[str, dict]:
+    """Read a manifest and return the latest record per file path."""
+    records: dict[str, dict] = {}
+    if not manifest_path.exists():
+        return records
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partially written line from an interrupted run
+            if "file" in rec:
+                records[rec["file"]] = rec
+    return records
+
+
+def analyze_track(
+    path: str,
+    run_separation: bool = False,
+    use_cache: bool = True,
+    output_dir: Optional[str] = None,
+) -> dict:
+    """Analyze one track inside a pool worker and return its manifest record.
+
+    The JSON written to ``output_dir`` is named after the track's cache key
+    (file name plus content hash), so tracks with the same name in different
+    directories do not overwrite each other.
+    """
+    from music_analyzer.utils.cache import cache_key, get_cached, save_cache
+
+    audio_path = Path(path)
+    start = time.perf_counter()
+    record = {"file": path}
+    try:
+        data = get_cached(audio_path, "analysis") if use_cache else None
+        if data is not None:
+            record["status"] = "cached"
+        else:
+            from music_analyzer.scheduler import analyze_waveform, load_track
+
+            y, sr, waveforms = load_track(
+                audio_path, run_separation=run_separation, use_cache=use_cache,
+            )
+            result = analyze_waveform(
+                y, sr, audio_path,
+                run_separation=run_separation,
+                use_cache=use_cache,
+                waveforms=waveforms,
+            )
+            data = json.loads(result.model_dump_json(exclude_none=True))
+            if use_cache:
+                save_cache(audio_path, data, "analysis")
+            record["status"] = "ok"
+            record["duration"] = data.get("duration")
+
+        if output_dir:
+            out = Path(output_dir) / f"{cache_key(audio_path)}_analysis.json"
+            out.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+            record["output"] = str(out)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def _run_pool(
+    paths: list[str], workers: int, task_args: tuple, on_record: Callable[[dict], None],
+) -> list[str]:
+    """Analyze ``paths`` on ``workers`` processes, passing each record to ``on_record``.
+
+    At most ``workers`` tracks are in flight, so when a worker dies only
+    those are affected: they are set aside, a new pool takes over the rest,
+    and the set-aside tracks are returned.
+    """
+    queue = list(reversed(paths))
+    crashed: list[str] = []
+    while queue:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            running: dict = {}
+            broken = False
+            while (queue or running) and not broken:
+                while queue and len(running) < workers and not broken:
+                    try:
+                        running[pool.submit(analyze_track, queue[-1], *task_args)] = queue[-1]
+                        queue.pop()
+                    except BrokenProcessPool:
+                        broken = True  # Noticed before any of its futures failed
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                broken = broken or any(isinstance(fut.exception(), BrokenProcessPool) for fut in done)
+                if broken:
+                    done, _ = wait(running)  # The other futures fail right away
+                for fut in done:
+                    path = running.pop(fut)
+                    if isinstance(fut.exception(), BrokenProcessPool):
+                        crashed.append(path)
+                    else:
+                        on_record(fut.result())
+    return crashed
+
+
+def run_batch(
+    inputs: Iterable[str],
+    manifest_path: Path,
+    jobs: Optional[int] = None,
+    run_separation: bool = False,
+    use_cache: bool = True,
+    output_dir: Optional[str] = None,
+    retry_failed: bool = False,
+) -> dict:
+    """Analyze every audio file under ``inputs`` and return a run summary.
+
+    Parameters
+    ----------
+    inputs : directories, glob patterns or file paths
+    manifest_path : JSONL file recording one line per finished track
+    jobs : worker processes (default: CPU count)
+    run_separation : whether to run demucs source separation per track
+    use_cache : read/write the analysis cache
+    output_dir : also write each analysis JSON into this directory
+    retry_failed : re-run tracks the manifest records as failed
+    """
+    files = collect_audio_files(inputs)
+    previous = load_manifest(manifest_path)
+
+    skip_statuses = set(DONE_STATUSES)
+    if not retry_failed:
+        skip_statuses.add("error")
+    todo = [f for f in files if previous.get(str(f), {}).get("status") not in skip_statuses]
+    skipped = len(files) - len(todo)
+
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+
+    workers = jobs or os.cpu_count() or 1
+    print(
+        f"Batch: {len(files)} tracks, {skipped} already done, {len(todo)} to analyze "
+        f"({workers} workers)",
+        file=sys.stderr,
+    )
+
+    counts = {"ok": 0, "cached": 0, "error": 0}
+    failures = []
+    start = time.perf_counter()
+
+    task_args = (run_separation, use_cache, output_dir)
+    with open(manifest_path, "a", encoding="utf-8") as manifest:
+        def finish(rec: dict) -> None:
+            manifest.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            manifest.flush()
+
+            counts[rec["status"]] += 1
+            if rec["status"] == "error":
+                failures.append(rec)
+            print(
+                f"[{sum(counts.values())}/{len(todo)}] {rec['status']:6s} {rec['seconds']:8.2f}s  "
+                f"{Path(rec['file']).name}"
+                + (f"  ({rec['error']})" if rec["status"] == "error" else ""),
+                file=sys.stderr,
+            )
+
+        suspects = _run_pool([str(f) for f in todo], workers, task_args, finish)
+        # Retry the tracks in flight when a worker died, each in its own pool
+        for path in suspects:
+            retry_start = time.perf_counter()
+            if _run_pool([path], 1, task_args, finish):
+                finish({
+                    "file": path,
+                    "status": "error",
+                    "error": "BrokenProcessPool: worker process died",
+                    "seconds": round(time.perf_counter() - retry_start, 3),
+                })
+
+    return {
+        "total": len(files),
+        "skipped": skipped,
+        "analyzed": counts["ok"],
+        "cached": counts["cached"],
+        "failed": counts["error"],
+        "wall_seconds": round(time.perf_counter() - start, 2),
+        "manifest": str(manifest_path),
+        "failures": failures,
+    }
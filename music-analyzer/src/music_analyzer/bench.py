@@ -0,0 +1,565 @@
+"""Speed and accuracy benchmark on a synthetic corpus with known ground truth.
+
+The corpus is generated on the fly:
+
+- click tracks at a known tempo and meter (accented downbeats)
+- chord progressions in a known key (additive-synthesis pads)
+- a sine melody with a known pitch sequence
+- a composite "song" combining all three, alternating two textures every
+  16 bars so its section boundaries are known too
+
+Every track is written to a temporary WAV and pushed through the real
+pipeline stage by stage: decode, each shared feature of ``FeatureContext``,
+then each analyzer on the warm context. Wall time is recorded per stage,
+and the BPM, meter, key, chord, melody and section results are scored
+against the ground truth. Peak traced memory per stage is opt-in
+(``trace_memory``): tracemalloc slows Python-heavy stages far more than
+NumPy-heavy ones, so it is measured in a second pass of each track and the
+timings always come from the untraced one. The JSON report is meant to
+be kept per commit and compared with ``--compare`` to show that a speedup
+did not cost accuracy.
+"""
+
+from __future__ import annotations
+
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+from music_analyzer.config import DEFAULT_SR
+
+# Track lengths (seconds) of the composite song used for scaling
+DEFAULT_LENGTHS = (30, 300, 3600)
+
+# Length (seconds) of the single-attribute accuracy tracks
+DEFAULT_ACCURACY_DURATION = 30.0
+
+# FeatureContext properties timed as sub-stages, in computation order
+FEATURE_STAGES = (
+    "stft_mag", "band_energy", "mel_db", "onset_env", "onset_env_median",
+    "mfcc", "chroma_cqt", "spectral_centroid", "spectral_bandwidth",
+    "spectral_rolloff", "rms", "zcr",
+)
+
+_PITCH_CLASSES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+
+# Scale steps and diatonic chords (semitones above the tonic, quality suffix)
+_SCALES = {
+    "major": (0, 2, 4, 5, 7, 9, 11),
+    "minor": (0, 2, 3, 5, 7, 8, 10),
+}
+_PROGRESSIONS = {
+    # Two progressions per mode: texture A and texture B of the song
+    "major": (((0, ""), (7, ""), (9, "m"), (5, "")), ((9, "m"), (5, ""), (0, ""), (7, ""))),
+    "minor": (((0, "m"), (5, "m"), (8, ""), (7, "m")), ((8, ""), (3, ""), (10, ""), (0, "m"))),
+}
+_CHORD_INTERVALS = {"": (0, 4, 7), "m": (0, 3, 7)}
+
+# Melody: scale degrees, one note per beat
+_MELODY_DEGREES = (0, 2, 4, 2, 4, 5, 4, 2)
+
+# Bars per section in the composite song
+_SECTION_BARS = 16
+
+# Tolerances for scoring
+_TEMPO_TOLERANCE = 0.04
+_BOUNDARY_TOLERANCE = 3.0
+_PITCH_TOLERANCE_CENTS = 50.0
+_CHORD_SAMPLE_STEP = 0.1
+
+
+# ---------------------------------------------------------------------------
+# Synthetic corpus
+# ---------------------------------------------------------------------------
+
+def _midi_to_hz(midi: float) -> float:
+    return 440.0 * 2.0 ** ((midi - 69) / 12.0)
+
+
+def _tone(freqs: Iterable[float], n: int, sr: int, amp: float) -> np.ndarray:
+    """Additive tone (3 harmonics per frequency) with 10 ms fades, length ``n``."""
+    t = np.arange(n) / sr
+    out = np.zeros(n)
+    for f in freqs:
+        for k, weight in ((1, 1.0), (2, 0.5), (3, 0.25)):
+            out += weight * np.sin(2 * np.pi * f * k * t)
+    fade = min(int(0.01 * sr), n // 2)
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade)
+        out[:fade] *= ramp
+        out[-fade:] *= ramp[::-1]
+    return amp * out / max(np.max(np.abs(out)), 1e-9)
+
+
+def _place(track: np.ndarray, snippet: np.ndarray, start: int) -> None:
+    end = min(len(track), start + len(snippet))
+    if end > start:
+        track[start:end] += snippet[: end - start]
+
+
+def synthesize(spec: dict, sr: int = DEFAULT_SR) -> tuple[np.ndarray, dict]:
+    """Render a corpus track and return ``(waveform, ground truth)``.
+
+    Parameters
+    ----------
+    spec : track description: ``duration``, ``bpm``, ``meter``, ``tonic``
+        (pitch class name), ``mode``, and which layers to render
+        (``clicks``, ``chords``, ``melody``, ``sections``)
+    sr : sample rate
+    """
+    duration, bpm, meter = spec["duration"], spec["bpm"], spec["meter"]
+    tonic = _PITCH_CLASSES.index(spec["tonic"])
+    mode = spec["mode"]
+    n = int(duration * sr)
+    y = np.zeros(n)
+
+    beat = 60.0 / bpm
+    n_beats = int(duration / beat)
+    bar = beat * meter
+    n_bars = int(np.ceil(duration / bar))
+
+    def texture(bar_idx: int) -> int:
+        return (bar_idx // _SECTION_BARS) % 2 if spec.get("sections") else 0
+
+    truth: dict = {"bpm": bpm, "time_signature": f"{meter}/4", "key": f"{spec['tonic']} {mode}"}
+
+    if spec.get("clicks"):
+        burst_n = int(0.03 * sr)
+        decay = np.exp(-np.arange(burst_n) / (0.005 * sr))
+        t = np.arange(burst_n) / sr
+        accent = decay * np.sin(2 * np.pi * 1500 * t)
+        weak = 0.6 * decay * np.sin(2 * np.pi * 1000 * t)
+        for k in range(n_beats):
+            _place(y, accent if k % meter == 0 else weak, int(round(k * beat * sr)))
+
+    if spec.get("sections"):
+        # Texture B adds off-beat noise hats on top of its own progression
+        rng = np.random.default_rng(0)
+        hat_n = int(0.02 * sr)
+        hat = 0.3 * rng.standard_normal(hat_n) * np.exp(-np.arange(hat_n) / (0.003 * sr))
+        for k in range(n_beats):
+            if texture(int(k // meter)) == 1:
+                _place(y, hat, int(round((k + 0.5) * beat * sr)))
+        truth["boundaries"] = [
+            round(b * bar, 3) for b in range(_SECTION_BARS, n_bars, _SECTION_BARS)
+            if b * bar < duration
+        ]
+
+    if spec.get("chords"):
+        bar_n = int(round(bar * sr))
+        rendered: dict[tuple[int, str], np.ndarray] = {}
+        chords = []
+        for b in range(n_bars):
+            progression = _PROGRESSIONS[mode][texture(b)]
+            step, quality = progression[b % len(progression)]
+            root = (tonic + step) % 12
+            if (root, quality) not in rendered:
+                freqs = [_midi_to_hz(48 + root + i) for i in _CHORD_INTERVALS[quality]]
+                rendered[(root, quality)] = _tone(freqs, bar_n, sr, amp=0.3)
+            _place(y, rendered[(root, quality)], int(round(b * bar * sr)))
+            chords.append((round(b * bar, 3), round(min((b + 1) * bar, duration), 3),
+                           f"{_PITCH_CLASSES[root]}{quality}"))
+        truth["chords"] = chords
+
+    if spec.get("melody"):
+        note_n = int(0.9 * beat * sr)
+        scale = _SCALES[mode]
+        rendered_notes: dict[float, np.ndarray] = {}
+        melody = []
+        for k in range(n_beats):
+            degree = _MELODY_DEGREES[k % len(_MELODY_DEGREES)]
+            octave = 12 * texture(int(k // meter))
+            freq = _midi_to_hz(72 + tonic + scale[degree] + octave)
+            if freq not in rendered_notes:
+                rendered_notes[freq] = _tone([freq], note_n, sr, amp=0.5)
+            start = k * beat
+            _place(y, rendered_notes[freq], int(round(start * sr)))
+            melody.append((round(start, 3), round(start + 0.9 * beat, 3), round(freq, 2)))
+        truth["melody"] = melody
+
+    y = (0.8 * y / max(np.max(np.abs(y)), 1e-9)).astype(np.float32)
+    return y, truth
+
+
+def corpus(
+    lengths: Iterable[float] = DEFAULT_LENGTHS,
+    accuracy_duration: float = DEFAULT_ACCURACY_DURATION,
+) -> list[dict]:
+    """Track specs: fixed-length accuracy tracks plus the song at each length."""
+    d = accuracy_duration
+    specs = [
+        {"name": "click_128_4-4", "duration": d, "bpm": 128, "meter": 4,
+         "tonic": "C", "mode": "major", "clicks": True},
+        {"name": "click_96_3-4", "duration": d, "bpm": 96, "meter": 3,
+         "tonic": "C", "mode": "major", "clicks": True},
+        {"name": "chords_G_major", "duration": d, "bpm": 100, "meter": 4,
+         "tonic": "G", "mode": "major", "chords": True},
+        {"name": "chords_D_minor", "duration": d, "bpm": 100, "meter": 4,
+         "tonic": "D", "mode": "minor", "chords": True},
+        {"name": "melody_A_major", "duration": d, "bpm": 110, "meter": 4,
+         "tonic": "A", "mode": "major", "melody": True},
+    ]
+    for length in lengths:
+        specs.append({
+            "name": f"song_{int(length)}s", "duration": float(length), "bpm": 120, "meter": 4,
+            "tonic": "E", "mode": "major",
+            "clicks": True, "chords": True, "melody": True, "sections": True,
+        })
+    return specs
+
+
+# ---------------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------------
+
+def _score_tempo(estimate: float, truth: float) -> dict:
+    def within(target: float) -> bool:
+        return abs(estimate - target) <= _TEMPO_TOLERANCE * target
+
+    return {
+        "abs_error_pct": round(100.0 * abs(estimate - truth) / truth, 2),
+        "acc1": within(truth),
+        "acc2": any(within(truth * m) for m in (1 / 3, 1 / 2, 1, 2, 3)),
+    }
+
+
+def _score_key(estimate: str, truth: str) -> float:
+    """MIREX weighted key score: exact 1, fifth 0.5, relative 0.3, parallel 0.2."""
+    try:
+        est_tonic, est_mode = estimate.split()
+        true_tonic, true_mode = truth.split()
+        est_pc = _PITCH_CLASSES.index(est_tonic)
+        true_pc = _PITCH_CLASSES.index(true_tonic)
+    except ValueError:
+        return 0.0
+    if est_mode == true_mode:
+        if est_pc == true_pc:
+            return 1.0
+        if (est_pc - true_pc) % 12 in (5, 7):
+            return 0.5
+        return 0.0
+    if est_pc == true_pc:
+        return 0.2
+    relative = (true_pc + (9 if true_mode == "major" else 3)) % 12
+    return 0.3 if est_pc == relative else 0.0
+
+
+def _label_at(times: np.ndarray, spans: list[tuple[float, float, str]]) -> np.ndarray:
+    labels = np.full(len(times), "N", dtype=object)
+    for start, end, label in spans:
+        labels[(times >= start) & (times < end)] = label
+    return labels
+
+
+def _score_chords(events: list[dict], truth: list, duration: float) -> float:
+    """Fraction of time the estimated chord label equals the true one."""
+    times = np.arange(0.0, duration, _CHORD_SAMPLE_STEP)
+    estimated = [(e["time"], e["time"] + e["duration"], e["chord"]) for e in events]
+    return round(float(np.mean(_label_at(times, estimated) == _label_at(times, truth))), 3)
+
+
+def _score_boundaries(sections: list[dict], truth: list[float]) -> dict:
+    estimated = [s["start"] for s in sections if s["start"] > 0]
+    unmatched = list(truth)
+    hits = 0
+    for b in estimated:
+        match = next((t for t in unmatched if abs(t - b) <= _BOUNDARY_TOLERANCE), None)
+        if match is not None:
+            unmatched.remove(match)
+            hits += 1
+    precision = hits / len(estimated) if estimated else float(not truth)
+    recall = hits / len(truth) if truth else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "precision": round(precision, 3),
+        "recall": round(recall, 3),
+        "f1": round(f1, 3),
+        "n_estimated": len(estimated),
+        "n_truth": len(truth),
+    }
+
+
+def _score_melody(contour: list[float], truth: list, duration: float, sr: int) -> dict:
+    """Raw pitch accuracy (within 50 cents) and voicing recall on voiced points."""
+    from music_analyzer.analyzers.features import HOP_LENGTH
+
+    n_frames = 1 + int(duration * sr) // HOP_LENGTH
+    n = len(contour)
+    frames = np.arange(n) if n_frames <= n else (np.arange(n) * (n_frames / n)).astype(int)
+    times = frames * HOP_LENGTH / sr
+
+    true_f0 = np.zeros(n)
+    for start, end, freq in truth:
+        true_f0[(times >= start) & (times < end)] = freq
+    est = np.asarray(contour, dtype=float)
+    voiced = true_f0 > 0
+    both = voiced & (est > 0)
+    cents = np.full(n, np.inf)
+    cents[both] = np.abs(1200 * np.log2(est[both] / true_f0[both]))
+    return {
+        "raw_pitch_accuracy": round(float(np.mean(cents[voiced] <= _PITCH_TOLERANCE_CENTS)), 3)
+        if voiced.any() else None,
+        "voicing_recall": round(float(np.mean(est[voiced] > 0)), 3) if voiced.any() else None,
+    }
+
+
+def score(results: dict, truth: dict, spec: dict, sr: int) -> dict:
+    """Score analyzer results against a track's ground truth."""
+    accuracy: dict = {}
+    duration = spec["duration"]
+    if "rhythm" in results and spec.get("clicks"):
+        rhythm = results["rhythm"]
+        accuracy["tempo"] = _score_tempo(rhythm["bpm"], truth["bpm"])
+        accuracy["time_signature"] = rhythm["time_signature"] == truth["time_signature"]
+    if "rhythm" in results and "boundaries" in truth:
+        accuracy["sections"] = _score_boundaries(results["rhythm"]["sections"], truth["boundaries"])
+    if "tonality" in results and spec.get("chords"):
+        tonality = results["tonality"]
+        accuracy["key"] = _score_key(tonality["key"], truth["key"])
+        accuracy["chords"] = _score_chords(tonality["chords"], truth["chords"], duration)
+    if "tonality" in results and spec.get("melody"):
+        accuracy["melody"] = _score_melody(
+            results["tonality"]["melody_contour"], truth["melody"], duration, sr,
+        )
+    return accuracy
+
+
+# ---------------------------------------------------------------------------
+# Running
+# ---------------------------------------------------------------------------
+
+def _measure(fn: Callable[[], object]) -> tuple[object, float, Optional[float]]:
+    """Run ``fn``; return (result, wall seconds, peak traced MB during the call).
+
+    The peak is ``None`` unless tracemalloc is tracing.
+    """
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - start
+    if not tracing:
+        return out, round(elapsed, 4), None
+    peak = tracemalloc.get_traced_memory()[1]
+    return out, round(elapsed, 4), round((peak - base) / 1e6, 1)
+
+
+def run_case(
+    spec: dict,
+    workdir: Path,
+    names: Optional[Iterable[str]] = None,
+    run_separation: bool = False,
+    sr: int = DEFAULT_SR,
+) -> dict:
+    """Synthesize, analyze, time and score one corpus track.
+
+    Peak traced memory per stage is added when tracemalloc is tracing.
+    """
+    import soundfile as sf
+
+    from music_analyzer.analyzers.features import FeatureContext
+    from music_analyzer.scheduler import ANALYZER_DEPS, analyzer_options, call_analyzer, resolve_analyzers
+    from music_analyzer.utils.audio_io import load_audio
+
+    timings: dict = {"features": {}, "analyzers": {}}
+    memory: dict = {"features": {}, "analyzers": {}}
+
+    (y_synth, truth), timings["synthesize"], _ = _measure(lambda: synthesize(spec, sr))
+    path = workdir / f"{spec['name']}.wav"
+    sf.write(str(path), y_synth, sr, subtype="FLOAT")
+    del y_synth
+
+    (y, _), timings["decode"], memory["decode"] = _measure(
+        lambda: load_audio(path, use_cache=False)
+    )
+
+    features = FeatureContext(y, sr)
+    for stage in FEATURE_STAGES:
+        _, timings["features"][stage], memory["features"][stage] = _measure(
+            lambda: getattr(features, stage)
+        )
+
+    options = analyzer_options(audio_path=path, run_separation=run_separation)
+    results = {}
+    for name in resolve_analyzers(ANALYZER_DEPS if names is None else names):
+        if name == "separation" and not run_separation:
+            continue
+        deps = {d: results[d] for d in ANALYZER_DEPS[name]}
+        results[name], timings["analyzers"][name], memory["analyzers"][name] = _measure(
+            lambda: call_analyzer(name, y, sr, options, deps, features=features)
+        )
+
+    timings["total"] = round(
+        timings["decode"] + sum(timings["features"].values()) + sum(timings["analyzers"].values()), 4
+    )
+    dumped = {
+        k: json.loads(v.model_dump_json(exclude_none=True)) for k, v in results.items() if v is not None
+    }
+    path.unlink(missing_ok=True)
+
+    summary = {}
+    if "rhythm" in dumped:
+        summary.update(
+            bpm=dumped["rhythm"]["bpm"],
+            time_signature=dumped["rhythm"]["time_signature"],
+            n_sections=len(dumped["rhythm"]["sections"]),
+        )
+    if "tonality" in dumped:
+        summary.update(key=dumped["tonality"]["key"], n_chords=len(dumped["tonality"]["chords"]))
+
+    truth_summary = {k: v for k, v in truth.items() if k not in ("chords", "melody")}
+    case = {
+        "name": spec["name"],
+        "duration": spec["duration"],
+        "truth": truth_summary,
+        "results": summary,
+        "accuracy": score(dumped, truth, spec, sr),
+        "seconds": timings,
+    }
+    if tracemalloc.is_tracing():
+        case["peak_traced_mb"] = memory
+    return case
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _summarize(cases: list[dict]) -> dict:
+    """Mean of every numeric / boolean accuracy metric across cases."""
+    values: dict[str, list[float]] = {}
+
+    def collect(prefix: str, node) -> None:
+        if isinstance(node, dict):
+            for k, v in node.items():
+                if not k.startswith("n_"):
+                    collect(f"{prefix}.{k}" if prefix else k, v)
+        elif isinstance(node, (bool, int, float)):
+            values.setdefault(prefix, []).append(float(node))
+
+    for case in cases:
+        collect("", case["accuracy"])
+    return {k: round(float(np.mean(v)), 3) for k, v in sorted(values.items())}
+
+
+def _max_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process, or ``None`` without ``resource`` (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_bench(
+    lengths: Iterable[float] = DEFAULT_LENGTHS,
+    accuracy_duration: float = DEFAULT_ACCURACY_DURATION,
+    names: Optional[Iterable[str]] = None,
+    run_separation: bool = False,
+    trace_memory: bool = False,
+) -> dict:
+    """Run the whole corpus and return the benchmark report.
+
+    Parameters
+    ----------
+    lengths : durations (s) of the composite song used for scaling
+    accuracy_duration : duration (s) of the single-attribute accuracy tracks
+    names : analyzers to run (default: all)
+    run_separation : include demucs source separation
+    trace_memory : also record peak traced memory per stage, from a second
+        (traced) pass of every track
+    """
+    import librosa
+
+    from music_analyzer import __version__
+    from music_analyzer.config import dependency_tier
+
+    cases = []
+    with tempfile.TemporaryDirectory(prefix="music-analyzer-bench-") as tmp:
+        # Untimed warm-up so JIT compilation and lazy imports are not
+        # charged to the first case
+        warmup = dict(corpus((), 5.0)[0], name="warmup")
+        run_case(warmup, Path(tmp), names=names, run_separation=run_separation)
+        for spec in corpus(lengths, accuracy_duration):
+            print(f"[bench] {spec['name']} ({spec['duration']:.0f}s)...", file=sys.stderr)
+            case = run_case(spec, Path(tmp), names=names, run_separation=run_separation)
+            print(
+                f"[bench] {spec['name']}: {case['seconds']['total']:.2f}s "
+                f"{json.dumps(case['accuracy'])}",
+                file=sys.stderr,
+            )
+            if trace_memory:
+                tracemalloc.start()
+                try:
+                    traced = run_case(spec, Path(tmp), names=names, run_separation=run_separation)
+                finally:
+                    tracemalloc.stop()
+                case["peak_traced_mb"] = traced["peak_traced_mb"]
+            cases.append(case)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "version": __version__,
+        "commit": _git_commit(),
+        "tier": dependency_tier(),
+        "platform": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "numpy": np.__version__,
+            "librosa": librosa.__version__,
+        },
+        "sample_rate": DEFAULT_SR,
+        "max_rss_mb": _max_rss_mb(),
+        "accuracy": _summarize(cases),
+        "cases": cases,
+    }
+
+
+def compare_reports(current: dict, baseline: dict) -> dict:
+    """Per-case speedups and accuracy deltas of ``current`` against ``baseline``."""
+    base_cases = {c["name"]: c for c in baseline.get("cases", [])}
+    cases = {}
+    for case in current["cases"]:
+        base = base_cases.get(case["name"])
+        if base is None:
+            continue
+        stages = {"decode": (base["seconds"]["decode"], case["seconds"]["decode"])}
+        for group in ("features", "analyzers"):
+            for stage, t in case["seconds"][group].items():
+                if stage in base["seconds"][group]:
+                    stages[f"{group}.{stage}"] = (base["seconds"][group][stage], t)
+        stages["total"] = (base["seconds"]["total"], case["seconds"]["total"])
+        cases[case["name"]] = {
+            stage: round(old / new, 2) if new > 0 else None for stage, (old, new) in stages.items()
+        }
+
+    accuracy = {
+        metric: round(value - baseline["accuracy"][metric], 3)
+        for metric, value in current["accuracy"].items()
+        if metric in baseline.get("accuracy", {})
+    }
+    return {
+        "baseline_commit": baseline.get("commit"),
+        "speedup": cases,
+        "accuracy_delta": accuracy,
+    }
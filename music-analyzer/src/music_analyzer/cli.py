@@ -1,15 +1,33 @@
 """CLI entry point for music_analyzer.
 
 Usage:
-    python3 -m music_analyzer analyze <audio_file> [--output <path>] [--no-cache] [--no-separation]
+    python3 -m music_analyzer analyze <audio_file> [--output <path>] [--no-cache] [--no-separation] [--jobs <n>]
+    python3 -m music_analyzer analyze <audio_file> --stream [--block-seconds <s>]
+    python3 -m music_analyzer analyze <audio_file> --fast [--refine]
+                                             [--profile] [--profile-memory] [--profile-trace <trace.json>]
     python3 -m music_analyzer rhythm <audio_file>
     python3 -m music_analyzer emotion <audio_file>
     python3 -m music_analyzer timbre <audio_file> [--no-separation]
-    python3 -m music_analyzer tonality <audio_file>
-    python3 -m music_analyzer lyrics <audio_file> [--model-size <size>]
+    python3 -m music_analyzer tonality <audio_file> [--chord-vocab triads|sevenths] [--chord-smoothing none|viterbi]
+                                              [--melody-points N] [--melody-method piptrack|pyin]
+    python3 -m music_analyzer lyrics <audio_file> [--model-size <size>] [--no-vocal-gate] [--whisper-workers <n>]
     python3 -m music_analyzer dreamina <audio_file_or_json> [--output <path>]
     python3 -m music_analyzer storyboard <audio_file_or_json> [--output <path>]
     python3 -m music_analyzer color-palette <audio_file_or_json>
+    python3 -m music_analyzer batch <dir_or_glob>... [--manifest <path>] [--jobs <n>] [--output-dir <dir>]
+    python3 -m music_analyzer serve [--socket <path>] [--no-preload]
+    python3 -m music_analyzer cache stats
+    python3 -m music_analyzer cache prune [--max-size <size>] [--stems-max <size>] [--audio-max <size>] [--dry-run]
+    python3 -m music_analyzer bench [--lengths <s>...] [--accuracy-duration <s>] [--memory] [--output <path>] [--compare <old.json>]
+
+The analyze and single-analyzer commands forward to a running ``serve``
+daemon when one is listening (pass ``--no-daemon`` to always run in-process).
+
+``--profile`` (analyze, single-analyzer and formatter commands) adds a
+``profile`` key with per-stage wall / CPU time and RSS to the output;
+``--profile-memory`` adds tracemalloc peaks (slower), and ``--profile-trace``
+also writes the spans as a Chrome trace. Profiled runs always execute
+in-process.
 """
 
 from __future__ import annotations
@@ -35,21 +53,127 @@ def main() -> None:
     p_analyze.add_argument("--output", "-o", help="Output JSON path (default: stdout)")
     p_analyze.add_argument("--no-cache", action="store_true", help="Bypass cache")
     p_analyze.add_argument("--no-separation", action="store_true", help="Skip source separation")
+    p_analyze.add_argument(
+        "--jobs", "-j", type=int, default=None,
+        help="Worker processes for running analyzers in parallel (default: auto, 1 = sequential); "
+        "a serve daemon ignores it and runs the analyzers sequentially with its warm models",
+    )
+    p_analyze.add_argument("--no-daemon", action="store_true", help="Do not use a running serve daemon")
+    p_analyze.add_argument(
+        "--stream", action="store_true",
+        help="Read the file in blocks with flat memory, for multi-hour recordings "
+             "(no separation or transcription)",
+    )
+    p_analyze.add_argument(
+        "--block-seconds", type=float, default=None,
+        help="Seconds of audio decoded per block with --stream (default: 30)",
+    )
+    p_analyze.add_argument(
+        "--fast", action="store_true",
+        help="Quick preview at a reduced rate on excerpts of the track; "
+             "fields are tagged with their precision under 'precision'",
+    )
+    p_analyze.add_argument(
+        "--refine", action="store_true",
+        help="With --fast, run the full analysis in the background afterwards and update the cache",
+    )
+    _add_profile_args(p_analyze)
 
     # --- individual analyzers ---
     for cmd in ("rhythm", "emotion", "timbre", "tonality", "lyrics"):
         p = sub.add_parser(cmd, help=f"Run {cmd} analysis only")
         p.add_argument("audio", help="Path to audio file")
+        p.add_argument("--no-cache", action="store_true", help="Bypass cache")
         if cmd == "timbre":
             p.add_argument("--no-separation", action="store_true")
         if cmd == "lyrics":
             p.add_argument("--model-size", default="base", help="Whisper model size")
+            p.add_argument(
+                "--no-vocal-gate", action="store_true",
+                help="Always transcribe the full mix, even when no vocals are detected",
+            )
+            p.add_argument(
+                "--whisper-workers", type=int, default=None,
+                help="Concurrent Whisper decoders for recordings over 10 min (default: half the cores)",
+            )
+        if cmd == "tonality":
+            p.add_argument(
+                "--chord-vocab", choices=["triads", "sevenths"], default="triads",
+                help="Chord templates (librosa path)",
+            )
+            p.add_argument(
+                "--chord-smoothing", choices=["none", "viterbi"], default="none",
+                help="Smooth the chord sequence with an HMM (librosa path)",
+            )
+            p.add_argument(
+                "--melody-points", type=int, default=200,
+                help="Number of points in the melody contour (default: 200)",
+            )
+            p.add_argument(
+                "--melody-method", choices=["piptrack", "pyin"], default="piptrack",
+                help="Melody extractor: strongest spectral peak or voiced-only pYIN f0",
+            )
+        p.add_argument("--no-daemon", action="store_true", help="Do not use a running serve daemon")
+        _add_profile_args(p)
 
     # --- formatters ---
     for cmd in ("dreamina", "storyboard", "color-palette"):
         p = sub.add_parser(cmd, help=f"Generate {cmd} output")
         p.add_argument("input", help="Audio file or analysis JSON path")
         p.add_argument("--output", "-o", help="Output path (default: stdout)")
+        _add_profile_args(p)
+
+    # --- batch ---
+    p_batch = sub.add_parser("batch", help="Analyze many files with a persistent worker pool")
+    p_batch.add_argument("inputs", nargs="+", help="Audio files, directories or glob patterns")
+    p_batch.add_argument(
+        "--manifest", "-m", default="music_analyzer_batch.jsonl",
+        help="Resumable JSONL manifest (default: ./music_analyzer_batch.jsonl)",
+    )
+    p_batch.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: CPU count)")
+    p_batch.add_argument("--output-dir", help="Also write each analysis JSON into this directory (<name>_<content hash>_analysis.json)")
+    p_batch.add_argument("--output", "-o", help="Summary JSON path (default: stdout)")
+    p_batch.add_argument("--no-cache", action="store_true", help="Bypass cache")
+    p_batch.add_argument("--separation", action="store_true", help="Run source separation per track")
+    p_batch.add_argument("--retry-failed", action="store_true", help="Re-run tracks that failed previously")
+
+    # --- serve ---
+    p_serve = sub.add_parser("serve", help="Run an analysis daemon with models loaded once")
+    p_serve.add_argument("--socket", help="Unix socket path (default: $MUSIC_ANALYZER_SOCKET or cache dir)")
+    p_serve.add_argument("--no-preload", action="store_true", help="Load models on first use instead of at startup")
+    p_serve.add_argument("--model-size", default="base", help="Whisper model size to preload")
+
+    # --- cache ---
+    p_cache = sub.add_parser("cache", help="Inspect or prune the analysis cache")
+    cache_sub = p_cache.add_subparsers(dest="cache_command", required=True)
+    cache_sub.add_parser("stats", help="Show cache size per category")
+    p_prune = cache_sub.add_parser("prune", help="Evict least recently used entries over budget")
+    p_prune.add_argument("--max-size", help="Budget for analysis results and features (e.g. 2G)")
+    p_prune.add_argument("--stems-max", help="Budget for separated stems (e.g. 10G)")
+    p_prune.add_argument("--audio-max", help="Budget for decoded audio (e.g. 5G)")
+    p_prune.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+
+    # --- bench ---
+    p_bench = sub.add_parser("bench", help="Benchmark speed and accuracy on a synthetic corpus")
+    p_bench.add_argument(
+        "--lengths", type=float, nargs="+", default=None,
+        help="Durations in seconds of the composite test song (default: 30 300 3600)",
+    )
+    p_bench.add_argument(
+        "--accuracy-duration", type=float, default=None,
+        help="Duration in seconds of the single-attribute accuracy tracks (default: 30)",
+    )
+    p_bench.add_argument(
+        "--analyzers", nargs="+", default=None,
+        help="Analyzers to run (default: all; dependencies are added)",
+    )
+    p_bench.add_argument("--separation", action="store_true", help="Include source separation in timbre")
+    p_bench.add_argument(
+        "--memory", action="store_true",
+        help="Also record peak traced memory per stage, in a second traced pass (slower)",
+    )
+    p_bench.add_argument("--output", "-o", help="Report JSON path (default: stdout)")
+    p_bench.add_argument("--compare", help="Earlier report to compute speedups and accuracy deltas against")
 
     # --- visualize ---
     p_vis = sub.add_parser("visualize", help="Generate HTML visualization report")
@@ -60,7 +184,15 @@ def main() -> None:
     args = parser.parse_args()
 
     try:
-        _dispatch(args)
+        trace_memory = getattr(args, "profile_memory", False)
+        if getattr(args, "profile", False) or trace_memory or getattr(args, "profile_trace", None):
+            from music_analyzer.utils.profiling import profiling
+
+            args.no_daemon = True  # Measure this process, not the daemon
+            with profiling(trace_memory=trace_memory):
+                _dispatch(args)
+        else:
+            _dispatch(args)
     except KeyboardInterrupt:
         sys.exit(130)
     except Exception as e:
@@ -68,6 +200,18 @@ def main() -> None:
         sys.exit(1)
 
 
+def _add_profile_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument(
+        "--profile", action="store_true",
+        help="Add per-stage timing and memory to the output under 'profile'",
+    )
+    p.add_argument(
+        "--profile-memory", action="store_true",
+        help="Also record peak traced allocations per stage (implies --profile; slower)",
+    )
+    p.add_argument("--profile-trace", help="Also write the profile as a Chrome trace JSON to this path")
+
+
 def _dispatch(args: argparse.Namespace) -> None:
     """Route to the appropriate handler."""
     cmd = args.command
@@ -80,6 +224,14 @@ def _dispatch(args: argparse.Namespace) -> None:
         _cmd_format(args)
     elif cmd == "visualize":
         _cmd_visualize(args)
+    elif cmd == "batch":
+        _cmd_batch(args)
+    elif cmd == "serve":
+        _cmd_serve(args)
+    elif cmd == "cache":
+        _cmd_cache(args)
+    elif cmd == "bench":
+        _cmd_bench(args)
     else:
         print(f"Unknown command: {cmd}", file=sys.stderr)
         sys.exit(1)
@@ -87,118 +239,184 @@ def _dispatch(args: argparse.Namespace) -> None:
 
 def _cmd_analyze(args: argparse.Namespace) -> None:
     """Full analysis pipeline."""
-    from music_analyzer.utils.audio_io import validate_audio_path, load_audio, get_audio_info
+    from music_analyzer.utils.audio_io import validate_audio_path, get_audio_info
     from music_analyzer.utils.cache import get_cached, save_cache
-    from music_analyzer.analyzers.rhythm import analyze_rhythm
-    from music_analyzer.analyzers.tonality import analyze_tonality
-    from music_analyzer.analyzers.onset import analyze_onsets
-    from music_analyzer.analyzers.timbre import analyze_timbre
-    from music_analyzer.analyzers.emotion import analyze_emotion
-    from music_analyzer.analyzers.lyrics import analyze_lyrics
-    from music_analyzer.formatters.color_palette import generate_color_palette
-    from music_analyzer.models import MusicAnalysisResult
+    from music_analyzer.scheduler import analyze_waveform, load_track
+    from music_analyzer.utils.profiling import span
 
     audio_path = validate_audio_path(args.audio)
+    if args.refine and not args.fast:
+        raise ValueError("--refine only applies to --fast")
+    if args.fast:
+        _cmd_analyze_fast(args, audio_path)
+        return
+    if args.stream:
+        _cmd_analyze_stream(args, audio_path)
+        return
+
+    if not args.no_daemon:
+        data = _try_daemon(args, audio_path)
+        if data is not None:
+            _output_json(data, getattr(args, "output", None))
+            return
 
     # Check cache
     if not args.no_cache:
         cached = get_cached(audio_path, "analysis")
         if cached:
-            _output_json(cached, getattr(args, "output", None))
+            _output_json(_with_profile(cached, args), getattr(args, "output", None))
             return
 
     # Load audio
     info = get_audio_info(audio_path)
-    y, sr = load_audio(audio_path)
+    y, sr, waveforms = load_track(
+        audio_path, run_separation=not args.no_separation, use_cache=not args.no_cache,
+    )
 
     tier = dependency_tier()
     print(f"Analyzing {audio_path.name} (tier: {tier})...", file=sys.stderr)
 
-    # Run analyzers
-    rhythm = analyze_rhythm(y, sr)
-    tonality = analyze_tonality(y, sr)
-    onsets = analyze_onsets(y, sr)
-    timbre = analyze_timbre(
-        y, sr,
-        audio_path=audio_path,
+    result = analyze_waveform(
+        y, sr, audio_path,
         run_separation=not args.no_separation,
-    )
-    emotion = analyze_emotion(
-        y, sr,
-        key_mode=tonality.mode,
-        bpm=rhythm.bpm,
-    )
-    lyrics = analyze_lyrics(y, sr, audio_path=audio_path)
-
-    # Assemble result
-    result = MusicAnalysisResult(
-        file_path=str(audio_path),
-        file_name=audio_path.name,
-        duration=rhythm.duration,
-        sample_rate=sr,
-        dependency_tier=tier,
-        rhythm=rhythm,
-        emotion=emotion,
-        timbre=timbre,
-        tonality=tonality,
-        lyrics=lyrics,
-        onsets=onsets,
+        jobs=args.jobs,
+        use_cache=not args.no_cache,
+        waveforms=waveforms,
     )
 
-    # Generate color palette from results
-    result.color_palette = generate_color_palette(result)
-
     # Output
-    data = json.loads(result.model_dump_json(exclude_none=True))
+    with span("format:json", "format"):
+        data = json.loads(result.model_dump_json(exclude_none=True))
 
     if not args.no_cache:
         save_cache(audio_path, data, "analysis")
 
-    _output_json(data, getattr(args, "output", None))
+    _output_json(_with_profile(data, args), getattr(args, "output", None))
+
+
+def _cmd_analyze_stream(args: argparse.Namespace, audio_path: Path) -> None:
+    """Full analysis on block-wise features (``--stream``), in-process."""
+    from music_analyzer.utils.cache import get_cached, save_cache
+    from music_analyzer.scheduler import analyze_stream
+    from music_analyzer.utils.profiling import span
+
+    # Cached apart from whole-track analyses, whose features can differ slightly
+    if not args.no_cache:
+        cached = get_cached(audio_path, "analysis-stream")
+        if cached:
+            _output_json(_with_profile(cached, args), getattr(args, "output", None))
+            return
+
+    print(f"Analyzing {audio_path.name} block by block (tier: {dependency_tier()})...", file=sys.stderr)
+    result = analyze_stream(audio_path, block_seconds=args.block_seconds)
+
+    with span("format:json", "format"):
+        data = json.loads(result.model_dump_json(exclude_none=True))
+
+    if not args.no_cache:
+        save_cache(audio_path, data, "analysis-stream")
+
+    _output_json(_with_profile(data, args), getattr(args, "output", None))
+
+
+def _cmd_analyze_fast(args: argparse.Namespace, audio_path: Path) -> None:
+    """Preview analysis (``--fast``), optionally refined in the background."""
+    from music_analyzer.utils.profiling import span
+
+    if args.stream:
+        raise ValueError("--fast and --stream cannot be combined")
+    if args.refine and args.no_cache:
+        raise ValueError("--refine stores its result in the cache; it cannot be used with --no-cache")
+
+    data = None
+    if not args.no_daemon:
+        data = _try_daemon(args, audio_path)
+    if data is None:
+        from music_analyzer.scheduler import analyze_preview
+
+        result = analyze_preview(audio_path, use_cache=not args.no_cache)
+        with span("format:json", "format"):
+            data = json.loads(result.model_dump_json(exclude_none=True))
+        if args.refine and "preview" in data["precision"].values():
+            _spawn_refinement(args, audio_path)
+
+    _output_json(_with_profile(data, args), getattr(args, "output", None))
+
+
+def _spawn_refinement(args: argparse.Namespace, audio_path: Path) -> None:
+    """Start a detached full ``analyze`` run that updates the cache."""
+    import subprocess
+
+    cmd = [sys.executable, "-m", "music_analyzer", "analyze", str(audio_path)]
+    if args.no_separation:
+        cmd.append("--no-separation")
+    if args.no_daemon:
+        cmd.append("--no-daemon")
+    if args.jobs is not None:
+        cmd += ["--jobs", str(args.jobs)]
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    print(f"Refining in the background (pid {proc.pid}); the cached analysis is updated when done", file=sys.stderr)
 
 
 def _cmd_single(args: argparse.Namespace) -> None:
     """Single analyzer command."""
-    from music_analyzer.utils.audio_io import validate_audio_path, load_audio
+    from music_analyzer.utils.audio_io import validate_audio_path
+    from music_analyzer.scheduler import analyze_single
 
     audio_path = validate_audio_path(args.audio)
-    y, sr = load_audio(audio_path)
-    cmd = args.command
 
-    if cmd == "rhythm":
-        from music_analyzer.analyzers.rhythm import analyze_rhythm
-        result = analyze_rhythm(y, sr)
-    elif cmd == "tonality":
-        from music_analyzer.analyzers.tonality import analyze_tonality
-        result = analyze_tonality(y, sr)
-    elif cmd == "timbre":
-        from music_analyzer.analyzers.timbre import analyze_timbre
-        result = analyze_timbre(
-            y, sr,
-            audio_path=audio_path,
+    data = None if args.no_daemon else _try_daemon(args, audio_path)
+    if data is None:
+        data = analyze_single(
+            args.command,
+            audio_path,
             run_separation=not getattr(args, "no_separation", False),
-        )
-    elif cmd == "emotion":
-        from music_analyzer.analyzers.emotion import analyze_emotion
-        # For standalone emotion, first detect key for better heuristic
-        from music_analyzer.analyzers.tonality import analyze_tonality
-        from music_analyzer.analyzers.rhythm import analyze_rhythm
-        tonality = analyze_tonality(y, sr)
-        rhythm = analyze_rhythm(y, sr)
-        result = analyze_emotion(y, sr, key_mode=tonality.mode, bpm=rhythm.bpm)
-    elif cmd == "lyrics":
-        from music_analyzer.analyzers.lyrics import analyze_lyrics
-        result = analyze_lyrics(
-            y, sr,
-            audio_path=audio_path,
             model_size=getattr(args, "model_size", "base"),
+            chord_vocabulary=getattr(args, "chord_vocab", "triads"),
+            chord_smoothing=getattr(args, "chord_smoothing", "none"),
+            melody_points=getattr(args, "melody_points", 200),
+            melody_method=getattr(args, "melody_method", "piptrack"),
+            vocal_gate=not getattr(args, "no_vocal_gate", False),
+            whisper_workers=getattr(args, "whisper_workers", None),
+            use_cache=not args.no_cache,
         )
-    else:
-        print(f"Unknown analyzer: {cmd}", file=sys.stderr)
-        sys.exit(1)
-
-    data = json.loads(result.model_dump_json(exclude_none=True))
-    _output_json(data)
+    _output_json(_with_profile(data, args))
+
+
+def _try_daemon(args: argparse.Namespace, audio_path: Path) -> dict | None:
+    """Forward an analyzer command to a running daemon, if there is one.
+
+    Returns ``None`` when no daemon is listening or the daemon fails (e.g.
+    a stale daemon running older code), so the caller runs in-process.
+    """
+    from music_analyzer.server import request_daemon
+
+    request = {
+        "command": args.command,
+        "audio": str(audio_path),
+        "no_cache": getattr(args, "no_cache", False),
+        "no_separation": getattr(args, "no_separation", False),
+        "model_size": getattr(args, "model_size", "base"),
+        "chord_vocabulary": getattr(args, "chord_vocab", "triads"),
+        "chord_smoothing": getattr(args, "chord_smoothing", "none"),
+        "melody_points": getattr(args, "melody_points", 200),
+        "melody_method": getattr(args, "melody_method", "piptrack"),
+        "no_vocal_gate": getattr(args, "no_vocal_gate", False),
+        "whisper_workers": getattr(args, "whisper_workers", None),
+        "fast": getattr(args, "fast", False),
+        "refine": getattr(args, "refine", False),
+    }
+    try:
+        return request_daemon(request)
+    except (RuntimeError, OSError, ValueError) as e:
+        print(f"Warning: {e}; running locally instead", file=sys.stderr)
+        return None
 
 
 def _cmd_format(args: argparse.Namespace) -> None:
@@ -210,71 +428,113 @@ def _cmd_format(args: argparse.Namespace) -> None:
         from music_analyzer.formatters.json_formatter import load_analysis_json
         analysis = load_analysis_json(str(input_path))
     elif input_path.suffix.lower() in SUPPORTED_FORMATS:
-        # Run full analysis first
-        from music_analyzer.utils.audio_io import validate_audio_path, load_audio, get_audio_info
-        from music_analyzer.utils.cache import get_cached
-        from music_analyzer.models import MusicAnalysisResult
+        # Run the analyzers this formatter reads (cached results are reused)
+        from music_analyzer.utils.audio_io import validate_audio_path
+        from music_analyzer.scheduler import analyze_fields
 
         audio_path = validate_audio_path(str(input_path))
-
-        # Try cache
-        cached = get_cached(audio_path, "analysis")
-        if cached:
-            analysis = MusicAnalysisResult(**cached)
-        else:
-            # Run analysis
-            from music_analyzer.analyzers.rhythm import analyze_rhythm
-            from music_analyzer.analyzers.tonality import analyze_tonality
-            from music_analyzer.analyzers.onset import analyze_onsets
-            from music_analyzer.analyzers.timbre import analyze_timbre
-            from music_analyzer.analyzers.emotion import analyze_emotion
-            from music_analyzer.analyzers.lyrics import analyze_lyrics
-            from music_analyzer.formatters.color_palette import generate_color_palette
-
-            y, sr = load_audio(audio_path)
-            rhythm = analyze_rhythm(y, sr)
-            tonality = analyze_tonality(y, sr)
-            onsets = analyze_onsets(y, sr)
-            timbre = analyze_timbre(y, sr, audio_path=audio_path, run_separation=False)
-            emotion = analyze_emotion(y, sr, key_mode=tonality.mode, bpm=rhythm.bpm)
-            lyrics = analyze_lyrics(y, sr, audio_path=audio_path)
-
-            analysis = MusicAnalysisResult(
-                file_path=str(audio_path),
-                file_name=audio_path.name,
-                duration=rhythm.duration,
-                sample_rate=sr,
-                dependency_tier=dependency_tier(),
-                rhythm=rhythm,
-                emotion=emotion,
-                timbre=timbre,
-                tonality=tonality,
-                lyrics=lyrics,
-                onsets=onsets,
-            )
-            analysis.color_palette = generate_color_palette(analysis)
+        analysis = analyze_fields(audio_path, formatters=[args.command], run_separation=False)
     else:
         print(f"Error: input must be an audio file or analysis JSON, got: {input_path.suffix}", file=sys.stderr)
         sys.exit(1)
 
     # Run formatter
+    from music_analyzer.utils.profiling import span
+
     cmd = args.command
 
-    if cmd == "dreamina":
-        from music_analyzer.formatters.dreamina_formatter import format_dreamina
-        output = format_dreamina(analysis)
-    elif cmd == "storyboard":
-        from music_analyzer.formatters.storyboard_formatter import format_storyboard
-        output = format_storyboard(analysis)
-    elif cmd == "color-palette":
-        from music_analyzer.formatters.color_palette import generate_color_palette
-        output = generate_color_palette(analysis)
-    else:
-        print(f"Unknown formatter: {cmd}", file=sys.stderr)
+    with span(f"format:{cmd}", "format"):
+        if cmd == "dreamina":
+            from music_analyzer.formatters.dreamina_formatter import format_dreamina
+            output = format_dreamina(analysis)
+        elif cmd == "storyboard":
+            from music_analyzer.formatters.storyboard_formatter import format_storyboard
+            output = format_storyboard(analysis)
+        elif cmd == "color-palette":
+            from music_analyzer.formatters.color_palette import generate_color_palette
+            output = generate_color_palette(analysis)
+        else:
+            print(f"Unknown formatter: {cmd}", file=sys.stderr)
+            sys.exit(1)
+
+        data = json.loads(output.model_dump_json(exclude_none=True))
+    _output_json(_with_profile(data, args), getattr(args, "output", None))
+
+
+def _cmd_batch(args: argparse.Namespace) -> None:
+    """Batch analysis over directories / glob patterns."""
+    from music_analyzer.batch import run_batch
+
+    summary = run_batch(
+        args.inputs,
+        manifest_path=Path(args.manifest).expanduser().resolve(),
+        jobs=args.jobs,
+        run_separation=args.separation,
+        use_cache=not args.no_cache,
+        output_dir=args.output_dir,
+        retry_failed=args.retry_failed,
+    )
+    print(
+        f"Done: {summary['analyzed']} analyzed, {summary['cached']} cached, "
+        f"{summary['skipped']} skipped, {summary['failed']} failed in {summary['wall_seconds']}s",
+        file=sys.stderr,
+    )
+    _output_json(summary, getattr(args, "output", None))
+    if summary["failed"]:
         sys.exit(1)
 
-    data = json.loads(output.model_dump_json(exclude_none=True))
-    _output_json(data, getattr(args, "output", None))
+
+def _cmd_serve(args: argparse.Namespace) -> None:
+    """Run the analysis daemon."""
+    from music_analyzer.server import serve
+
+    serve(
+        path=Path(args.socket).expanduser() if args.socket else None,
+        preload=not args.no_preload,
+        whisper_size=args.model_size,
+    )
+
+
+def _cmd_cache(args: argparse.Namespace) -> None:
+    """Cache statistics and pruning."""
+    from music_analyzer.utils import cache_manager
+
+    if args.cache_command == "stats":
+        _output_json(cache_manager.cache_stats())
+        return
+
+    limits = {
+        category: cache_manager.parse_size(value)
+        for category, value in (
+            ("analysis", args.max_size),
+            ("stems", args.stems_max),
+            ("audio", args.audio_max),
+        )
+        if value
+    }
+    _output_json(cache_manager.prune(limits, dry_run=args.dry_run))
+
+
+def _cmd_bench(args: argparse.Namespace) -> None:
+    """Speed / accuracy benchmark on the synthetic corpus."""
+    from music_analyzer import bench
+
+    report = bench.run_bench(
+        lengths=args.lengths or bench.DEFAULT_LENGTHS,
+        accuracy_duration=args.accuracy_duration or bench.DEFAULT_ACCURACY_DURATION,
+        names=args.analyzers,
+        run_separation=args.separation,
+        trace_memory=args.memory,
+    )
+    if args.compare:
+        baseline = json.loads(Path(args.compare).expanduser().read_text(encoding="utf-8"))
+        report["comparison"] = bench.compare_reports(report, baseline)
+        for name, stages in report["comparison"]["speedup"].items():
+            print(f"[bench] {name}: {stages['total']}x total", file=sys.stderr)
+        for metric, delta in report["comparison"]["accuracy_delta"].items():
+            if delta:
+                print(f"[bench] accuracy {metric}: {delta:+.3f}", file=sys.stderr)
+    _output_json(report, getattr(args, "output", None))
 
 
 def _cmd_visualize(args: argparse.Namespace) -> None:
@@ -285,7 +545,7 @@ def _cmd_visualize(args: argparse.Namespace) -> None:
         from music_analyzer.formatters.json_formatter import load_analysis_json
         analysis = load_analysis_json(str(input_path))
     elif input_path.suffix.lower() in SUPPORTED_FORMATS:
-        from music_analyzer.utils.audio_io import validate_audio_path, load_audio
+        from music_analyzer.utils.audio_io import validate_audio_path
         from music_analyzer.utils.cache import get_cached
         from music_analyzer.models import MusicAnalysisResult
 
@@ -294,33 +554,12 @@ def _cmd_visualize(args: argparse.Namespace) -> None:
         if cached:
             analysis = MusicAnalysisResult(**cached)
         else:
-            from music_analyzer.analyzers.rhythm import analyze_rhythm
-            from music_analyzer.analyzers.tonality import analyze_tonality
-            from music_analyzer.analyzers.onset import analyze_onsets
-            from music_analyzer.analyzers.timbre import analyze_timbre
-            from music_analyzer.analyzers.emotion import analyze_emotion
-            from music_analyzer.analyzers.lyrics import analyze_lyrics
-            from music_analyzer.formatters.color_palette import generate_color_palette
-
             print(f"Analyzing {audio_path.name}...", file=sys.stderr)
-            y, sr = load_audio(audio_path)
-            rhythm = analyze_rhythm(y, sr)
-            tonality = analyze_tonality(y, sr)
-            onsets = analyze_onsets(y, sr)
-            timbre = analyze_timbre(y, sr, audio_path=audio_path, run_separation=False)
-            emotion = analyze_emotion(y, sr, key_mode=tonality.mode, bpm=rhythm.bpm)
-            lyrics = analyze_lyrics(y, sr, audio_path=audio_path)
-
-            analysis = MusicAnalysisResult(
-                file_path=str(audio_path),
-                file_name=audio_path.name,
-                duration=rhythm.duration,
-                sample_rate=sr,
-                dependency_tier=dependency_tier(),
-                rhythm=rhythm, emotion=emotion, timbre=timbre,
-                tonality=tonality, lyrics=lyrics, onsets=onsets,
+            from music_analyzer.scheduler import analyze_waveform, load_track
+            y, sr, waveforms = load_track(audio_path, run_separation=False)
+            analysis = analyze_waveform(
+                y, sr, audio_path, run_separation=False, use_cache=True, waveforms=waveforms,
             )
-            analysis.color_palette = generate_color_palette(analysis)
     else:
         print(f"Error: input must be an audio file or analysis JSON, got: {input_path.suffix}", file=sys.stderr)
         sys.exit(1)
@@ -347,6 +586,20 @@ def _cmd_visualize(args: argparse.Namespace) -> None:
         webbrowser.open(f"file://{Path(output_path).resolve()}")
 
 
+def _with_profile(data: dict, args: argparse.Namespace) -> dict:
+    """Attach the active profile to ``data`` (and write the Chrome trace, if requested)."""
+    from music_analyzer.utils.profiling import active_profiler
+
+    profiler = active_profiler()
+    if profiler is None:
+        return data
+    if args.profile_trace:
+        trace_path = Path(args.profile_trace).expanduser()
+        trace_path.write_text(json.dumps(profiler.chrome_trace()), encoding="utf-8")
+        print(f"Profile trace written to {trace_path}", file=sys.stderr)
+    return {**data, "profile": profiler.to_dict()}
+
+
 def _output_json(data: dict, output_path: str | None = None) -> None:
     """Write JSON to file or stdout."""
     json_str = json.dumps(data, ensure_ascii=False, indent=2)
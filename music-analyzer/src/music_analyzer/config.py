@@ -1,14 +1,21 @@
-"""Configuration and dependency detection for music_analyzer."""
+"""Configuration and dependency detection for music_analyzer.
+
+Optional dependencies are detected with ``importlib.util.find_spec``, which
+only locates a package without importing it; the real imports happen inside
+the analyzers that use them. Detection itself is deferred until a ``HAS_*``
+flag or ``dependency_tier()`` is first used, so commands that never touch
+an analyzer (``--help``, formatters on an existing JSON) start instantly.
+"""
 
 from __future__ import annotations
 
-import importlib
+import importlib.util
+from functools import lru_cache
 from pathlib import Path
 from typing import Literal
 
-# Cache directory for analysis results and separated stems
+# Cache directory for analysis results and separated stems (created on first write)
 CACHE_DIR = Path.home() / ".cache" / "music-analyzer"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 # Default audio sample rate for analysis
 DEFAULT_SR = 22050
@@ -16,28 +23,37 @@ DEFAULT_SR = 22050
 # Supported audio formats
 SUPPORTED_FORMATS = {".mp3", ".wav", ".flac", ".ogg", ".m4a", ".aac", ".wma"}
 
+# Lazily evaluated availability flags → module they probe for
+_OPTIONAL_DEPENDENCIES = {
+    "HAS_ESSENTIA": "essentia",
+    "HAS_DEMUCS": "demucs",
+    "HAS_FASTER_WHISPER": "faster_whisper",
+    "HAS_CLAP": "laion_clap",
+    "HAS_TORCH": "torch",
+}
+
 
+@lru_cache(maxsize=None)
 def _has(module: str) -> bool:
-    """Check whether an optional dependency is importable."""
+    """Check whether an optional dependency is installed (without importing it)."""
     try:
-        importlib.import_module(module)
-        return True
-    except ImportError:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
         return False
 
 
-HAS_ESSENTIA = _has("essentia")
-HAS_PYLOUDNORM = _has("pyloudnorm")
-HAS_DEMUCS = _has("demucs")
-HAS_FASTER_WHISPER = _has("faster_whisper")
-HAS_CLAP = _has("laion_clap")
-HAS_TORCH = _has("torch")
+def __getattr__(name: str) -> bool:
+    # Module-level HAS_* flags are resolved on first access (PEP 562)
+    if name in _OPTIONAL_DEPENDENCIES:
+        return _has(_OPTIONAL_DEPENDENCIES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
+@lru_cache(maxsize=None)
 def dependency_tier() -> Literal["lite", "standard", "full"]:
     """Return the current dependency tier based on what is installed."""
-    if HAS_DEMUCS or HAS_FASTER_WHISPER or HAS_CLAP:
+    if _has("demucs") or _has("faster_whisper") or _has("laion_clap"):
         return "full"
-    if HAS_ESSENTIA or HAS_PYLOUDNORM:
+    if _has("essentia"):
         return "standard"
     return "lite"
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -40,6 +40,15 @@ class RhythmAnalysis(BaseModel):
 # Emotion
 # ---------------------------------------------------------------------------
 
+class SectionEmotion(BaseModel):
+    """Emotion of one song section (or analysis window)."""
+    label: str = Field(description="Section label (from rhythm sections) or 'window'")
+    start: float = Field(description="Start time in seconds")
+    end: float = Field(description="End time in seconds")
+    primary_emotion: str = Field(description="Dominant emotion of the section")
+    confidence: float = Field(default=0.5, description="Classification confidence 0-1")
+
+
 class EmotionAnalysis(BaseModel):
     """Emotion, energy, and style classification."""
     primary_emotion: str = Field(description="Dominant emotion: happy, sad, angry, calm, energetic, melancholic, etc.")
@@ -50,6 +59,9 @@ class EmotionAnalysis(BaseModel):
     arousal: float = Field(default=0.5, description="Arousal level 0-1")
     genre: str = Field(default="unknown", description="Detected genre")
     mood_tags: list[str] = Field(default_factory=list, description="Mood descriptor tags")
+    section_emotions: Optional[list[SectionEmotion]] = Field(
+        default=None, description="Per-section emotion (CLAP only)",
+    )
     method: str = Field(default="heuristic", description="Detection method: clap or heuristic")
 
 
@@ -73,6 +85,17 @@ class MFCCSummary(BaseModel):
     n_mfcc: int = Field(default=13, description="Number of MFCC coefficients")
 
 
+class LoudnessCurves(BaseModel):
+    """Loudness over time (EBU R128), one value per ``hop`` seconds."""
+    hop: float = Field(description="Seconds between values")
+    short_term: list[float] = Field(
+        description="Short-term loudness (3 s window ending at each point) in LUFS; -70 = below the gate",
+    )
+    momentary_max: list[float] = Field(
+        description="Highest momentary loudness (400 ms windows) within each hop in LUFS",
+    )
+
+
 class StemPaths(BaseModel):
     """Paths to separated audio stems (if demucs available)."""
     vocals: Optional[str] = None
@@ -87,6 +110,11 @@ class TimbreAnalysis(BaseModel):
     spectral: SpectralFeatures = Field(description="Spectral feature statistics")
     loudness_lufs: Optional[float] = Field(default=None, description="Integrated loudness in LUFS")
     loudness_range: Optional[float] = Field(default=None, description="Loudness range in LU")
+    momentary_max_lufs: Optional[float] = Field(default=None, description="Maximum momentary loudness in LUFS")
+    short_term_max_lufs: Optional[float] = Field(default=None, description="Maximum short-term loudness in LUFS")
+    loudness_curves: Optional[LoudnessCurves] = Field(
+        default=None, description="Short-term / momentary loudness over time",
+    )
     dynamic_range_db: float = Field(description="Estimated dynamic range in dB")
     brightness: float = Field(description="Brightness score 0-1 (spectral centroid normalized)")
     warmth: float = Field(description="Warmth score 0-1 (low-frequency energy ratio)")
@@ -235,3 +263,7 @@ class MusicAnalysisResult(BaseModel):
     lyrics: Optional[LyricsAnalysis] = None
     onsets: Optional[OnsetInfo] = None
     color_palette: Optional[ColorPalette] = None
+    precision: Optional[dict[str, Literal["full", "preview"]]] = Field(
+        default=None,
+        description="Precision each analysis field was computed at: full, or preview (analyze --fast)",
+    )
@@ -0,0 +1,143 @@
+"""Low-precision preview analysis (``analyze --fast``).
+
+A full analysis of a song takes tens of seconds; interactive callers often
+only need a rough BPM, key, mood and section layout first. The preview gets
+there in about a second by shrinking the input rather than changing the
+analyzers:
+
+- the track is decoded at ``PREVIEW_SR`` (11.025 kHz). Frame sizes stay
+  2048 / 512 samples, so each frame and hop spans twice the time of a full
+  analysis and every feature has half the frames
+- tracks longer than ``PREVIEW_EXCERPTS * EXCERPT_SECONDS`` are read as that
+  many evenly spaced excerpts (``load_audio`` with ``offset`` and
+  ``duration``), the first at the start and the last at the end of the
+  track, and analyzed as one concatenated signal
+
+Times in the results (beats, sections, chords) are then mapped from
+the concatenated signal back onto the track with ``remap_results``. Events
+between excerpts are missing and section boundaries only fall inside
+excerpts, so a preview result is tagged ``"preview"`` in
+``MusicAnalysisResult.precision``.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import numpy as np
+
+# Analysis rate of a preview (half of DEFAULT_SR)
+PREVIEW_SR = 11025
+
+# Excerpts read from tracks longer than their total length
+PREVIEW_EXCERPTS = 6
+EXCERPT_SECONDS = 10.0
+
+# Analyzers a preview runs. Transcription and separation are far too slow,
+# and onset peak picking needs the full frame rate (its windows shrink to a
+# single frame at 46 ms hops)
+PREVIEW_ANALYZERS = ("rhythm", "tonality", "timbre", "emotion")
+
+
+class Excerpt(NamedTuple):
+    """One excerpt: where it sits in the track and in the concatenated signal (seconds)."""
+
+    offset: float
+    start: float
+    length: float
+
+
+def plan_excerpts(duration: float) -> list[tuple[float, float]]:
+    """``(offset, length)`` of the excerpts to read from a track of ``duration`` seconds."""
+    if duration <= PREVIEW_EXCERPTS * EXCERPT_SECONDS:
+        return [(0.0, duration)]
+    offsets = np.linspace(0.0, duration - EXCERPT_SECONDS, PREVIEW_EXCERPTS)
+    return [(round(float(o), 2), EXCERPT_SECONDS) for o in offsets]
+
+
+def load_excerpts(audio_path: Path, use_cache: bool = True) -> tuple[np.ndarray, list[Excerpt], float]:
+    """Decode the preview signal of a track.
+
+    Returns ``(y, excerpts, duration)``: the concatenated excerpts at
+    ``PREVIEW_SR``, their layout and the duration of the whole track.
+    """
+    import librosa
+
+    from music_analyzer.utils.audio_io import load_audio
+
+    duration = float(librosa.get_duration(path=str(audio_path)))
+    plan = plan_excerpts(duration)
+    if len(plan) == 1:
+        y, _ = load_audio(audio_path, sr=PREVIEW_SR, use_cache=use_cache)
+        return y, [Excerpt(0.0, 0.0, len(y) / PREVIEW_SR)], duration
+
+    parts, excerpts, start = [], [], 0.0
+    for offset, length in plan:
+        part, _ = load_audio(audio_path, sr=PREVIEW_SR, offset=offset, duration=length)
+        parts.append(part)
+        excerpts.append(Excerpt(offset, start, len(part) / PREVIEW_SR))
+        start += len(part) / PREVIEW_SR
+    return np.concatenate(parts), excerpts, duration
+
+
+def remap_results(results: dict[str, Any], excerpts: list[Excerpt], duration: float) -> dict[str, Any]:
+    """Map the times of preview results from the concatenated signal onto the track.
+
+    Returns updated copies of the models in ``results``. The first section
+    starts at 0 and the last one ends at ``duration``; a chord ends at the
+    end of its excerpt at the latest, so it does not span the skipped audio;
+    the short-term loudness curve only covers the excerpts and is dropped.
+    """
+    starts = np.array([e.start for e in excerpts])
+    offsets = np.array([e.offset for e in excerpts])
+    lengths = np.array([e.length for e in excerpts])
+
+    def excerpt_at(t: float) -> int:
+        return max(int(np.searchsorted(starts, t, side="right")) - 1, 0)
+
+    def to_track(t: float, ndigits: int | None = None) -> float:
+        i = excerpt_at(t)
+        value = min(float(offsets[i] + t - starts[i]), duration)
+        return value if ndigits is None else round(value, ndigits)
+
+    def chord_duration(time: float, length: float) -> float:
+        i = excerpt_at(time)
+        end = min(to_track(time + length), float(offsets[i] + lengths[i]), duration)
+        return round(max(end - to_track(time), 0.0), 2)
+
+    out = dict(results)
+    rhythm = results.get("rhythm")
+    if rhythm is not None:
+        sections = [
+            s.model_copy(update={"start": to_track(s.start, 2), "end": to_track(s.end, 2)})
+            for s in rhythm.sections
+        ]
+        if sections:
+            sections[0] = sections[0].model_copy(update={"start": 0.0})
+            sections[-1] = sections[-1].model_copy(update={"end": round(duration, 2)})
+        out["rhythm"] = rhythm.model_copy(update={
+            "beats": [b.model_copy(update={"time": to_track(b.time)}) for b in rhythm.beats],
+            "downbeats": [to_track(t) for t in rhythm.downbeats],
+            "sections": sections,
+            "duration": duration,
+        })
+    tonality = results.get("tonality")
+    if tonality is not None:
+        out["tonality"] = tonality.model_copy(update={"chords": [
+            c.model_copy(update={
+                "time": to_track(c.time, 2),
+                "duration": chord_duration(c.time, c.duration),
+            })
+            for c in tonality.chords
+        ]})
+    emotion = results.get("emotion")
+    if emotion is not None and emotion.section_emotions:
+        out["emotion"] = emotion.model_copy(update={"section_emotions": [
+            s.model_copy(update={"start": to_track(s.start, 2), "end": to_track(s.end, 2)})
+            for s in emotion.section_emotions
+        ]})
+    timbre = results.get("timbre")
+    if timbre is not None and len(excerpts) > 1:
+        out["timbre"] = timbre.model_copy(update={"loudness_curves": None})
+    return out
@@ -0,0 +1,1016 @@
+"""Dependency-aware analyzer scheduler.
+
+Runs the six analyzers of the full pipeline either sequentially (sharing one
+``FeatureContext``) or concurrently in a process pool. In the parallel path
+the decoded waveform is placed in shared memory once and every worker maps
+it read-only, so the audio is never pickled. Analyzers are submitted as soon
+as their dependencies have finished; only ``emotion`` depends on others (it
+needs ``tonality.mode`` and ``rhythm.bpm``).
+
+Source separation is scheduled as a task of its own rather than inside
+``timbre``, so the slow Demucs pass overlaps the other analyzers (a pool
+worker, or a background thread in the sequential path); its stems are then
+attached to the timbre result. Lyrics, when planned alongside it, runs
+after separation and transcribes the separated vocals.
+
+``analyze_stream`` runs the analyzers on features extracted block by block
+(``analyzers.streaming``), for recordings too long to hold in memory, and
+``analyze_preview`` on a low-rate excerpt of the track (``preview``) for a
+quick first result. ``analyze_fields`` (``music_analyzer.analyze``) runs
+only the analyzers behind the result fields a caller or formatter reads.
+
+With caching enabled, each analyzer's result is stored separately (keyed by
+analyzer version and the options that affect it) and the shared features
+are persisted in a per-track ``FeatureStore``, so any command can reuse
+whatever an earlier command already computed for the same file.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from music_analyzer.analyzers.features import FeatureContext
+    from music_analyzer.models import MusicAnalysisResult
+
+# Analyzer name → names of analyzers whose results it needs
+ANALYZER_DEPS: dict[str, tuple[str, ...]] = {
+    "rhythm": (),
+    "tonality": (),
+    "onsets": (),
+    "timbre": (),
+    "lyrics": (),
+    "separation": (),
+    "emotion": ("tonality", "rhythm"),
+}
+
+# Tasks whose result is stored on another analyzer's result:
+# task → (analyzer, field). They run whenever that analyzer is requested.
+_ATTACHED_RESULTS: dict[str, tuple[str, str]] = {
+    "separation": ("timbre", "stems"),
+}
+
+# Tasks that run after others whenever both are planned (without needing
+# them otherwise): lyrics transcribes the vocal stem of this run's separation
+_RUNS_AFTER: dict[str, tuple[str, ...]] = {
+    "lyrics": ("separation",),
+}
+
+# Tasks that spend their time in native code releasing the GIL (torch), run
+# on a background thread while the sequential path works through the rest
+# (they must not depend on other analyzers)
+_THREADED = ("separation",)
+
+# Analyzer name → result version; bump when an analyzer's output changes so
+# cached results from older code are not reused
+ANALYZER_VERSIONS: dict[str, int] = {
+    "rhythm": 1,
+    "tonality": 2,
+    "onsets": 1,
+    "timbre": 3,
+    "lyrics": 3,
+    "separation": 1,
+    "emotion": 3,
+}
+
+# Analyzer name → run options that change its result
+_ANALYZER_OPTIONS: dict[str, tuple[str, ...]] = {
+    "tonality": ("chord_vocabulary", "chord_smoothing", "melody_points", "melody_method"),
+    "lyrics": ("model_size", "vocal_gate", "vocal_stem"),
+}
+
+# Result field → analyzers it is computed from (dependencies are added by
+# ``resolve_analyzers``)
+FIELD_ANALYZERS: dict[str, tuple[str, ...]] = {
+    "rhythm": ("rhythm",),
+    "tonality": ("tonality",),
+    "onsets": ("onsets",),
+    "timbre": ("timbre",),
+    "lyrics": ("lyrics",),
+    "emotion": ("emotion",),
+    "color_palette": ("emotion", "tonality"),
+}
+
+# Formatter command → result fields it reads
+FORMATTER_FIELDS: dict[str, tuple[str, ...]] = {
+    "dreamina": ("rhythm", "tonality", "emotion"),
+    "storyboard": ("rhythm", "tonality", "emotion"),
+    "color-palette": ("tonality", "emotion"),
+}
+
+# Analyzer name → result model class in music_analyzer.models
+_RESULT_MODELS = {
+    "rhythm": "RhythmAnalysis",
+    "tonality": "TonalityAnalysis",
+    "onsets": "OnsetInfo",
+    "timbre": "TimbreAnalysis",
+    "lyrics": "LyricsAnalysis",
+    "separation": "StemPaths",
+    "emotion": "EmotionAnalysis",
+}
+
+
+def default_jobs() -> int:
+    """Number of worker processes to use when ``--jobs`` is not given."""
+    return min(len(ANALYZER_DEPS), os.cpu_count() or 1)
+
+
+def resolve_analyzers(names: Iterable[str]) -> list[str]:
+    """Return ``names`` plus their transitive dependencies, in run order."""
+    wanted: set[str] = set()
+    stack = list(names)
+    while stack:
+        name = stack.pop()
+        if name not in ANALYZER_DEPS:
+            raise ValueError(f"Unknown analyzer: {name}")
+        if name not in wanted:
+            wanted.add(name)
+            stack.extend(ANALYZER_DEPS[name])
+    return [n for n in ANALYZER_DEPS if n in wanted]
+
+
+def resolve_fields(
+    fields: Optional[Iterable[str]] = None, formatters: Iterable[str] = (),
+) -> list[str]:
+    """Result fields needed for ``fields`` and ``formatters``, in ``FIELD_ANALYZERS`` order.
+
+    ``fields`` holds field names of ``MusicAnalysisResult``, optionally with
+    a sub-field (``"rhythm.bpm"`` selects ``rhythm``); ``formatters`` holds
+    keys of ``FORMATTER_FIELDS``. With neither, every field is selected.
+    """
+    from music_analyzer import models
+
+    formatters = list(formatters)
+    if fields is None and not formatters:
+        return list(FIELD_ANALYZERS)
+    wanted: set[str] = set()
+    for field in fields or ():
+        name, _, sub = field.partition(".")
+        if name not in FIELD_ANALYZERS:
+            raise ValueError(
+                f"Unknown field: {field} (choose from {', '.join(FIELD_ANALYZERS)})"
+            )
+        model = models.ColorPalette if name == "color_palette" else getattr(models, _RESULT_MODELS[name])
+        if sub and sub not in model.model_fields:
+            raise ValueError(f"Unknown field: {field}")
+        wanted.add(name)
+    for formatter in formatters:
+        if formatter not in FORMATTER_FIELDS:
+            raise ValueError(f"Unknown formatter: {formatter}")
+        wanted.update(FORMATTER_FIELDS[formatter])
+    return [f for f in FIELD_ANALYZERS if f in wanted]
+
+
+def required_rates(
+    names: Optional[Iterable[str]] = None, run_separation: bool = True
+) -> list[tuple[int, bool]]:
+    """``(sample_rate, mono)`` versions of the track the given analyzers need.
+
+    The first entry is always the analysis rate; the others depend on which
+    model-backed analyzers the installed tier will run.
+    """
+    from music_analyzer.config import DEFAULT_SR, HAS_CLAP, HAS_DEMUCS, HAS_FASTER_WHISPER
+    from music_analyzer.utils.warm_models import CLAP_SR, DEMUCS_SR, WHISPER_SR
+
+    wanted = set(resolve_analyzers(_with_attached(ANALYZER_DEPS if names is None else names)))
+    rates = [(DEFAULT_SR, True)]
+    if "emotion" in wanted and HAS_CLAP:
+        rates.append((CLAP_SR, True))
+    if "lyrics" in wanted and HAS_FASTER_WHISPER:
+        rates.append((WHISPER_SR, True))
+    if "separation" in wanted and run_separation and HAS_DEMUCS:
+        rates.append((DEMUCS_SR, False))
+    return rates
+
+
+def load_track(
+    audio_path: Path,
+    names: Optional[Iterable[str]] = None,
+    run_separation: bool = True,
+    use_cache: Optional[bool] = None,
+) -> tuple[np.ndarray, int, dict[tuple[int, bool], np.ndarray]]:
+    """Decode a track once at every rate the given analyzers need.
+
+    Returns ``(y, sr, waveforms)``: the mono analysis-rate waveform plus the
+    other versions keyed by ``(sample_rate, mono)``, for ``run_analyzers``.
+    """
+    from music_analyzer.utils.audio_io import load_audio, load_audio_rates
+
+    rates = required_rates(names, run_separation)
+    if len(rates) == 1:
+        y, sr = load_audio(audio_path, use_cache=use_cache)
+        return y, sr, {}
+    waveforms = load_audio_rates(audio_path, rates, use_cache=use_cache)
+    sr = rates[0][0]
+    return waveforms.pop(rates[0]), sr, waveforms
+
+
+def analyzer_options(
+    audio_path: Optional[Path] = None,
+    run_separation: bool = True,
+    model_size: str = "base",
+    chord_vocabulary: str = "triads",
+    chord_smoothing: str = "none",
+    melody_points: int = 200,
+    melody_method: str = "piptrack",
+    vocal_gate: bool = True,
+    whisper_workers: Optional[int] = None,
+    cache_key: Optional[str] = None,
+) -> dict[str, Any]:
+    """Build the run-options dict consumed by ``call_analyzer`` (see ``run_analyzers``)."""
+    return {
+        "audio_path": audio_path,
+        "run_separation": run_separation,
+        "model_size": model_size,
+        "chord_vocabulary": chord_vocabulary,
+        "chord_smoothing": chord_smoothing,
+        "melody_points": melody_points,
+        "melody_method": melody_method,
+        "vocal_gate": vocal_gate,
+        "whisper_workers": whisper_workers,
+        "cache_key": cache_key,
+        "vocal_stem": False,  # Set by ``_enable_cache``
+    }
+
+
+def run_analyzers(
+    y: np.ndarray,
+    sr: int,
+    audio_path: Optional[Path] = None,
+    run_separation: bool = True,
+    jobs: int = 1,
+    names: Optional[Iterable[str]] = None,
+    model_size: str = "base",
+    chord_vocabulary: str = "triads",
+    chord_smoothing: str = "none",
+    melody_points: int = 200,
+    melody_method: str = "piptrack",
+    vocal_gate: bool = True,
+    whisper_workers: Optional[int] = None,
+    use_cache: bool = False,
+    waveforms: Optional[dict[tuple[int, bool], np.ndarray]] = None,
+) -> dict[str, Any]:
+    """Run analyzers and return their results keyed by analyzer name.
+
+    Parameters
+    ----------
+    y : audio waveform (mono)
+    sr : sample rate
+    audio_path : original file path (needed for separation / transcription)
+    run_separation : whether timbre should run demucs source separation
+    jobs : worker processes; 1 runs sequentially in-process
+    names : analyzers to run (default: all); dependencies are added automatically
+    model_size : whisper model size for the lyrics analyzer
+    chord_vocabulary : chord templates for the tonality analyzer
+    chord_smoothing : chord smoothing for the tonality analyzer ("none" / "viterbi")
+    melody_points : melody contour resolution for the tonality analyzer
+    melody_method : melody extractor for the tonality analyzer ("piptrack" / "pyin")
+    vocal_gate : let the lyrics analyzer skip instrumentals and use cached vocal stems
+    whisper_workers : concurrent Whisper decoders for long recordings (default: auto)
+    use_cache : reuse / store per-analyzer results and shared features (needs ``audio_path``)
+    waveforms : the track at other rates (see ``load_track``); missing ones are resampled from ``y``
+    """
+    options = analyzer_options(
+        audio_path=audio_path,
+        run_separation=run_separation,
+        model_size=model_size,
+        chord_vocabulary=chord_vocabulary,
+        chord_smoothing=chord_smoothing,
+        melody_points=melody_points,
+        melody_method=melody_method,
+        vocal_gate=vocal_gate,
+        whisper_workers=whisper_workers,
+    )
+    order = _plan(ANALYZER_DEPS if names is None else names, options)
+
+    results: dict[str, Any] = {}
+    if use_cache and audio_path is not None:
+        _enable_cache(options, order)
+        for name in order:
+            cached = _load_result(name, options)
+            if cached is not None:
+                results[name] = cached
+
+    order = [n for n in order if n not in results]
+    if order:
+        waveforms = waveforms or {}
+        if jobs <= 1:
+            _run_sequential(y, sr, options, order, results, waveforms)
+        else:
+            _run_parallel(y, sr, options, order, jobs, results, waveforms)
+    return _attach_results(results)
+
+
+def analyze_file(
+    audio_path: Path,
+    use_cache: bool = True,
+    run_separation: bool = True,
+    jobs: Optional[int] = 1,
+) -> dict:
+    """Load, analyze and cache one audio file; return the result as a dict.
+
+    Returns the cached analysis when one exists and ``use_cache`` is set.
+    """
+    from music_analyzer.utils.cache import get_cached, save_cache
+
+    if use_cache:
+        cached = get_cached(audio_path, "analysis")
+        if cached:
+            return cached
+
+    y, sr, waveforms = load_track(audio_path, run_separation=run_separation, use_cache=use_cache)
+    result = analyze_waveform(
+        y, sr, audio_path,
+        run_separation=run_separation,
+        jobs=jobs,
+        use_cache=use_cache,
+        waveforms=waveforms,
+    )
+    data = json.loads(result.model_dump_json(exclude_none=True))
+
+    if use_cache:
+        save_cache(audio_path, data, "analysis")
+    return data
+
+
+def analyze_single(
+    name: str,
+    audio_path: Path,
+    run_separation: bool = True,
+    model_size: str = "base",
+    chord_vocabulary: str = "triads",
+    chord_smoothing: str = "none",
+    melody_points: int = 200,
+    melody_method: str = "piptrack",
+    vocal_gate: bool = True,
+    whisper_workers: Optional[int] = None,
+    use_cache: bool = True,
+) -> dict:
+    """Load one audio file and run a single analyzer (plus its dependencies).
+
+    Returns that analyzer's result as a dict. A cached result is returned
+    without decoding the audio at all.
+    """
+    if use_cache:
+        options = analyzer_options(
+            audio_path=audio_path,
+            run_separation=run_separation,
+            model_size=model_size,
+            chord_vocabulary=chord_vocabulary,
+            chord_smoothing=chord_smoothing,
+            melody_points=melody_points,
+            melody_method=melody_method,
+            vocal_gate=vocal_gate,
+            whisper_workers=whisper_workers,
+        )
+        plan = _plan([name], options)
+        _enable_cache(options, plan)
+        cached = {}
+        for task in plan:
+            result = _load_result(task, options)
+            if result is None:
+                break
+            cached[task] = result
+        else:
+            result = _attach_results(cached)[name]
+            return json.loads(result.model_dump_json(exclude_none=True))
+
+    y, sr, waveforms = load_track(
+        audio_path, names=[name], run_separation=run_separation, use_cache=use_cache,
+    )
+    results = run_analyzers(
+        y, sr,
+        audio_path=audio_path,
+        run_separation=run_separation,
+        names=[name],
+        model_size=model_size,
+        chord_vocabulary=chord_vocabulary,
+        chord_smoothing=chord_smoothing,
+        melody_points=melody_points,
+        melody_method=melody_method,
+        vocal_gate=vocal_gate,
+        whisper_workers=whisper_workers,
+        use_cache=use_cache,
+        waveforms=waveforms,
+    )
+    return json.loads(results[name].model_dump_json(exclude_none=True))
+
+
+def analyze_fields(
+    audio_path: Path,
+    fields: Optional[Iterable[str]] = None,
+    formatters: Iterable[str] = (),
+    run_separation: bool = True,
+    jobs: Optional[int] = 1,
+    use_cache: bool = True,
+) -> MusicAnalysisResult:
+    """Analyze a file, running only what the requested fields need.
+
+    The fields (see ``resolve_fields``) are mapped to analyzers with
+    ``FIELD_ANALYZERS`` and their dependencies; only those analyzers run,
+    the track is decoded only at the rates they use, and features no
+    analyzer reads are never computed (``FeatureContext`` is lazy). The
+    result holds the requested fields plus the analyzers they were computed
+    from (``emotion`` brings ``rhythm`` and ``tonality``); every other field
+    is ``None`` and absent from ``result.precision``.
+
+    With ``use_cache``, fields are taken from a cached full analysis when
+    one exists, otherwise per analyzer: cached results are reused and the
+    audio is only decoded if some analyzer still has to run, whose result
+    is then cached for later calls. The full ``analysis`` entry is only
+    written by ``analyze_file``.
+
+    Parameters
+    ----------
+    audio_path : audio file
+    fields : result fields to compute (default: all, unless ``formatters`` is given)
+    formatters : formatter commands whose input fields to compute (``FORMATTER_FIELDS``)
+    run_separation : run demucs source separation when ``timbre`` is requested
+    jobs : worker processes; 1 runs sequentially, ``None`` picks from the CPU count
+    use_cache : reuse / store cached results and features
+    """
+    from music_analyzer.config import DEFAULT_SR
+    from music_analyzer.models import MusicAnalysisResult
+
+    wanted = resolve_fields(fields, formatters)
+    names = resolve_analyzers(a for f in wanted for a in FIELD_ANALYZERS[f])
+    options = analyzer_options(audio_path=audio_path, run_separation=run_separation)
+    results: dict[str, Any] = {}
+    if use_cache:
+        from music_analyzer.utils.cache import get_cached
+
+        cached = get_cached(audio_path, "analysis")
+        if cached:
+            result = MusicAnalysisResult.model_validate(cached)
+            keep = set(names) | set(wanted)
+            result = result.model_copy(update={f: None for f in FIELD_ANALYZERS if f not in keep})
+            result.precision = _precision(result, set())
+            return result
+        _enable_cache(options, _plan(names, options))
+        for task in _plan(names, options):
+            hit = _load_result(task, options)
+            if hit is not None:
+                results[task] = hit
+
+    sr, duration = DEFAULT_SR, None
+    if any(task not in results for task in _plan(names, options)):
+        y, sr, waveforms = load_track(
+            audio_path, names=names, run_separation=run_separation, use_cache=use_cache,
+        )
+        results = run_analyzers(
+            y, sr,
+            audio_path=audio_path,
+            run_separation=run_separation,
+            jobs=default_jobs() if jobs is None else jobs,
+            names=names,
+            use_cache=use_cache,
+            waveforms=waveforms,
+        )
+        duration = round(len(y) / sr, 2)
+    else:
+        results = _attach_results(results)
+
+    if "rhythm" in results:
+        duration = results["rhythm"].duration
+    elif duration is None:
+        from music_analyzer.utils.audio_io import get_audio_info
+
+        try:
+            duration = round(get_audio_info(audio_path)["duration"], 2)
+        except RuntimeError:  # Not readable by libsndfile (e.g. m4a)
+            import librosa
+
+            duration = round(float(librosa.get_duration(path=str(audio_path))), 2)
+    return _assemble_result(
+        audio_path, sr, results, duration=duration, color_palette="color_palette" in wanted,
+    )
+
+
+def analyze_waveform(
+    y: np.ndarray,
+    sr: int,
+    audio_path: Path,
+    run_separation: bool = True,
+    jobs: Optional[int] = 1,
+    use_cache: bool = False,
+    waveforms: Optional[dict[tuple[int, bool], np.ndarray]] = None,
+) -> MusicAnalysisResult:
+    """Run every analyzer on a loaded waveform and assemble the full result.
+
+    With ``jobs == 1`` analyzers run sequentially and share one
+    ``FeatureContext``; otherwise independent analyzers run concurrently in
+    a process pool (``None`` picks a worker count from the CPU count).
+    ``use_cache`` reuses and stores per-analyzer results and features;
+    ``waveforms`` holds the track at the other rates models need (``load_track``).
+    """
+    results = run_analyzers(
+        y, sr,
+        audio_path=audio_path,
+        run_separation=run_separation,
+        jobs=default_jobs() if jobs is None else jobs,
+        use_cache=use_cache,
+        waveforms=waveforms,
+    )
+    return _assemble_result(audio_path, sr, results)
+
+
+def analyze_stream(
+    audio_path: Path,
+    block_seconds: Optional[float] = None,
+) -> MusicAnalysisResult:
+    """Run every analyzer on features extracted block by block.
+
+    The file is never held in memory as a whole: ``stream_features`` reduces
+    each block to the per-frame features the analyzers use, and the
+    analyzers then run sequentially on them. Separation and the other
+    stages that need the waveform itself are skipped (see
+    ``analyzers.streaming``). Per-analyzer results are not cached, as the
+    streamed log-mel features can differ slightly from a whole-track pass.
+
+    Parameters
+    ----------
+    audio_path : audio file (any format libsndfile reads)
+    block_seconds : seconds of audio decoded per block (default: ``BLOCK_SECONDS``)
+    """
+    from music_analyzer.analyzers.streaming import BLOCK_SECONDS, stream_features
+
+    options = analyzer_options(audio_path=audio_path, run_separation=False)
+    features = stream_features(
+        audio_path,
+        block_seconds=block_seconds or BLOCK_SECONDS,
+        melody_points=options["melody_points"],
+    )
+    results: dict[str, Any] = {}
+    for name in _plan(ANALYZER_DEPS, options):
+        deps = {d: results[d] for d in ANALYZER_DEPS[name]}
+        results[name] = _run_analyzer(name, None, features.sr, options, deps, features)
+    return _assemble_result(audio_path, features.sr, results)
+
+
+def analyze_preview(audio_path: Path, use_cache: bool = True) -> MusicAnalysisResult:
+    """Quick low-precision analysis of a file (``analyze --fast``).
+
+    Runs the analyzers of ``preview.PREVIEW_ANALYZERS`` on the preview
+    signal (``preview.load_excerpts``) and maps their times back onto the
+    track. With ``use_cache``, a cached full analysis is returned as is, and
+    any analyzer whose full result is already cached (lyrics included) uses
+    it instead of the preview. ``result.precision`` tells the two apart.
+    Preview results are never written to the per-analyzer cache.
+
+    Parameters
+    ----------
+    audio_path : audio file
+    use_cache : reuse cached full results
+    """
+    from music_analyzer import preview
+    from music_analyzer.analyzers.features import FeatureContext
+    from music_analyzer.config import DEFAULT_SR
+    from music_analyzer.models import MusicAnalysisResult
+
+    options = analyzer_options(audio_path=audio_path, run_separation=False)
+    results: dict[str, Any] = {}
+    if use_cache:
+        from music_analyzer.utils.cache import get_cached
+
+        cached = get_cached(audio_path, "analysis")
+        if cached:
+            result = MusicAnalysisResult.model_validate(cached)
+            if result.precision is None:  # Written before fields were tagged
+                result.precision = _precision(result, set())
+            return result
+        _enable_cache(options, _plan(ANALYZER_DEPS, options))
+        for name in _plan(ANALYZER_DEPS, options):
+            hit = _load_result(name, options)
+            if hit is not None:
+                results[name] = hit
+        options["cache_key"] = None  # Keep preview results out of the cache
+
+    missing = [n for n in _plan(preview.PREVIEW_ANALYZERS, options) if n not in results]
+    sr = DEFAULT_SR
+    if missing:
+        y, excerpts, duration = preview.load_excerpts(audio_path, use_cache=use_cache)
+        sr = preview.PREVIEW_SR
+        features = FeatureContext(y, sr)
+        computed: dict[str, Any] = {}
+        for name in missing:
+            deps = {d: results.get(d, computed.get(d)) for d in ANALYZER_DEPS[name]}
+            computed[name] = _run_analyzer(name, y, sr, options, deps, features)
+        results.update(preview.remap_results(computed, excerpts, duration))
+    return _assemble_result(audio_path, sr, _attach_results(results), preview=set(missing))
+
+
+def _assemble_result(
+    audio_path: Path,
+    sr: int,
+    results: dict[str, Any],
+    preview: Optional[set[str]] = None,
+    duration: Optional[float] = None,
+    color_palette: bool = True,
+) -> MusicAnalysisResult:
+    """Build the full result from the analyzer results and add the color palette.
+
+    ``preview`` names the analyzers whose results are preview-precision
+    (see ``analyze_preview``); every other field is tagged ``"full"``.
+    ``duration`` is required when ``results`` has no rhythm result.
+    """
+    from music_analyzer.config import dependency_tier
+    from music_analyzer.formatters.color_palette import generate_color_palette
+    from music_analyzer.models import MusicAnalysisResult
+    from music_analyzer.utils.profiling import span
+
+    result = MusicAnalysisResult(
+        file_path=str(audio_path),
+        file_name=audio_path.name,
+        duration=results["rhythm"].duration if duration is None else duration,
+        sample_rate=sr,
+        dependency_tier=dependency_tier(),
+        **results,
+    )
+
+    if color_palette:
+        # Generate color palette from results
+        with span("format:color-palette", "format"):
+            result.color_palette = generate_color_palette(result)
+    result.precision = _precision(result, preview or set())
+    return result
+
+
+def _precision(result: MusicAnalysisResult, preview: set[str]) -> dict[str, str]:
+    """Precision tag of every analysis field present in ``result``."""
+    tags = {
+        name: "preview" if name in preview else "full"
+        for name in _RESULT_MODELS
+        if getattr(result, name, None) is not None
+    }
+    if result.color_palette is not None:
+        derived = set(FIELD_ANALYZERS["color_palette"])
+        tags["color_palette"] = "preview" if preview & derived else "full"
+    return tags
+
+
+def _with_attached(names: Iterable[str]) -> list[str]:
+    """``names`` plus the tasks attached to them (see ``_ATTACHED_RESULTS``)."""
+    names = list(names)
+    return names + [
+        task for task, (owner, _) in _ATTACHED_RESULTS.items() if owner in names and task not in names
+    ]
+
+
+def _plan(names: Iterable[str], options: dict) -> list[str]:
+    """Tasks to run for ``names`` under ``options``, in dependency order."""
+    from music_analyzer.config import HAS_DEMUCS
+
+    order = resolve_analyzers(_with_attached(names))
+    if not (options["run_separation"] and HAS_DEMUCS and options["audio_path"] is not None):
+        order = [n for n in order if n != "separation"]
+    return order
+
+
+def _attach_results(results: dict[str, Any]) -> dict[str, Any]:
+    """Move attached task results (e.g. stems) onto the analyzers they belong to."""
+    for task, (owner, field) in _ATTACHED_RESULTS.items():
+        if task not in results:
+            continue
+        value = results.pop(task)
+        if value is not None and owner in results:
+            results[owner] = results[owner].model_copy(update={field: value})
+    return results
+
+
+def _waits_for(name: str, planned: Iterable[str]) -> tuple[str, ...]:
+    """Tasks ``name`` has to wait for: its dependencies, plus the
+    ``_RUNS_AFTER`` tasks that are in ``planned``."""
+    planned = set(planned)
+    return ANALYZER_DEPS[name] + tuple(t for t in _RUNS_AFTER.get(name, ()) if t in planned)
+
+
+def _enable_cache(options: dict, plan: Iterable[str]) -> None:
+    """Turn on result caching in ``options`` for a run of the tasks in ``plan``.
+
+    Sets the track's cache key and ``vocal_stem``, part of the lyrics cache
+    suffix: whether the lyrics analyzer will get a vocal stem, from the
+    separation task in ``plan`` or from stems an earlier run left.
+    """
+    from music_analyzer.analyzers.separation import cached_stems
+    from music_analyzer.utils.cache import cache_key
+
+    options["cache_key"] = cache_key(options["audio_path"])
+    options["vocal_stem"] = bool(options["vocal_gate"]) and (
+        "separation" in plan or cached_stems(options["audio_path"]) is not None
+    )
+
+
+def _result_suffix(name: str, options: dict) -> str:
+    """Cache suffix for one analyzer's result under the given run options."""
+    from music_analyzer.config import dependency_tier
+
+    params: dict[str, Any] = {"tier": dependency_tier()}
+    params.update({k: options[k] for k in _ANALYZER_OPTIONS.get(name, ())})
+    # Results built on other analyzers are invalidated along with them
+    params.update({d: ANALYZER_VERSIONS[d] for d in ANALYZER_DEPS[name]})
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:8]
+    return f"{name}-v{ANALYZER_VERSIONS[name]}-{digest}"
+
+
+def _load_result(name: str, options: dict):
+    """Return the cached result model for ``name``, or ``None``."""
+    from music_analyzer import models
+
+    if name == "separation":
+        # Stems are cached by content in their own directory
+        from music_analyzer.analyzers.separation import cached_stems
+
+        return cached_stems(options["audio_path"])
+
+    from music_analyzer.utils.cache import get_entry
+
+    data = get_entry(options["cache_key"], _result_suffix(name, options))
+    if data is None:
+        return None
+    try:
+        result = getattr(models, _RESULT_MODELS[name]).model_validate(data)
+    except ValueError:
+        return None  # Written by an incompatible model version
+
+    return result
+
+
+def _feature_context(
+    y: np.ndarray, sr: int, options: dict, waveforms: dict[tuple[int, bool], np.ndarray]
+) -> FeatureContext:
+    """Feature context for one run, backed by the track's feature store when caching."""
+    from music_analyzer.analyzers.features import FeatureContext
+    from music_analyzer.utils.cache import FeatureStore
+
+    key = options["cache_key"]
+    return FeatureContext(
+        y, sr, store=FeatureStore(key) if key else None, waveforms=waveforms,
+    )
+
+
+def _run_analyzer(
+    name: str,
+    y: np.ndarray,
+    sr: int,
+    options: dict,
+    deps: dict[str, Any],
+    features: FeatureContext,
+):
+    """Run one analyzer and store its result when caching is enabled."""
+    from music_analyzer.utils.profiling import span
+
+    with span(f"analyzer:{name}", "analyzer"):
+        result = call_analyzer(name, y, sr, options, deps, features=features)
+    if options["cache_key"] and result is not None and name != "separation":
+        from music_analyzer.utils.cache import save_entry
+
+        if name == "lyrics":
+            # Keyed by the stem actually used (separation may have failed)
+            options = {**options, "vocal_stem": _vocal_stem(options, deps) is not None}
+
+        try:
+            save_entry(
+                options["cache_key"],
+                json.loads(result.model_dump_json(exclude_none=True)),
+                _result_suffix(name, options),
+            )
+        except OSError:
+            pass  # A read-only or full cache must not fail the analysis
+    return result
+
+
+def call_analyzer(
+    name: str,
+    y: np.ndarray,
+    sr: int,
+    options: dict,
+    deps: dict[str, Any],
+    features: Optional[FeatureContext] = None,
+):
+    """Run a single analyzer by name.
+
+    ``options`` comes from ``analyzer_options``; ``deps`` holds the results
+    of the analyzers listed for ``name`` in ``ANALYZER_DEPS``.
+    """
+    if name == "rhythm":
+        from music_analyzer.analyzers.rhythm import analyze_rhythm
+        return analyze_rhythm(y, sr, features=features)
+    if name == "tonality":
+        from music_analyzer.analyzers.tonality import analyze_tonality
+        return analyze_tonality(
+            y, sr,
+            features=features,
+            chord_vocabulary=options["chord_vocabulary"],
+            chord_smoothing=options["chord_smoothing"],
+            melody_points=options["melody_points"],
+            melody_method=options["melody_method"],
+        )
+    if name == "onsets":
+        from music_analyzer.analyzers.onset import analyze_onsets
+        return analyze_onsets(y, sr, features=features)
+    if name == "timbre":
+        from music_analyzer.analyzers.timbre import analyze_timbre
+        # Separation is its own task (``separation``)
+        return analyze_timbre(y, sr, run_separation=False, features=features)
+    if name == "separation":
+        from music_analyzer.analyzers.separation import separate_stems
+        return separate_stems(
+            options["audio_path"], features, reuse=options["cache_key"] is not None,
+        )
+    if name == "emotion":
+        from music_analyzer.analyzers.emotion import analyze_emotion
+        return analyze_emotion(
+            y, sr,
+            key_mode=deps["tonality"].mode,
+            bpm=deps["rhythm"].bpm,
+            features=features,
+            sections=deps["rhythm"].sections,
+        )
+    if name == "lyrics":
+        from music_analyzer.analyzers.lyrics import analyze_lyrics
+        return analyze_lyrics(
+            y, sr,
+            audio_path=options["audio_path"],
+            model_size=options["model_size"],
+            features=features,
+            vocal_stem=_vocal_stem(options, deps),
+            vocal_gate=options["vocal_gate"],
+            whisper_workers=options["whisper_workers"],
+        )
+    raise ValueError(f"Unknown analyzer: {name}")
+
+
+def _vocal_stem(options: dict, deps: dict[str, Any]) -> Optional[Path]:
+    """Vocal stem for the lyrics analyzer: from this run's separation task
+    (in ``deps``), else one an earlier separation left in the cache."""
+    if not options["vocal_gate"]:
+        return None
+    stems = deps.get("separation")
+    if stems is None and options["cache_key"] and options["audio_path"] is not None:
+        from music_analyzer.analyzers.separation import cached_stems
+
+        stems = cached_stems(options["audio_path"])
+    return Path(stems.vocals) if stems is not None and stems.vocals else None
+
+
+def _run_sequential(
+    y: np.ndarray,
+    sr: int,
+    options: dict,
+    order: list[str],
+    results: dict[str, Any],
+    waveforms: dict[tuple[int, bool], np.ndarray],
+) -> dict[str, Any]:
+    """Run analyzers in dependency order, sharing one feature context.
+
+    ``results`` holds already available (cached) results and is filled in.
+    Tasks in ``_THREADED`` run on background threads alongside the others;
+    tasks that wait for one of them (``_RUNS_AFTER``) run last.
+    """
+    features = _feature_context(y, sr, options, waveforms)
+    threaded = [n for n in order if n in _THREADED] if len(order) > 1 else []
+    with ThreadPoolExecutor(max_workers=max(len(threaded), 1)) as pool:
+        background = {
+            name: pool.submit(
+                contextvars.copy_context().run, _run_analyzer, name, y, sr, options, {}, features,
+            )
+            for name in threaded
+        }
+        planned = set(order) | set(results)
+        order = sorted(order, key=lambda n: any(t in background for t in _waits_for(n, planned)))
+        for name in order:
+            if name in background:
+                continue
+            waits = _waits_for(name, planned)
+            for task in waits:
+                if task in background and task not in results:
+                    results[task] = background[task].result()
+            deps = {d: results[d] for d in waits}
+            results[name] = _run_analyzer(name, y, sr, options, deps, features)
+        for name, fut in background.items():
+            if name not in results:
+                results[name] = fut.result()
+    return results
+
+
+def _worker(
+    name: str,
+    buffers: dict[tuple[int, bool], tuple[str, tuple, str]],
+    sr: int,
+    options: dict,
+    deps: dict[str, Any],
+    trace_memory: Optional[bool] = None,
+):
+    """Process-pool entry point: map the shared waveforms and run one analyzer.
+
+    ``buffers`` maps ``(sample_rate, mono)`` to ``(shm name, shape, dtype)``;
+    the analysis-rate waveform is under ``(sr, True)``. Returns
+    ``(result, profile)``, where ``profile`` is ``(start time, spans)`` of
+    the worker's own profiler, or ``None`` when ``trace_memory`` is ``None``
+    (the parent is not profiling).
+    """
+    from contextlib import nullcontext
+
+    from music_analyzer.utils.profiling import profiling
+
+    segments = [SharedMemory(name=shm_name) for shm_name, _, _ in buffers.values()]
+    try:
+        waveforms = {}
+        for key, shm, (_, shape, dtype) in zip(buffers, segments, buffers.values()):
+            arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            arr.flags.writeable = False
+            waveforms[key] = arr
+        y = waveforms.pop((sr, True))
+        profile = nullcontext() if trace_memory is None else profiling(trace_memory)
+        with profile as profiler:
+            result = _run_analyzer(name, y, sr, options, deps, _feature_context(y, sr, options, waveforms))
+        del y, arr, waveforms
+        return result, (profiler.started, profiler.spans) if profiler else None
+    finally:
+        for shm in segments:
+            try:
+                shm.close()
+            except BufferError:
+                # A traceback still references a mapped array; the mapping
+                # is released when the worker exits.
+                pass
+
+
+def _share(arrays: dict[tuple[int, bool], np.ndarray]) -> dict[tuple[int, bool], SharedMemory]:
+    """Copy each array into a new shared-memory segment."""
+    segments = {}
+    try:
+        for key, arr in arrays.items():
+            shm = SharedMemory(create=True, size=max(arr.nbytes, 1))
+            segments[key] = shm
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    except BaseException:
+        _release(segments)
+        raise
+    return segments
+
+
+def _release(segments: dict[tuple[int, bool], SharedMemory]) -> None:
+    for shm in segments.values():
+        shm.close()
+        shm.unlink()
+
+
+def _run_parallel(
+    y: np.ndarray,
+    sr: int,
+    options: dict,
+    order: list[str],
+    jobs: int,
+    results: dict[str, Any],
+    waveforms: dict[tuple[int, bool], np.ndarray],
+) -> dict[str, Any]:
+    """Run independent analyzers concurrently in a process pool.
+
+    ``results`` holds already available (cached) results and is filled in.
+    Every waveform is placed in shared memory once and mapped by the workers.
+    """
+    from music_analyzer.utils.profiling import active_profiler
+
+    profiler = active_profiler()
+    arrays = {key: np.ascontiguousarray(w) for key, w in waveforms.items()}
+    arrays[(sr, True)] = np.ascontiguousarray(y)
+    segments = _share(arrays)
+    try:
+        buffers = {
+            key: (segments[key].name, arr.shape, arr.dtype.str) for key, arr in arrays.items()
+        }
+        planned = set(order) | set(results)
+        pending = {name: _waits_for(name, planned) for name in order}
+        running: dict[Future, str] = {}
+
+        with ProcessPoolExecutor(max_workers=min(jobs, len(order))) as pool:
+            while pending or running:
+                # Submit every analyzer whose dependencies are satisfied
+                for name in [n for n, d in pending.items() if all(x in results for x in d)]:
+                    deps = {d: results[d] for d in pending.pop(name)}
+                    fut = pool.submit(
+                        _worker, name, buffers, sr, options, deps,
+                        trace_memory=None if profiler is None else profiler.trace_memory,
+                    )
+                    running[fut] = name
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    results[running.pop(fut)], worker_profile = fut.result()
+                    if worker_profile is not None:
+                        started, spans = worker_profile
+                        profiler.merge(spans, started=started)
+
+        return results
+    finally:
+        _release(segments)
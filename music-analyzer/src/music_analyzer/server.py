@@ -0,0 +1,192 @@
+"""Long-lived analysis daemon and its client.
+
+``music-analyzer serve`` loads the heavy models (CLAP, faster-whisper,
+Demucs) once and answers analysis requests over a local Unix socket. The
+CLI connects to the daemon when one is listening and falls back to running
+in-process otherwise.
+
+Protocol: the client sends one JSON object terminated by a newline and the
+server answers with one JSON line, ``{"ok": true, "result": ...}`` or
+``{"ok": false, "error": "..."}``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+from pathlib import Path
+from typing import Optional
+
+from music_analyzer.config import CACHE_DIR
+
+# Environment variable overriding the default socket path
+SOCKET_ENV = "MUSIC_ANALYZER_SOCKET"
+
+# Commands the daemon accepts besides "ping"
+SINGLE_ANALYZERS = ("rhythm", "emotion", "timbre", "tonality", "lyrics")
+
+
+def socket_path() -> Path:
+    """Return the daemon socket path (``$MUSIC_ANALYZER_SOCKET`` or the cache dir)."""
+    env = os.environ.get(SOCKET_ENV)
+    return Path(env).expanduser() if env else CACHE_DIR / "daemon.sock"
+
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+def request_daemon(request: dict, path: Optional[Path] = None) -> Optional[dict]:
+    """Send a request to a running daemon.
+
+    Returns the daemon's result, or ``None`` when no daemon is listening.
+    Raises ``RuntimeError`` if the daemon reports an error.
+    """
+    path = path or socket_path()
+    if not hasattr(socket, "AF_UNIX") or not path.exists():
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(path))
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+    except (ConnectionRefusedError, FileNotFoundError):
+        return None  # Stale socket file
+
+    if not line:
+        raise RuntimeError("daemon closed the connection without a response")
+    response = json.loads(line)
+    if not response.get("ok"):
+        raise RuntimeError(f"daemon: {response.get('error', 'unknown error')}")
+    return response["result"]
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+def handle_request(request: dict) -> dict:
+    """Execute a single daemon request and return its result."""
+    from music_analyzer.scheduler import analyze_file, analyze_single
+
+    cmd = request.get("command")
+    if cmd == "ping":
+        from music_analyzer.config import dependency_tier
+        return {"pid": os.getpid(), "tier": dependency_tier()}
+
+    if "audio" not in request:
+        raise ValueError("missing 'audio' path")
+    audio_path = Path(request["audio"])
+    run_separation = not request.get("no_separation", False)
+
+    if cmd == "analyze" and request.get("fast"):
+        return _preview(audio_path, request, run_separation)
+    if cmd == "analyze":
+        # Analyzers run in the daemon process itself so they use its warm models
+        return analyze_file(
+            audio_path,
+            use_cache=not request.get("no_cache", False),
+            run_separation=run_separation,
+            jobs=1,
+        )
+    if cmd in SINGLE_ANALYZERS:
+        return analyze_single(
+            cmd,
+            audio_path,
+            run_separation=run_separation,
+            model_size=request.get("model_size", "base"),
+            chord_vocabulary=request.get("chord_vocabulary", "triads"),
+            chord_smoothing=request.get("chord_smoothing", "none"),
+            melody_points=request.get("melody_points", 200),
+            melody_method=request.get("melody_method", "piptrack"),
+            vocal_gate=not request.get("no_vocal_gate", False),
+            whisper_workers=request.get("whisper_workers"),
+            use_cache=not request.get("no_cache", False),
+        )
+    raise ValueError(f"unknown command: {cmd}")
+
+
+def _preview(audio_path: Path, request: dict, run_separation: bool) -> dict:
+    """``analyze --fast``: answer with the preview, optionally refining on a thread.
+
+    The refinement runs the full analysis in the daemon (warm models) and
+    stores it in the cache, where the next ``analyze`` or ``--fast`` finds it.
+    """
+    import threading
+
+    from music_analyzer.scheduler import analyze_file, analyze_preview
+
+    use_cache = not request.get("no_cache", False)
+    result = analyze_preview(audio_path, use_cache=use_cache)
+    if request.get("refine") and result.precision and "preview" in result.precision.values():
+        threading.Thread(
+            target=analyze_file,
+            args=(audio_path,),
+            kwargs={"use_cache": True, "run_separation": run_separation, "jobs": 1},
+            name=f"refine:{audio_path.name}",
+            daemon=True,
+        ).start()
+    return json.loads(result.model_dump_json(exclude_none=True))
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            print(f"[serve] {request.get('command')} {request.get('audio', '')}", file=sys.stderr)
+            response = {"ok": True, "result": handle_request(request)}
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path: Optional[Path] = None, preload: bool = True, whisper_size: str = "base") -> None:
+    """Run the analysis daemon until interrupted.
+
+    Parameters
+    ----------
+    path : Unix socket path (default: ``socket_path()``)
+    preload : load all available models before accepting requests
+    whisper_size : whisper model size to preload
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("the analysis daemon requires Unix domain sockets")
+
+    path = path or socket_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        if request_daemon({"command": "ping"}, path) is not None:
+            raise RuntimeError(f"a daemon is already listening on {path}")
+        path.unlink()  # Left over from a daemon that did not shut down cleanly
+
+    # Import the analysis stack up front so the first request is fast
+    import music_analyzer.scheduler  # noqa: F401
+    import librosa  # noqa: F401
+
+    if preload:
+        from music_analyzer.utils.warm_models import preload as preload_models
+        loaded = preload_models(whisper_size)
+        print(f"[serve] models loaded: {', '.join(loaded) or 'none'}", file=sys.stderr)
+
+    server = _Server(str(path), _Handler)
+    # Exit through the finally block below on SIGTERM so the socket is removed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"[serve] listening on {path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
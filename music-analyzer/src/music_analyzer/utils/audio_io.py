@@ -2,14 +2,18 @@
 
 from __future__ import annotations
 
+import os
 import sys
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Iterable, Optional, Tuple
 
 import numpy as np
 
 from music_analyzer.config import DEFAULT_SR, SUPPORTED_FORMATS
 
+# Environment variable that disables the decoded-PCM cache when set to 0
+PCM_CACHE_ENV = "MUSIC_ANALYZER_PCM_CACHE"
+
 
 def validate_audio_path(path: str) -> Path:
     """Validate that path points to a supported audio file.
@@ -29,28 +33,128 @@ def validate_audio_path(path: str) -> Path:
     return p
 
 
+def pcm_cache_enabled() -> bool:
+    """Whether decoded audio is cached (disable with ``MUSIC_ANALYZER_PCM_CACHE=0``)."""
+    return os.environ.get(PCM_CACHE_ENV, "1").lower() not in ("0", "false", "no", "off")
+
+
 def load_audio(
     path: str | Path,
     sr: Optional[int] = None,
     mono: bool = True,
     duration: Optional[float] = None,
+    use_cache: Optional[bool] = None,
+    offset: float = 0.0,
 ) -> Tuple[np.ndarray, int]:
     """Load audio file and return (waveform, sample_rate).
 
+    Full-length loads go through the decoded-PCM cache: the first load
+    decodes and resamples as usual and stores float32 PCM; later loads of
+    the same content map that file read-only instead of decoding again.
+
     Parameters
     ----------
     path : path to audio file
     sr : target sample rate (None = native rate, default = DEFAULT_SR)
     mono : convert to mono
-    duration : only load first N seconds
+    duration : only load first N seconds (after ``offset``)
+    use_cache : read / write the PCM cache (default: on); never with
+        ``MUSIC_ANALYZER_PCM_CACHE=0``
+    offset : start reading this many seconds into the file
     """
+    target_sr = sr if sr is not None else DEFAULT_SR
+    # The environment switch turns the cache off even for explicit callers
+    use_cache = (use_cache is None or use_cache) and pcm_cache_enabled()
+    use_cache = use_cache and duration is None and not offset
+
+    if use_cache:
+        from music_analyzer.utils.cache import get_pcm
+
+        y = get_pcm(Path(path), target_sr, mono)
+        if y is not None:
+            return y, target_sr
+
     import librosa
 
-    target_sr = sr if sr is not None else DEFAULT_SR
-    y, sr_out = librosa.load(str(path), sr=target_sr, mono=mono, duration=duration)
+    from music_analyzer.utils.profiling import span
+
+    with span("decode", "decode"):
+        y, sr_out = librosa.load(str(path), sr=target_sr, mono=mono, offset=offset, duration=duration)
+
+    if use_cache:
+        from music_analyzer.utils.cache import save_pcm
+
+        save_pcm(Path(path), y, sr_out, mono)
     return y, sr_out
 
 
+def load_audio_rates(
+    path: str | Path,
+    rates: Iterable[tuple[int, bool]],
+    use_cache: Optional[bool] = None,
+) -> dict[tuple[int, bool], np.ndarray]:
+    """Decode a file once and return it at several sample rates.
+
+    The source is decoded at its native rate, then each requested
+    ``(sample_rate, mono)`` version is produced directly from that decode
+    with soxr. A mono version at a given rate is identical to what
+    ``load_audio(path, sr=rate)`` returns; multichannel versions keep the
+    channel axis first. Only the analysis version (``DEFAULT_SR``, mono)
+    goes through the PCM cache, as in ``load_audio``: the model-rate copies
+    (CLAP, Whisper, Demucs) are several times its size and are produced
+    from the decode instead, which is skipped when only the analysis
+    version is requested and cached.
+
+    Parameters
+    ----------
+    path : path to audio file
+    rates : ``(sample_rate, mono)`` pairs to produce
+    use_cache : read / write the PCM cache (default: on); never with
+        ``MUSIC_ANALYZER_PCM_CACHE=0``
+    """
+    path = Path(path)
+    rates = list(dict.fromkeys(rates))
+    use_cache = (use_cache is None or use_cache) and pcm_cache_enabled()
+
+    cached = (DEFAULT_SR, True)
+    out: dict[tuple[int, bool], np.ndarray] = {}
+    if use_cache and cached in rates:
+        from music_analyzer.utils.cache import get_pcm
+
+        y = get_pcm(path, *cached)
+        if y is not None:
+            out[cached] = y
+
+    missing = [r for r in rates if r not in out]
+    if not missing:
+        return out
+
+    import librosa
+
+    from music_analyzer.utils.profiling import span
+
+    with span("decode", "decode"):
+        native, native_sr = librosa.load(str(path), sr=None, mono=False)
+    downmix = None
+    for sr, mono in missing:
+        if mono:
+            if downmix is None:
+                downmix = librosa.to_mono(native)
+            src = downmix
+        else:
+            src = native
+        with span(f"resample:{sr}", "decode"):
+            y = src if sr == native_sr else librosa.resample(
+                src, orig_sr=native_sr, target_sr=sr, res_type="soxr_hq"
+            )
+        out[(sr, mono)] = y
+        if use_cache and (sr, mono) == cached:
+            from music_analyzer.utils.cache import save_pcm
+
+            save_pcm(path, y, sr, mono)
+    return out
+
+
 def get_audio_info(path: str | Path) -> dict:
     """Get basic audio file metadata without loading full waveform."""
     import soundfile as sf
@@ -1,13 +1,19 @@
-"""Analysis result caching based on file hash."""
+"""Analysis result and intermediate-feature caching based on file hash."""
 
 from __future__ import annotations
 
 import hashlib
 import json
+import os
+import threading
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
+
 from music_analyzer.config import CACHE_DIR
+from music_analyzer.utils.cache_manager import maybe_prune, touch
+from music_analyzer.utils.profiling import span
 
 
 def _file_hash(path: Path, chunk_size: int = 65536) -> str:
@@ -27,9 +33,56 @@ def _file_hash(path: Path, chunk_size: int = 65536) -> str:
     return h.hexdigest()[:16]
 
 
+def file_hash(audio_path: Path) -> str:
+    """Content hash of an audio file, read from the stat-keyed index when possible."""
+    from music_analyzer.utils.cache_index import indexed_hash
+
+    return indexed_hash(audio_path, _file_hash)
+
+
 def cache_key(audio_path: Path) -> str:
     """Generate a cache key for an audio file."""
-    return f"{audio_path.stem}_{_file_hash(audio_path)}"
+    return f"{audio_path.stem}_{file_hash(audio_path)}"
+
+
+def _entry_path(key: str, suffix: str) -> Path:
+    return CACHE_DIR / f"{key}_{suffix}.json"
+
+
+def atomic_write(path: Path, write) -> None:
+    """Write via a temp file + rename so concurrent readers never see partial data."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def get_entry(key: str, suffix: str) -> Optional[dict]:
+    """Load a cache entry by cache key (see ``cache_key``), or ``None``."""
+    cache_file = _entry_path(key, suffix)
+    with span(f"cache.read:{suffix}", "cache"):
+        if cache_file.exists():
+            try:
+                data = json.loads(cache_file.read_text(encoding="utf-8"))
+            except (json.JSONDecodeError, OSError):
+                return None  # Corrupt, or evicted by another process
+            touch(cache_file)
+            return data
+        return None
+
+
+def save_entry(key: str, data: dict, suffix: str) -> Path:
+    """Save a cache entry by cache key and return the cache file path."""
+    cache_file = _entry_path(key, suffix)
+    with span(f"cache.write:{suffix}", "cache"):
+        payload = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        atomic_write(cache_file, lambda f: f.write(payload))
+        maybe_prune()
+    return cache_file
 
 
 def get_cached(audio_path: Path, suffix: str = "analysis") -> Optional[dict]:
@@ -40,14 +93,7 @@ def get_cached(audio_path: Path, suffix: str = "analysis") -> Optional[dict]:
     audio_path : path to the audio file
     suffix : cache file suffix (e.g. 'analysis', 'dreamina', 'storyboard')
     """
-    key = cache_key(audio_path)
-    cache_file = CACHE_DIR / f"{key}_{suffix}.json"
-    if cache_file.exists():
-        try:
-            return json.loads(cache_file.read_text(encoding="utf-8"))
-        except (json.JSONDecodeError, OSError):
-            return None
-    return None
+    return get_entry(cache_key(audio_path), suffix)
 
 
 def save_cache(audio_path: Path, data: dict, suffix: str = "analysis") -> Path:
@@ -55,10 +101,67 @@ def save_cache(audio_path: Path, data: dict, suffix: str = "analysis") -> Path:
 
     Returns the cache file path.
     """
-    key = cache_key(audio_path)
-    cache_file = CACHE_DIR / f"{key}_{suffix}.json"
-    cache_file.write_text(
-        json.dumps(data, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
-    return cache_file
+    return save_entry(cache_key(audio_path), data, suffix)
+
+
+def _pcm_path(audio_path: Path, sr: int, mono: bool) -> Path:
+    # Keyed by content only, so renamed or copied files share one entry
+    layout = "mono" if mono else "multi"
+    return CACHE_DIR / "audio" / f"{file_hash(audio_path)}_{sr}_{layout}.npy"
+
+
+def get_pcm(audio_path: Path, sr: int, mono: bool = True) -> Optional[np.ndarray]:
+    """Return cached decoded float32 PCM for a file, memory-mapped read-only, or ``None``."""
+    path = _pcm_path(audio_path, sr, mono)
+    try:
+        with span(f"cache.read:pcm-{sr}", "cache"):
+            pcm = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    touch(path)
+    # Plain ndarray view of the mapping (no copy)
+    return np.asarray(pcm)
+
+
+def save_pcm(audio_path: Path, y: np.ndarray, sr: int, mono: bool = True) -> None:
+    """Store decoded PCM for later ``get_pcm`` calls; failures are ignored."""
+    try:
+        with span(f"cache.write:pcm-{sr}", "cache"):
+            atomic_write(_pcm_path(audio_path, sr, mono), lambda f: np.save(f, y))
+    except OSError:
+        return
+    maybe_prune()
+
+
+class FeatureStore:
+    """Per-track store of intermediate feature arrays as ``.npy`` files.
+
+    Arrays are read back memory-mapped (read-only), so reusing a cached
+    chroma or onset envelope costs no DSP and almost no copying.
+
+    Parameters
+    ----------
+    key : cache key of the track (see ``cache_key``)
+    """
+
+    def __init__(self, key: str):
+        self.dir = CACHE_DIR / "features" / key
+
+    def load(self, name: str) -> Optional[np.ndarray]:
+        """Return the stored array ``name`` memory-mapped, or ``None``."""
+        path = self.dir / f"{name}.npy"
+        try:
+            with span(f"cache.read:{name}", "cache"):
+                array = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        touch(path)
+        return array
+
+    def save(self, name: str, array: np.ndarray) -> None:
+        """Store ``array`` under ``name``; failures are ignored."""
+        try:
+            with span(f"cache.write:{name}", "cache"):
+                atomic_write(self.dir / f"{name}.npy", lambda f: np.save(f, array))
+        except OSError:
+            pass
@@ -0,0 +1,99 @@
+"""Stat-keyed index of audio content hashes.
+
+Cache keys are derived from a SHA-256 of the audio file, which means reading
+up to 10 MB of every file on every cache lookup. This index remembers the
+hash of each file under its ``(resolved path, inode, size, mtime_ns)`` stat
+tuple in a SQLite database inside ``CACHE_DIR``, so the file is only read
+again when that tuple changes.
+
+The database runs in WAL mode with a busy timeout, so any number of worker
+processes (batch pool, analyzer pool, the ``serve`` daemon's threads) can
+read and update it concurrently. Every failure to use the index degrades to
+hashing the file directly.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from music_analyzer.config import CACHE_DIR
+
+# SQLite database holding the index
+INDEX_PATH = CACHE_DIR / "index.sqlite3"
+
+# Seconds a connection waits for another process's write lock
+_BUSY_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path       TEXT PRIMARY KEY,
+    inode      INTEGER NOT NULL,
+    size       INTEGER NOT NULL,
+    mtime_ns   INTEGER NOT NULL,
+    hash       TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+# One connection per (process, thread); sqlite3 connections must not cross
+# threads, and a connection inherited through fork() must not be reused.
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "pid", None) == os.getpid():
+        return conn
+
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(INDEX_PATH), timeout=_BUSY_TIMEOUT, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(_SCHEMA)
+    _local.conn = conn
+    _local.pid = os.getpid()
+    return conn
+
+
+def _stat_key(path: Path) -> tuple[str, int, int, int]:
+    resolved = path.resolve()
+    st = resolved.stat()
+    return str(resolved), st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def indexed_hash(path: Path, compute: Callable[[Path], str]) -> str:
+    """Return the content hash of ``path``, calling ``compute`` only on an index miss.
+
+    Parameters
+    ----------
+    path : audio file
+    compute : function that hashes the file contents
+    """
+    key, inode, size, mtime_ns = _stat_key(path)
+    try:
+        conn = _connect()
+        row = conn.execute(
+            "SELECT hash FROM file_hashes WHERE path = ? AND inode = ? AND size = ? AND mtime_ns = ?",
+            (key, inode, size, mtime_ns),
+        ).fetchone()
+    except (sqlite3.Error, OSError):  # e.g. a read-only or unwritable cache directory
+        return compute(path)
+    if row:
+        return row[0]
+
+    digest = compute(path)
+    # Only record the hash if the file did not change while it was being read
+    if _stat_key(path) == (key, inode, size, mtime_ns):
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?, ?)",
+                (key, inode, size, mtime_ns, digest, time.time()),
+            )
+        except (sqlite3.Error, OSError):
+            pass  # Index is an optimization; the hash is still correct
+    return digest
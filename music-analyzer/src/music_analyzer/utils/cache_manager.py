@@ -0,0 +1,282 @@
+"""Size-bounded cache management (LRU eviction with per-category quotas).
+
+The cache directory holds three kinds of data with very different sizes:
+
+- ``analysis``: result JSONs in ``CACHE_DIR`` plus per-track feature
+  directories under ``features/``
+- ``stems``: Demucs WAV stems under ``stems/``
+- ``audio``: decoded PCM under ``audio/``
+
+Each category has its own byte budget. Pruning removes the least recently
+used entries of a category until it fits; cache hits bump an entry's
+modification time, so "last used" is the newer of its atime and mtime.
+
+Eviction is safe while other processes read the cache: files are unlinked
+(open handles and memory maps stay valid), directories are renamed away
+atomically before they are deleted, readers treat a vanished entry as a
+miss, and entries used within the last few minutes are never evicted.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+from music_analyzer.config import CACHE_DIR
+
+# Default byte budget per category
+DEFAULT_LIMITS = {
+    "analysis": 2 * 1024 ** 3,
+    "stems": 10 * 1024 ** 3,
+    "audio": 5 * 1024 ** 3,
+}
+
+# Environment variables overriding the budgets (accept K/M/G/T suffixes)
+LIMIT_ENV = {
+    "analysis": "MUSIC_ANALYZER_CACHE_MAX",
+    "stems": "MUSIC_ANALYZER_STEMS_MAX",
+    "audio": "MUSIC_ANALYZER_AUDIO_MAX",
+}
+
+# Entries used more recently than this are never evicted
+IN_USE_GRACE = 300.0
+
+# Minimum seconds between automatic prunes (see ``maybe_prune``)
+PRUNE_INTERVAL = 600.0
+
+# Leftover temp files / half-deleted directories older than this are removed
+STALE_TEMP_AGE = 3600.0
+
+_PRUNE_MARKER = ".last_prune"
+_PRUNE_LOCK = ".prune.lock"
+_EVICTING_PREFIX = ".evicting-"
+
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+class _Entry(NamedTuple):
+    path: Path
+    size: int
+    last_used: float
+
+
+def parse_size(text: str) -> int:
+    """Parse a byte size such as ``"500M"``, ``"2G"`` or ``"1048576"``."""
+    value = text.strip().upper().removesuffix("B").removesuffix("I")
+    unit = value[-1:] if value[-1:] in _UNITS else ""
+    try:
+        return int(float(value[: len(value) - len(unit)]) * _UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size: {text!r}") from None
+
+
+def cache_limits(overrides: Optional[dict[str, int]] = None) -> dict[str, int]:
+    """Byte budget per category: defaults, then environment, then ``overrides``."""
+    limits = dict(DEFAULT_LIMITS)
+    for category, env in LIMIT_ENV.items():
+        if os.environ.get(env):
+            limits[category] = parse_size(os.environ[env])
+    limits.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    return limits
+
+
+def touch(path: Path) -> None:
+    """Mark a cache entry as used."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Scanning
+# ---------------------------------------------------------------------------
+
+def _entry(path: Path) -> Optional[_Entry]:
+    try:
+        if path.is_dir():
+            size = 0
+            last_used = path.stat().st_mtime
+            for f in path.rglob("*"):
+                st = f.stat()
+                if f.is_file():
+                    size += st.st_size
+                last_used = max(last_used, st.st_mtime, st.st_atime)
+            return _Entry(path, size, last_used)
+        st = path.stat()
+        return _Entry(path, st.st_size, max(st.st_mtime, st.st_atime))
+    except OSError:
+        return None  # Removed by another process while scanning
+
+
+def _candidates(category: str) -> list[Path]:
+    if category == "analysis":
+        paths = list(CACHE_DIR.glob("*.json"))
+        features = CACHE_DIR / "features"
+        if features.is_dir():
+            paths.extend(features.iterdir())
+    else:
+        root = CACHE_DIR / category
+        paths = list(root.iterdir()) if root.is_dir() else []
+    return [p for p in paths if not p.name.startswith(".")]
+
+
+def _scan(category: str) -> list[_Entry]:
+    entries = (_entry(p) for p in _candidates(category))
+    return [e for e in entries if e is not None]
+
+
+def cache_stats() -> dict:
+    """Return entry counts, sizes and budgets per cache category."""
+    limits = cache_limits()
+    categories = {}
+    for category in DEFAULT_LIMITS:
+        entries = _scan(category)
+        categories[category] = {
+            "entries": len(entries),
+            "bytes": sum(e.size for e in entries),
+            "limit": limits[category],
+            "oldest_use": min((e.last_used for e in entries), default=None),
+        }
+    return {
+        "cache_dir": str(CACHE_DIR),
+        "total_bytes": sum(c["bytes"] for c in categories.values()),
+        "categories": categories,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Eviction
+# ---------------------------------------------------------------------------
+
+def _remove(path: Path) -> bool:
+    """Remove a cache entry; directories are renamed away first."""
+    try:
+        if path.is_dir():
+            doomed = path.with_name(f"{_EVICTING_PREFIX}{os.getpid()}-{path.name}")
+            os.replace(path, doomed)
+            shutil.rmtree(doomed, ignore_errors=True)
+        else:
+            path.unlink()
+        return True
+    except FileNotFoundError:
+        return False  # Another process evicted it first
+    except OSError:
+        return False
+
+
+def _remove_stale_temps(now: float) -> None:
+    for root in (CACHE_DIR, CACHE_DIR / "features", CACHE_DIR / "stems", CACHE_DIR / "audio"):
+        if not root.is_dir():
+            continue
+        for p in root.glob(".*"):
+            if not (p.name.endswith(".tmp") or p.name.startswith(_EVICTING_PREFIX)):
+                continue
+            e = _entry(p)
+            if e is None or now - e.last_used <= STALE_TEMP_AGE:
+                continue
+            if p.is_dir():
+                shutil.rmtree(p, ignore_errors=True)
+            else:
+                p.unlink(missing_ok=True)
+
+
+def prune(
+    limits: Optional[dict[str, int]] = None,
+    dry_run: bool = False,
+    grace: float = IN_USE_GRACE,
+) -> dict:
+    """Evict least recently used entries until every category fits its budget.
+
+    Parameters
+    ----------
+    limits : per-category byte budgets overriding the configured ones
+    dry_run : report what would be removed without deleting anything
+    grace : never evict entries used within this many seconds
+    """
+    limits = cache_limits(limits)
+    now = time.time()
+    report = {"dry_run": dry_run, "categories": {}}
+
+    with _prune_lock() as acquired:
+        if not acquired:
+            report["skipped"] = "another prune is running"
+            return report
+        if not dry_run:
+            _remove_stale_temps(now)
+
+        for category, limit in limits.items():
+            entries = sorted(_scan(category), key=lambda e: e.last_used)
+            total = sum(e.size for e in entries)
+            removed = freed = 0
+            for e in entries:
+                if total <= limit:
+                    break
+                if now - e.last_used < grace:
+                    continue
+                if dry_run or _remove(e.path):
+                    total -= e.size
+                    freed += e.size
+                    removed += 1
+            report["categories"][category] = {
+                "removed": removed,
+                "freed_bytes": freed,
+                "bytes": total,
+                "limit": limit,
+            }
+    return report
+
+
+def maybe_prune() -> None:
+    """Start a prune on a background thread, at most every ``PRUNE_INTERVAL`` s.
+
+    Called after cache writes, which do not wait for the scan. The thread
+    is not a daemon, so a short-lived CLI process finishes the prune after
+    its work is done instead of abandoning it (an eviction cut short is
+    cleaned up by a later prune either way).
+    """
+    marker = CACHE_DIR / _PRUNE_MARKER
+    try:
+        if time.time() - marker.stat().st_mtime < PRUNE_INTERVAL:
+            return
+    except FileNotFoundError:
+        pass
+    try:
+        marker.touch()
+    except OSError:
+        return
+    threading.Thread(target=_prune_quietly, name="music-analyzer-prune").start()
+
+
+def _prune_quietly() -> None:
+    try:
+        prune()
+    except OSError:
+        pass  # Pruning is best-effort
+
+
+@contextmanager
+def _prune_lock() -> Iterator[bool]:
+    """Non-blocking inter-process lock; yields whether it was acquired."""
+    try:
+        import fcntl
+    except ImportError:
+        yield True  # No flock on this platform; concurrent prunes are harmless
+        return
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    fd = os.open(CACHE_DIR / _PRUNE_LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+        else:
+            yield True
+    finally:
+        os.close(fd)  # Closing releases the lock
@@ -0,0 +1,206 @@
+"""Per-stage profiling spans.
+
+Code paths wrap their stages in ``span(name, category)``, which does nothing
+unless a ``profiling()`` block is active. Inside one, every span records:
+
+- ``wall``: elapsed seconds
+- ``cpu``: process CPU seconds (all threads, so BLAS / FFT threads count)
+- ``rss_mb`` / ``max_rss_mb``: resident set size at span exit and the
+  process high-water mark so far
+- ``traced_peak_mb`` (with ``trace_memory``): peak Python + NumPy
+  allocations above the level at span entry, nested spans included.
+  tracemalloc slows allocation-heavy code (numba compilation, librosa)
+  severalfold, so it is opt-in. Its peak is process-wide, so spans that
+  overlap on different threads see each other's allocations.
+
+Spans recorded in pool workers are shipped back with their results and
+merged (``Profiler.merge``), so a parallel run shows one timeline. Spans
+nest per thread; code run on another thread sees the profiler only if it
+is started inside a copy of the caller's context
+(``contextvars.copy_context().run``). The
+recording can be emitted as a JSON summary (``Profiler.to_dict``) or as a
+Chrome trace (``Profiler.chrome_trace``, open in ``chrome://tracing`` or
+Perfetto).
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_active: ContextVar[Optional["Profiler"]] = ContextVar("music_analyzer_profiler", default=None)
+
+_MB = 1024 * 1024
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size, where the platform exposes it cheaply."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / _MB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _max_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / _MB if sys.platform == "darwin" else peak / 1024
+
+
+class _Frame:
+    __slots__ = ("name", "category", "start", "wall0", "cpu0", "traced0", "child_peak")
+
+    def __init__(self, name: str, category: str, traced0: int):
+        self.name = name
+        self.category = category
+        self.start = time.time()
+        self.wall0 = time.perf_counter()
+        self.cpu0 = time.process_time()
+        self.traced0 = traced0
+        self.child_peak = 0
+
+
+class Profiler:
+    """Collects the spans of one profiled run (see ``profiling``)."""
+
+    def __init__(self, trace_memory: bool = False):
+        self.spans: list[dict] = []
+        self.started = time.time()
+        self.trace_memory = trace_memory
+        self._local = threading.local()
+
+    @property
+    def _stack(self) -> list[_Frame]:
+        # Each thread nests its own spans
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, name: str, category: str) -> None:
+        current = 0
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # Keep the parent's peak before restarting the measurement
+                self._stack[-1].child_peak = max(self._stack[-1].child_peak, peak)
+            tracemalloc.reset_peak()
+        self._stack.append(_Frame(name, category, current))
+
+    def _exit(self) -> None:
+        frame = self._stack.pop()
+        wall = time.perf_counter() - frame.wall0
+        cpu = time.process_time() - frame.cpu0
+        rss = _rss_mb()
+        max_rss = _max_rss_mb()
+        record = {
+            "name": frame.name,
+            "category": frame.category,
+            "start": round(frame.start - self.started, 6),
+            "wall": round(wall, 6),
+            "cpu": round(cpu, 6),
+            "rss_mb": None if rss is None else round(rss, 1),
+            "max_rss_mb": None if max_rss is None else round(max_rss, 1),
+            "depth": len(self._stack),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if self.trace_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], frame.child_peak)
+            if self._stack:
+                self._stack[-1].child_peak = max(self._stack[-1].child_peak, peak)
+            record["traced_peak_mb"] = round(max(peak - frame.traced0, 0) / _MB, 2)
+        self.spans.append(record)
+
+    def merge(self, spans: list[dict], started: float) -> None:
+        """Add spans recorded by another profiler (e.g. in a pool worker)."""
+        offset = started - self.started
+        depth = len(self._stack)
+        for s in spans:
+            self.spans.append(dict(s, start=round(s["start"] + offset, 6), depth=s["depth"] + depth))
+
+    def to_dict(self) -> dict:
+        """Summary for the ``profile`` key of the output JSON."""
+        max_rss = _max_rss_mb()
+        return {
+            "wall": round(time.time() - self.started, 6),
+            "max_rss_mb": None if max_rss is None else round(max_rss, 1),
+            "spans": sorted(self.spans, key=lambda s: s["start"]),
+        }
+
+    def chrome_trace(self) -> dict:
+        """Spans in the Chrome trace event format (complete events, microseconds)."""
+        events = [
+            {
+                "name": s["name"],
+                "cat": s["category"],
+                "ph": "X",
+                "ts": round((self.started + s["start"]) * 1e6),
+                "dur": round(s["wall"] * 1e6),
+                "pid": s["pid"],
+                "tid": s["tid"],
+                "args": {
+                    k: s[k] for k in ("cpu", "traced_peak_mb", "rss_mb", "max_rss_mb")
+                    if s.get(k) is not None
+                },
+            }
+            for s in self.spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def active_profiler() -> Optional[Profiler]:
+    """The profiler of the enclosing ``profiling()`` block, if any."""
+    return _active.get()
+
+
+@contextmanager
+def profiling(trace_memory: bool = False) -> Iterator[Profiler]:
+    """Record every ``span`` entered inside this block.
+
+    Parameters
+    ----------
+    trace_memory : also record each span's peak traced allocations (slow)
+    """
+    profiler = Profiler(trace_memory)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    token = _active.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+@contextmanager
+def span(name: str, category: str) -> Iterator[None]:
+    """Time a stage; a no-op outside ``profiling()``.
+
+    Parameters
+    ----------
+    name : stage name, e.g. ``"analyzer:rhythm"``
+    category : stage kind: decode, feature, analyzer, format or cache
+    """
+    profiler = _active.get()
+    if profiler is None:
+        yield
+        return
+    profiler._enter(name, category)
+    try:
+        yield
+    finally:
+        profiler._exit()
@@ -0,0 +1,88 @@
+"""Process-wide cache of heavy ML models (CLAP, faster-whisper, Demucs).
+
+Each loader builds its model on first use and returns the same instance on
+every later call, so a long-lived process (the ``serve`` daemon or a batch
+worker) pays the model-loading cost once instead of once per track.
+"""
+
+from __future__ import annotations
+
+import threading
+from functools import lru_cache
+
+from music_analyzer.config import HAS_CLAP, HAS_DEMUCS, HAS_FASTER_WHISPER
+
+# Demucs model used for two-stem (vocals / accompaniment) separation
+DEMUCS_MODEL = "htdemucs"
+
+# Input sample rates of the models (htdemucs runs on 44.1 kHz stereo)
+CLAP_SR = 48000
+WHISPER_SR = 16000
+DEMUCS_SR = 44100
+
+# Model instance id → lock serializing inference on it (see ``model_lock``)
+_MODEL_LOCKS: dict[int, threading.RLock] = {}
+_MODEL_LOCKS_GUARD = threading.Lock()
+
+
+def model_lock(model) -> threading.RLock:
+    """Lock serializing inference on one shared model across threads.
+
+    Every model instance has its own lock, so e.g. CLAP or Whisper can run
+    while a background thread spends minutes in Demucs. The loaders below
+    keep their models for the life of the process, so ids are never reused.
+    """
+    with _MODEL_LOCKS_GUARD:
+        return _MODEL_LOCKS.setdefault(id(model), threading.RLock())
+
+
+@lru_cache(maxsize=None)
+def get_clap_model():
+    """Return a loaded ``laion_clap.CLAP_Module``."""
+    import laion_clap
+
+    model = laion_clap.CLAP_Module(enable_fusion=False)
+    model.load_ckpt()
+    return model
+
+
+@lru_cache(maxsize=None)
+def get_whisper_model(model_size: str = "base", cpu_threads: int = 0, num_workers: int = 1):
+    """Return a ``faster_whisper.WhisperModel`` for the given size.
+
+    ``num_workers`` > 1 lets that many threads call ``transcribe``
+    concurrently, each decoding with ``cpu_threads`` threads (0 = default).
+    """
+    from faster_whisper import WhisperModel
+
+    return WhisperModel(
+        model_size, compute_type="int8", cpu_threads=cpu_threads, num_workers=num_workers,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_demucs_model(name: str = DEMUCS_MODEL):
+    """Return a pretrained Demucs model in eval mode."""
+    from demucs.pretrained import get_model
+
+    model = get_model(name)
+    model.eval()
+    return model
+
+
+def preload(whisper_size: str = "base") -> list[str]:
+    """Load every model the installed dependency tier can use.
+
+    Returns the names of the models that were loaded.
+    """
+    loaded = []
+    if HAS_CLAP:
+        get_clap_model()
+        loaded.append("clap")
+    if HAS_FASTER_WHISPER:
+        get_whisper_model(whisper_size)
+        loaded.append(f"whisper-{whisper_size}")
+    if HAS_DEMUCS:
+        get_demucs_model()
+        loaded.append(DEMUCS_MODEL)
+    return loaded
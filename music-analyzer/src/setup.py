@@ -15,11 +15,9 @@ setup(
     extras_require={
         "standard": [
             "essentia>=2.1b6",
-            "pyloudnorm>=0.1.0",
         ],
         "full": [
             "essentia>=2.1b6",
-            "pyloudnorm>=0.1.0",
             "demucs>=4.0.0",
             "faster-whisper>=0.10.0",
             "laion-clap>=1.1.4",